@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks for performance critical parts of the evolution simulation.
+Run this script directly to run all benchmarks.
+"""
+from __future__ import annotations
+
+import random
+import time
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Callable
+from typing import List
+
+from src.coordinate import Coordinate
+from src.entity import move_towards
+from src.search import ArrayPositionClusterer
+from src.search import CompositePositionClusterer
+from src.search import GridSearchAlgorithm
+from src.search import PositionBinner
+from src.search import PositionClusterer
+from src.search import RandomSearchAlgorithm
+from src.search import SearchAlgorithm
+from src.search import SearchAlgorithmInterface
+from src.search import SimplePositionClusterer
+from src.search import SimplePositionLerper
+
+SCREEN_SIZE = Coordinate(800, 600)
+
+
+@dataclass
+class BenchmarkEntity:
+    """Minimal entity with a position, used as animal and food in benchmarks"""
+
+    position: Coordinate
+    vision: int = 70
+    dead: bool = field(default=False)
+
+    def draw(self, screen):  # pylint: disable=unused-argument
+        """Does nothing, benchmark entities are never drawn"""
+
+
+def time_function(function: Callable[[], object], repeats: int = 5) -> float:
+    """Returns the best time (in seconds) out of the specified amount of calls"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def generate_entities(amount: int) -> List[BenchmarkEntity]:
+    """Returns the specified amount of entities in random positions on the screen"""
+    return [
+        BenchmarkEntity(
+            Coordinate(
+                random.uniform(0, SCREEN_SIZE.x), random.uniform(0, SCREEN_SIZE.y)
+            )
+        )
+        for _ in range(amount)
+    ]
+
+
+def benchmark_search(foods: int = 10_000, animals: int = 1_000):
+    """Times one simulation tick worth of searches (one update and one target search
+    per animal) for each of the search algorithms.
+    """
+    food_entities = generate_entities(foods)
+    animal_entities = generate_entities(animals)
+    algorithms: List[SearchAlgorithmInterface] = [
+        RandomSearchAlgorithm(50),
+        SearchAlgorithm(50),
+        GridSearchAlgorithm(cell_size=20),
+    ]
+
+    print(f"Search: {foods} foods, {animals} animals, time per tick")
+    for algorithm in algorithms:
+        algorithm.add_entities(food_entities)  # type: ignore
+
+        def tick(algorithm=algorithm):
+            algorithm.update(food_entities)  # type: ignore
+            for animal in animal_entities:
+                algorithm.determine_target_position(
+                    animal, food_entities, distance=animal.vision  # type: ignore
+                )
+
+        print(f"  {type(algorithm).__name__}: {time_function(tick) * 1000:.2f} ms")
+
+
+def benchmark_clustering(amount: int = 100_000):
+    """Times clustering the specified amount of food positions with a three stage
+    composite clusterer, using the simple and the array based clusterers.
+    """
+    positions = [entity.position for entity in generate_entities(amount)]
+    stages = [(200, 0.05), (100, 0.1), (50, 0.1)]
+    clusterers: List[PositionClusterer] = [
+        CompositePositionClusterer(
+            [
+                clusterer_type(PositionBinner(resolution), SimplePositionLerper(factor))
+                for resolution, factor in stages
+            ]
+        )
+        for clusterer_type in (SimplePositionClusterer, ArrayPositionClusterer)
+    ]
+
+    print(f"Clustering: {amount} positions, {len(stages)} stages")
+    for clusterer, name in zip(clusterers, ("Simple", "Array")):
+        duration = time_function(
+            lambda clusterer=clusterer: clusterer.cluster_positions(positions),
+            repeats=3,
+        )
+        print(f"  {name}PositionClusterer: {duration * 1000:.2f} ms")
+
+
+def benchmark_coordinates(amount: int = 100_000):
+    """Times hashing, measuring the distance between and moving the specified amount
+    of coordinates.
+    """
+    coordinates = [entity.position for entity in generate_entities(amount)]
+    targets = [entity.position for entity in generate_entities(amount)]
+    targets_dict = dict.fromkeys(targets)
+
+    def hash_coordinates():
+        for coordinate in coordinates:
+            hash(coordinate)
+
+    def look_up_coordinates():
+        for coordinate in coordinates:
+            _ = coordinate in targets_dict
+
+    def compute_distances():
+        for coordinate, target in zip(coordinates, targets):
+            coordinate.compute_distance(target)
+
+    def move_coordinates():
+        for coordinate, target in zip(coordinates, targets):
+            move_towards(coordinate, target, 5)
+
+    print(f"Coordinates: {amount} coordinates, time per operation")
+    for name, function in (
+        ("hash", hash_coordinates),
+        ("dict lookup", look_up_coordinates),
+        ("compute_distance", compute_distances),
+        ("move_towards", move_coordinates),
+    ):
+        print(f"  {name}: {time_function(function) / amount * 1e9:.1f} ns")
+
+
+def main():
+    """Runs all benchmarks"""
+    random.seed(0)
+    benchmark_search()
+    benchmark_clustering()
+    benchmark_coordinates()
+
+
+if __name__ == "__main__":
+    main()
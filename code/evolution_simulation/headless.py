@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""Headless batch runner for evolution experiments.
+
+Runs a grid of simulation configurations for a number of seeds in parallel worker
+processes, without rendering and without a frame cap. The metrics of every run are
+streamed to a CSV file per run, and aggregated across seeds once all runs finished.
+
+Example, running 4 food amounts x 3 cloning chances for 5 seeds each:
+    python headless.py --grid food.initial_amount=200,500,800,1200 \
+        --grid food_cloner.chance=0.02,0.05,0.1 --seeds 5 --ticks 2000
+
+With --profile, the hot paths of every run are profiled and a report of the time per
+tick spent in each of them is written next to the metrics of the run.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import dataclasses
+import itertools
+import math
+import os
+import time
+from concurrent.futures import as_completed
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+# pylint: disable=wrong-import-position
+from main import create_default_params
+from main import create_simulation
+from src.entity import FoodCloner
+from src.metrics import METRICS
+from src.params import RunnerParams
+from src.profiling import PROFILER
+
+
+@dataclass(frozen=True)
+class Experiment:
+    """A single simulation configuration, to be run for a number of seeds"""
+
+    name: str
+    params: RunnerParams
+    food_cloner: FoodCloner
+    vectorized: bool = False
+
+
+@dataclass(frozen=True)
+class RunResult:
+    """Result of a single simulation run"""
+
+    experiment: str
+    seed: int
+    ticks: int
+    duration: float
+    output_filepath: str
+
+
+def replace_path(obj: Any, path: str, value: Any) -> Any:
+    """Returns a copy of the specified (frozen) dataclass, with the attribute at the
+    specified dotted path (e.g. "animal.speed.average") replaced by the value.
+    """
+    name, _, rest = path.partition(".")
+    if rest:
+        value = replace_path(getattr(obj, name), rest, value)
+    return dataclasses.replace(obj, **{name: value})
+
+
+def create_experiments(
+    params: RunnerParams,
+    food_cloner: FoodCloner,
+    grid: Dict[str, Sequence[Any]],
+    vectorized: bool = False,
+) -> List[Experiment]:
+    """Returns one experiment for every combination of values in the specified grid.
+    Each grid key is a dotted path into the params (e.g. "food.initial_amount") or,
+    if it starts with "food_cloner.", into the food cloner.
+    """
+    experiments = []
+    paths = list(grid)
+    for values in itertools.product(*grid.values()):
+        experiment_params, experiment_food_cloner = params, food_cloner
+        for path, value in zip(paths, values):
+            if path.startswith("food_cloner."):
+                experiment_food_cloner = replace_path(
+                    experiment_food_cloner, path[len("food_cloner.") :], value
+                )
+            else:
+                experiment_params = replace_path(experiment_params, path, value)
+        name = "_".join(f"{path}={value}" for path, value in zip(paths, values))
+        experiments.append(
+            Experiment(
+                name or "default",
+                experiment_params,
+                experiment_food_cloner,
+                vectorized,
+            )
+        )
+    return experiments
+
+
+def run_experiment(
+    experiment: Experiment,
+    seed: int,
+    max_ticks: int,
+    output_directory: str,
+    profile: bool = False,
+) -> RunResult:
+    """Runs the experiment with the specified seed until all animals or foods died out,
+    or until max_ticks is reached. Streams the metrics of every tick to a CSV file.
+    If profile is True, the run is profiled and the profile report is written next to
+    the CSV file.
+    """
+    if profile:
+        PROFILER.reset()
+        PROFILER.capacity = max_ticks
+        PROFILER.enable()
+    start_time = time.perf_counter()
+    simulation = create_simulation(
+        experiment.params, experiment.food_cloner, experiment.vectorized, seed=seed
+    )
+    output_filepath = os.path.join(output_directory, f"{experiment.name}_{seed}.csv")
+    ticks = 0
+    with open(output_filepath, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["tick"] + METRICS)
+        while ticks < max_ticks:
+            with PROFILER.scope("tick"):
+                if not simulation.step():
+                    break
+            writer.writerow([ticks] + list(dataclasses.astuple(simulation.sample())))
+            PROFILER.end_tick()
+            ticks += 1
+
+    duration = time.perf_counter() - start_time
+    if profile:
+        PROFILER.disable()
+        PROFILER.dump(
+            os.path.join(output_directory, f"{experiment.name}_{seed}.prof.txt")
+        )
+    return RunResult(experiment.name, seed, ticks, duration, output_filepath)
+
+
+def aggregate_runs(  # pylint: disable=too-many-locals
+    results: Iterable[RunResult], output_filepath: str
+):
+    """Aggregates the per tick metrics of the specified runs into one CSV file,
+    containing the mean and standard deviation of every metric across all runs
+    still alive at each tick.
+    """
+    sums: List[List[float]] = []
+    square_sums: List[List[float]] = []
+    counts: List[int] = []
+    for result in results:
+        with open(result.output_filepath, newline="", encoding="utf-8") as file:
+            reader = csv.reader(file)
+            next(reader)
+            for row in reader:
+                tick = int(row[0])
+                if tick == len(counts):
+                    sums.append([0.0] * len(METRICS))
+                    square_sums.append([0.0] * len(METRICS))
+                    counts.append(0)
+                counts[tick] += 1
+                for i, value in enumerate(map(float, row[1:])):
+                    sums[tick][i] += value
+                    square_sums[tick][i] += value * value
+
+    header = ["tick", "runs"]
+    for metric in METRICS:
+        header.extend([f"{metric}_mean", f"{metric}_std"])
+    with open(output_filepath, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        for tick, (count, sums_, square_sums_) in enumerate(
+            zip(counts, sums, square_sums)
+        ):
+            aggregated: List[float] = [tick, count]
+            for sum_, square_sum in zip(sums_, square_sums_):
+                mean = sum_ / count
+                aggregated.extend(
+                    [mean, math.sqrt(max(0, square_sum / count - mean ** 2))]
+                )
+            writer.writerow(aggregated)
+
+
+def run_sweep(  # pylint: disable=too-many-arguments
+    experiments: Sequence[Experiment],
+    seeds: Sequence[int],
+    max_ticks: int,
+    output_directory: str,
+    workers: Optional[int] = None,
+    profile: bool = False,
+) -> Dict[str, List[RunResult]]:
+    """Runs every experiment with every seed in parallel worker processes, then
+    aggregates the results of each experiment across seeds. If profile is True, a
+    profile report is written for every run, see run_experiment.
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    results: Dict[str, List[RunResult]] = {x.name: [] for x in experiments}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                run_experiment, experiment, seed, max_ticks, output_directory, profile
+            )
+            for experiment, seed in itertools.product(experiments, seeds)
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            results[result.experiment].append(result)
+            print(
+                f"{result.experiment} (seed {result.seed}): "
+                f"{result.ticks} ticks in {result.duration:.1f}s"
+            )
+
+    for name, experiment_results in results.items():
+        experiment_results.sort(key=lambda x: x.seed)
+        aggregate_runs(
+            experiment_results,
+            os.path.join(output_directory, f"{name}_aggregate.csv"),
+        )
+    return results
+
+
+def parse_grid(values: Iterable[str]) -> Dict[str, List[Any]]:
+    """Parses grid arguments in the form path=value1,value2,... into a dict"""
+    grid = {}
+    for value in values:
+        path, _, options = value.partition("=")
+        grid[path] = [_parse_value(x) for x in options.split(",")]
+    return grid
+
+
+def _parse_value(value: str) -> Any:
+    for type_ in (int, float):
+        try:
+            return type_(value)
+        except ValueError:
+            pass
+    return value
+
+
+def parse_args() -> argparse.Namespace:
+    """Parses the command line arguments"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--grid",
+        action="append",
+        default=[],
+        help="Parameter grid in the form path=value1,value2 (can be repeated)",
+    )
+    parser.add_argument("--seeds", type=int, default=3, help="Seeds per experiment")
+    parser.add_argument("--ticks", type=int, default=1000, help="Max ticks per run")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes")
+    parser.add_argument("--output", default="headless_output", help="Output folder")
+    parser.add_argument(
+        "--vectorized", action="store_true", help="Use the array based engine"
+    )
+    parser.add_argument(
+        "--profile", action="store_true", help="Write a profile report per run"
+    )
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    args = parse_args()
+    params, food_cloner = create_default_params()
+    experiments = create_experiments(
+        params, food_cloner, parse_grid(args.grid), args.vectorized
+    )
+    start_time = time.perf_counter()
+    run_sweep(
+        experiments,
+        seeds=list(range(args.seeds)),
+        max_ticks=args.ticks,
+        output_directory=args.output,
+        workers=args.workers,
+        profile=args.profile,
+    )
+    print(
+        f"Ran {len(experiments)} experiments x {args.seeds} seeds "
+        f"in {time.perf_counter() - start_time:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""Headless island model runner for population genetics experiments.
+
+Runs a number of independent simulations ("islands") in parallel worker processes,
+without rendering and without a frame cap. Every migration interval, each island sends
+a few random animals to the next island of a ring and receives the migrants of the
+previous one. Islands only wait for their neighbour's migrants, so they run
+independently between migrations and scale with the amount of cores.
+
+The metrics of every island and their population weighted means across all islands
+are written to a CSV file once per migration interval.
+
+Example, running 4 islands for 5000 ticks, migrating 5 animals every 200 ticks:
+    python islands.py --islands 4 --ticks 5000 --interval 200 --migrants 5
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import dataclasses
+import math
+import multiprocessing
+import os
+import queue
+import time
+from dataclasses import dataclass
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+# pylint: disable=wrong-import-position
+from headless import parse_grid
+from headless import replace_path
+from main import create_default_params
+from main import create_simulation
+from src.entity import FoodCloner
+from src.metrics import METRICS
+from src.metrics import MetricsSample
+from src.params import RunnerParams
+
+# metrics weighted by the animal (or food) amount of each island in the global mean
+ANIMAL_METRICS = ["vision", "size", "speed", "energy_loss"]
+FOOD_METRICS = ["food_energy"]
+
+
+@dataclass(frozen=True)
+class IslandConfig:  # pylint: disable=too-many-instance-attributes
+    """Configuration shared by all islands"""
+
+    params: RunnerParams
+    food_cloner: FoodCloner
+    islands: int = 4
+    max_ticks: int = 1000
+    migration_interval: int = 100
+    migrants: int = 5
+    seed: int = 0
+    vectorized: bool = False
+
+
+@dataclass(frozen=True)
+class IslandReport:
+    """Metrics of an island after a migration interval, None if it died out"""
+
+    island: int
+    tick: int
+    sample: Optional[MetricsSample]
+
+
+def run_island(
+    config: IslandConfig,
+    island: int,
+    inboxes: Sequence[Any],
+    reports: Any,
+):
+    """Runs a single island until max_ticks. Reports its metrics once per migration
+    interval, then sends migrants to the inbox of the next island and receives the
+    migrants in its own inbox. Islands whose animals or foods died out keep ticking,
+    so they can be repopulated by migrants.
+    """
+    simulation = create_simulation(
+        config.params, config.food_cloner, config.vectorized, seed=config.seed + island
+    )
+    tick = 0
+    alive = True
+    while tick < config.max_ticks:
+        ticks = min(config.migration_interval, config.max_ticks - tick)
+        for _ in range(ticks):
+            alive = simulation.step()
+        tick += ticks
+        reports.put(IslandReport(island, tick, simulation.sample() if alive else None))
+
+        if config.islands > 1 and tick < config.max_ticks:
+            inboxes[(island + 1) % config.islands].put(
+                simulation.emigrate(config.migrants)
+            )
+            simulation.immigrate(inboxes[island].get())
+
+
+def compute_global_sample(samples: Sequence[MetricsSample]) -> MetricsSample:
+    """Returns the metrics of all islands combined: amounts are summed, means are
+    weighted by the amount of animals or foods of each island.
+    """
+    values: Dict[str, float] = {}
+    animal_amount = sum(x.animal_amount for x in samples)
+    food_amount = sum(x.food_amount for x in samples)
+    for metrics, total, amount in (
+        (ANIMAL_METRICS, animal_amount, "animal_amount"),
+        (FOOD_METRICS, food_amount, "food_amount"),
+    ):
+        for metric in metrics:
+            weighted_sum = sum(getattr(x, metric) * getattr(x, amount) for x in samples)
+            values[metric] = weighted_sum / total if total else float("nan")
+    return MetricsSample(**values, food_amount=food_amount, animal_amount=animal_amount)
+
+
+def run_islands(config: IslandConfig, output_filepath: str) -> List[IslandReport]:
+    """Runs all islands in parallel worker processes and writes their metrics and the
+    global metrics to a CSV file once per migration interval. Returns the last report
+    of every island.
+    """
+    context = multiprocessing.get_context()
+    inboxes = [context.Queue() for _ in range(config.islands)]
+    reports = context.Queue()
+    processes = [
+        context.Process(target=run_island, args=(config, i, inboxes, reports))
+        for i in range(config.islands)
+    ]
+    for process in processes:
+        process.start()
+
+    intervals = math.ceil(config.max_ticks / config.migration_interval)
+    pending: Dict[int, Dict[int, IslandReport]] = {}
+    last_reports: Dict[int, IslandReport] = {}
+    try:
+        with open(output_filepath, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["tick", "island"] + METRICS)
+            for _ in range(intervals * config.islands):
+                report = _get_report(reports, processes)
+                last_reports[report.island] = report
+                tick_reports = pending.setdefault(report.tick, {})
+                tick_reports[report.island] = report
+                if len(tick_reports) == config.islands:
+                    _write_reports(writer, report.tick, pending.pop(report.tick))
+    except BaseException:
+        # the remaining islands would otherwise wait for their migrants forever
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        raise
+    finally:
+        for process in processes:
+            process.join()
+    return [last_reports[i] for i in range(config.islands)]
+
+
+def _get_report(reports: Any, processes: Sequence[Any]) -> IslandReport:
+    while True:
+        try:
+            return reports.get(timeout=1)
+        except queue.Empty:
+            if any(x.exitcode not in (None, 0) for x in processes):
+                raise RuntimeError("An island process failed") from None
+
+
+def _write_reports(writer: Any, tick: int, reports: Dict[int, IslandReport]):
+    samples = []
+    for island in sorted(reports):
+        sample = reports[island].sample
+        if sample is None:
+            writer.writerow([tick, island] + [""] * len(METRICS))
+            continue
+        samples.append(sample)
+        writer.writerow([tick, island] + list(dataclasses.astuple(sample)))
+    if samples:
+        global_sample = compute_global_sample(samples)
+        writer.writerow([tick, "all"] + list(dataclasses.astuple(global_sample)))
+        print(
+            f"tick {tick}: {len(samples)}/{len(reports)} islands alive, "
+            f"{global_sample.animal_amount} animals, "
+            f"speed {global_sample.speed:.3f}, vision {global_sample.vision:.1f}"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    """Parses the command line arguments"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--islands", type=int, default=4, help="Amount of islands")
+    parser.add_argument("--ticks", type=int, default=1000, help="Ticks per island")
+    parser.add_argument(
+        "--interval", type=int, default=100, help="Ticks between migrations"
+    )
+    parser.add_argument(
+        "--migrants", type=int, default=5, help="Animals migrating per island"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first island")
+    parser.add_argument(
+        "--param",
+        action="append",
+        default=[],
+        help="Parameter in the form path=value (can be repeated), see headless.py",
+    )
+    parser.add_argument("--output", default="islands.csv", help="Output CSV file")
+    parser.add_argument(
+        "--vectorized", action="store_true", help="Use the array based engine"
+    )
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    args = parse_args()
+    params, food_cloner = create_default_params()
+    for path, (value,) in parse_grid(args.param).items():
+        if path.startswith("food_cloner."):
+            food_cloner = replace_path(food_cloner, path[len("food_cloner.") :], value)
+        else:
+            params = replace_path(params, path, value)
+    config = IslandConfig(
+        params,
+        food_cloner,
+        islands=args.islands,
+        max_ticks=args.ticks,
+        migration_interval=args.interval,
+        migrants=args.migrants,
+        seed=args.seed,
+        vectorized=args.vectorized,
+    )
+    start_time = time.perf_counter()
+    run_islands(config, args.output)
+    print(
+        f"Ran {args.islands} islands x {args.ticks} ticks "
+        f"in {time.perf_counter() - start_time:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
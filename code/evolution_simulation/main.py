@@ -1,31 +1,69 @@
 # -*- coding: utf-8 -*-
 """Evolution simulation of animals hunting for food.
-Press Escape to exit, ENTER to init new simulation.
+Press Escape to exit, ENTER to init new simulation, T to toggle the telemetry overlay,
+S to save a snapshot of the simulation and L to resume from the last snapshot.
+Press W to switch between fixed, adaptive and uncapped time warp, + and - to speed up
+or slow down and D to disable or enable rendering. Press P to start profiling, and P
+again to print the profile report.
 """
 from __future__ import annotations
 
+import copy
+import dataclasses
+import functools
+import itertools
+import os
 import random
-import statistics
+import time
 from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any
 from typing import DefaultDict
+from typing import Dict
 from typing import List
+from typing import Optional
+from typing import Protocol
+from typing import Tuple
 
 import pygame
 from src.coordinate import Coordinate
 from src.entity import Animal
 from src.entity import Food
 from src.entity import FoodCloner
+from src.genome import create_animal_layout
+from src.genome import GenomeLayout
+from src.metrics import MetricsHistory
+from src.metrics import MetricsSample
+from src.metrics import TraitStatistics
 from src.params import AnimalParams
+from src.params import FoodFieldParams
 from src.params import FoodParams
 from src.params import RunnerParams
 from src.params import Stat
 from src.plotting import plot_data
-from src.plotting import PlotData
+from src.profiling import PROFILER
+from src.rendering import EntityRenderer
+from src.rng import RandomGenerators
+from src.search import ArrayPositionClusterer
 from src.search import PositionBinner
 from src.search import PositionClusterer
 from src.search import RandomSearchAlgorithm
-from src.search import SimplePositionClusterer
 from src.search import SimplePositionLerper
+from src.snapshot import load_snapshot
+from src.snapshot import save_snapshot
+from src.telemetry import TelemetryOverlay
+from src.telemetry import TelemetryWriter
+from src.timewarp import TimeWarp
+
+try:
+    from src.engine import ArraySimulation
+except ImportError:
+    ArraySimulation = None  # type: ignore # pylint: disable=invalid-name
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 SEED = random.randint(0, 10000)
 FRAMERATE = 60
@@ -35,51 +73,75 @@ ANIMAL_VISION_DISPERSION = 20
 ANIMAL_COLOUR_DISPERSION = 20
 ANIMAL_CLONING_SIZE_FACTOR = 0.7
 RANDOM_NEW_ANIMAL_CHANCE = 0.3
+SNAPSHOT_PATH = "snapshot.evo"
+ANIMAL_STATE = (
+    "size",
+    "speed",
+    "food_size_factor",
+    "vision",
+    "food_reach_distance",
+    "energy_loss",
+    "cloning_size",
+)
+FOOD_STATE = ("size", "energy", "energy_decay", "INITIAL_ENERGY", "_eaten")
 
 
-def generate_random_position(screen_offset: int = 0) -> Coordinate:
+def generate_random_position(
+    screen_offset: int = 0, rng: Optional[random.Random] = None
+) -> Coordinate:
     """Generates a random position on the screen. The minimum distance to the screen borders
-    can be specified using the optional screen_offset parameter.
+    can be specified using the optional screen_offset parameter. Uses the specified random
+    generator, or the global random state if None.
     """
+    rng_ = rng if rng is not None else random
     return Coordinate(
-        random.randint(screen_offset, int(SCREEN_SIZE.x) - screen_offset),
-        random.randint(screen_offset, int(SCREEN_SIZE.y) - screen_offset),
+        rng_.randint(screen_offset, int(SCREEN_SIZE.x) - screen_offset),
+        rng_.randint(screen_offset, int(SCREEN_SIZE.y) - screen_offset),
     )
 
 
-def init_foods(params: FoodParams, clusterer: PositionClusterer) -> List[Food]:
+def init_foods(
+    params: FoodParams,
+    clusterer: PositionClusterer,
+    rng: Optional[RandomGenerators] = None,
+) -> List[Food]:
     """Initialises a list of foods in random clustered positions using the specified parameters"""
+    python_rng = rng.python if rng is not None else None
     positions = [
-        generate_random_position(params.screen_offset)
+        generate_random_position(params.screen_offset, python_rng)
         for _ in range(params.initial_amount)
     ]
     clustered_positions = clusterer.cluster_positions(positions)
 
     return [
         Food(
-            size=params.size.compute_random_number(),
-            energy=max(0, params.energy.compute_random_number()),
-            energy_decay=params.energy_decay.compute_random_number(),
+            size=params.size.compute_random_number(rng),
+            energy=max(0, params.energy.compute_random_number(rng)),
+            energy_decay=params.energy_decay.compute_random_number(rng),
             position=position,
         )
         for position in clustered_positions
     ]
 
 
-def init_animals(params: AnimalParams, amount: int) -> List[Animal]:
+def init_animals(
+    params: AnimalParams, amount: int, rng: Optional[RandomGenerators] = None
+) -> List[Animal]:
     """Initialises a list of animals in random positions using the specified parameters"""
-    positions = [generate_random_position() for _ in range(amount)]
+    python_rng = rng.python if rng is not None else None
+    position_generator = functools.partial(generate_random_position, rng=python_rng)
+    positions = [position_generator() for _ in range(amount)]
     return [
         Animal(
-            food_size_factor=params.food_size_factor.compute_random_number(),
+            food_size_factor=params.food_size_factor.compute_random_number(rng),
             search_algorithm=params.search_algorithm,
-            size=params.size.compute_random_number(),
-            speed=params.speed.compute_random_number(),
-            vision=int(params.vision.compute_random_number()),
-            food_reach_distance=params.food_reach_distance.compute_random_number(),
-            energy_loss=params.energy_loss.compute_random_number(),
-            cloning_size=params.cloning_size.compute_random_number(),
-            random_position_generator=generate_random_position,
+            size=params.size.compute_random_number(rng),
+            speed=params.speed.compute_random_number(rng),
+            vision=int(params.vision.compute_random_number(rng)),
+            food_reach_distance=params.food_reach_distance.compute_random_number(rng),
+            energy_loss=params.energy_loss.compute_random_number(rng),
+            cloning_size=params.cloning_size.compute_random_number(rng),
+            random_position_generator=position_generator,
             position=position,
         )
         for position in positions
@@ -88,62 +150,374 @@ def init_animals(params: AnimalParams, amount: int) -> List[Animal]:
 
 def clone_animals(
     animals: List[Animal],
+    layout: GenomeLayout,
     dispersion: int = 20,
-    vision_dispersion: int = 20,
-    colour_dispersion: int = 20,
     cloning_size_factor: float = 0.5,
+    rng: Optional[RandomGenerators] = None,
 ):
-    """Appends a number of clones the specified list of animals"""
+    """Appends a mutated clone of each animal that reached its cloning size to the
+    specified list of animals. The genomes of all parents are mutated in a single batch
+    (if numpy is available). Uses the specified random generators, or unseeded ones if
+    None.
+    """
+    parents = [animal for animal in animals if animal.size >= animal.cloning_size]
+    if not parents:
+        return
+
+    rng_ = rng if rng is not None else RandomGenerators.from_seed()
+    genomes = [layout.encode_entity(animal) for animal in parents]
+    if rng_.numpy is not None:
+        genomes = layout.mutate(numpy.array(genomes), rng_.numpy).tolist()
+    else:
+        genomes = [layout.mutate_values(genome, rng_.python) for genome in genomes]
 
     def _rand(x: float) -> float:  # pylint: disable=invalid-name
-        return x + random.randint(0, dispersion)
+        return x + rng_.python.randint(0, dispersion)
 
     new_animals: List[Animal] = []
-    for animal in animals:
-        if animal.size < animal.cloning_size:
-            continue
-
+    for animal, genome in zip(parents, genomes):
+        traits = layout.decode_entity(genome)
+        # the colour is not a constructor argument, it overrides the cached property
+        colour = traits.pop("colour", None)
         new_animal = Animal(
             size=max(1, (1 - cloning_size_factor) * animal.size),
-            speed=max(0.05, animal.speed * (1 + (+random.random() - 0.5) / 20)),
             position=Coordinate(x=_rand(animal.position.x), y=_rand(animal.position.y)),
-            food_size_factor=animal.food_size_factor,
-            food_reach_distance=animal.food_reach_distance,
-            energy_loss=max(
-                0, animal.energy_loss * (1 + (+random.random() - 0.5) / 20)
-            ),
-            cloning_size=max(0, animal.cloning_size + random.random()),
             search_algorithm=animal.search_algorithm,
-            random_position_generator=generate_random_position,
-            vision=max(
-                1,
-                animal.vision + random.randint(-vision_dispersion, vision_dispersion),
-            ),
+            random_position_generator=animal.random_position_generator,
+            **traits,
         )
+        if colour is not None:
+            new_animal.colour = colour  # type: ignore
         animal.size *= min(1, cloning_size_factor)
-
-        r, g, b = animal.colour  # pylint: disable=invalid-name
-        red_offset = random.randint(-colour_dispersion, colour_dispersion)
-        new_animal.colour = (min(255, max(0, r + red_offset)), g, b)  # type: ignore
         new_animals.append(new_animal)
     animals.extend(new_animals)
 
 
-def main(params: RunnerParams, food_cloner: FoodCloner):
-    """Main function"""
-    # pylint: disable=no-member
+class Simulation(Protocol):
+    """Interface for an evolution simulation"""
+
+    def reset(self):
+        """Initialises new foods and animals"""
+        ...
+
+    def step(self) -> bool:
+        """Advances the simulation by one tick. Returns False if all animals or all
+        foods died out, else True.
+        """
+        ...
+
+    def draw(self, screen: pygame.surface.Surface):
+        """Draws all foods and animals on the screen"""
+        ...
+
+    def sample(self) -> MetricsSample:
+        """Returns the current animal and food statistics"""
+        ...
+
+    def get_state(self) -> Dict[str, Any]:
+        """Returns the complete state of the simulation, see set_state"""
+        ...
+
+    def set_state(self, state: Dict[str, Any]):
+        """Restores the state returned by get_state of a simulation of the same type"""
+        ...
+
+    def emigrate(self, amount: int) -> Dict[str, Any]:
+        """Removes up to the specified amount of random animals and returns them as
+        columns, see immigrate.
+        """
+        ...
+
+    def immigrate(self, columns: Dict[str, Any]):
+        """Adds the animals returned by emigrate of a simulation of the same type"""
+        ...
+
+
+@dataclass
+class ObjectSimulation:  # pylint: disable=too-many-instance-attributes
+    """Evolution simulation of Animal and Food objects. All random numbers are drawn
+    from generators owned by the simulation, seeded with the specified seed.
+    """
+
+    params: RunnerParams
+    food_cloner: FoodCloner
+    seed: Optional[int] = None
+
+    def __post_init__(self):
+        self.rng = RandomGenerators.from_seed(self.seed)
+        # each simulation gets its own copy of the (stateful) search algorithm
+        search_algorithm = copy.deepcopy(self.params.animal.search_algorithm)
+        if hasattr(search_algorithm, "rng"):
+            search_algorithm.rng = self.rng.python  # type: ignore
+        self.params = dataclasses.replace(
+            self.params,
+            animal=dataclasses.replace(
+                self.params.animal, search_algorithm=search_algorithm
+            ),
+        )
+        self.search_algorithm = search_algorithm
+        self.genome_layout = create_animal_layout(
+            ANIMAL_VISION_DISPERSION, ANIMAL_COLOUR_DISPERSION
+        )
+        self.traits = TraitStatistics()
+        self.renderer = EntityRenderer()
+        self.foods: List[Food] = []
+        self.reset()
+
+    def reset(self):
+        """Initialises new foods and animals"""
+        self._replace_foods(
+            init_foods(self.params.food, self.params.position_clusterer, self.rng)
+        )
+        self.animals = init_animals(
+            self.params.animal, self.params.animal.initial_amount, self.rng
+        )
+        self.traits.clear()
+        self.traits.add_entities(self.animals)
+
+    def step(self) -> bool:
+        """Advances the simulation by one tick. Returns False if all animals or all
+        foods died out, else True.
+        """
+        profiler = PROFILER
+        with profiler.scope("remove_dead"):
+            animals = [animal for animal in self.animals if not animal.dead]
+            self.traits.remove_entities(x for x in self.animals if x.dead)
+            foods = [food for food in self.foods if not food.dead]
+            self.search_algorithm.remove_entities(x for x in self.foods if x.dead)
+        amount_foods = len(foods)
+        with profiler.scope("clone_foods"):
+            self.food_cloner.clone(foods, SCREEN_SIZE, self.rng.python)
+        with profiler.scope("search_update"):
+            self.search_algorithm.add_entities(foods[amount_foods:])
+            self.search_algorithm.update(foods)  # type: ignore
+
+        with profiler.scope("update_animals"):
+            foods_dict: DefaultDict[Coordinate, List[Food]] = defaultdict(list)
+            for food in foods:
+                foods_dict[food.position].append(food)
+            for animal in reversed(animals):
+                animal.update(foods, foods_dict)
+        with profiler.scope("update_foods"):
+            for food in foods:
+                food.update()
+        amount_animals = len(animals)
+        with profiler.scope("clone_animals"):
+            clone_animals(
+                animals,
+                self.genome_layout,
+                dispersion=ANIMAL_CLONE_DISPERSION,
+                cloning_size_factor=ANIMAL_CLONING_SIZE_FACTOR,
+                rng=self.rng,
+            )
+
+        if RANDOM_NEW_ANIMAL_CHANCE >= self.rng.python.random():
+            animals.extend(init_animals(self.params.animal, amount=1, rng=self.rng))
+        self.traits.add_entities(animals[amount_animals:])
+        profiler.count("animals", len(animals))
+        profiler.count("foods", len(foods))
+        profiler.count("births", len(animals) - amount_animals)
+        self.animals, self.foods = animals, foods
+        return bool(animals and foods)
+
+    def draw(self, screen: pygame.surface.Surface):
+        """Draws all foods and animals on the screen"""
+        self.renderer.draw(
+            screen, itertools.chain(self.foods, self.animals)  # type: ignore
+        )
+
+    def get_state(self) -> Dict[str, Any]:
+        """Returns the complete state of the simulation as columns of plain values,
+        see set_state. Search algorithms and position generators are not part of the
+        state, they are recreated from the simulation's own parameters and generators.
+        """
+        animals, foods = self.animals, self.foods
+        return {
+            "engine": "object",
+            "animals": self._get_animal_columns(animals),
+            "foods": {
+                **{name: [getattr(x, name) for x in foods] for name in FOOD_STATE},
+                "position": [tuple(x.position) for x in foods],
+                "colour": [x.__dict__.get("colour") for x in foods],
+            },
+            "rng": self.rng.get_state(),
+            "traits": self.traits.get_state(),
+        }
+
+    def set_state(self, state: Dict[str, Any]):
+        """Replaces all animals, foods and random generator states with the ones in the
+        specified state, see get_state.
+        """
+        if state["engine"] != "object":
+            raise ValueError(
+                f"Cannot restore {state['engine']} state into {type(self).__name__}"
+            )
+
+        animals = self._create_animals(state["animals"])
+        foods = []
+        columns = state["foods"]
+        for values, position, colour in zip(
+            zip(*(columns[name] for name in FOOD_STATE)),
+            columns["position"],
+            columns["colour"],
+        ):
+            size, energy, energy_decay, initial_energy, eaten = values
+            food = Food(size, energy, energy_decay, Coordinate(*position))
+            food.INITIAL_ENERGY = initial_energy
+            food._eaten = eaten  # pylint: disable=protected-access
+            if colour is not None:
+                food.colour = colour  # type: ignore
+            foods.append(food)
+
+        self.animals = animals
+        self._replace_foods(foods)
+        self.rng.set_state(state["rng"])
+        self.traits.set_state(state["traits"])
+
+    def emigrate(self, amount: int) -> Dict[str, Any]:
+        """Removes up to the specified amount of random animals and returns them as
+        columns, see immigrate. Migrants forget their targets.
+        """
+        amount = min(amount, len(self.animals))
+        indices = set(self.rng.python.sample(range(len(self.animals)), amount))
+        migrants = [x for i, x in enumerate(self.animals) if i in indices]
+        self.animals = [x for i, x in enumerate(self.animals) if i not in indices]
+        self.traits.remove_entities(migrants)
+        columns = self._get_animal_columns(migrants)
+        columns["target_position"] = [None] * amount
+        return columns
+
+    def immigrate(self, columns: Dict[str, Any]):
+        """Adds the animals returned by emigrate of another ObjectSimulation"""
+        animals = self._create_animals(columns)
+        self.animals.extend(animals)
+        self.traits.add_entities(animals)
+
+    def _replace_foods(self, foods: List[Food]):
+        self.search_algorithm.remove_entities(self.foods)
+        self.search_algorithm.add_entities(foods)
+        self.foods = foods
+
+    @staticmethod
+    def _get_animal_columns(animals: List[Animal]) -> Dict[str, List[Any]]:
+        return {
+            **{name: [getattr(x, name) for x in animals] for name in ANIMAL_STATE},
+            "position": [tuple(x.position) for x in animals],
+            "target_position": [
+                None if x.target_position is None else tuple(x.target_position)
+                for x in animals
+            ],
+            # colours are cached properties, only stored if they were computed
+            "colour": [x.__dict__.get("colour") for x in animals],
+        }
+
+    def _create_animals(self, columns: Dict[str, List[Any]]) -> List[Animal]:
+        position_generator = functools.partial(
+            generate_random_position, rng=self.rng.python
+        )
+        animals = []
+        for values, position, target_position, colour in zip(
+            zip(*(columns[name] for name in ANIMAL_STATE)),
+            columns["position"],
+            columns["target_position"],
+            columns["colour"],
+        ):
+            animal = Animal(
+                **dict(zip(ANIMAL_STATE, values)),
+                position=Coordinate(*position),
+                search_algorithm=self.search_algorithm,  # type: ignore
+                random_position_generator=position_generator,
+            )
+            if target_position is not None:
+                animal.target_position = Coordinate(*target_position)
+            if colour is not None:
+                animal.colour = colour  # type: ignore
+            animals.append(animal)
+        return animals
+
+    def sample(self) -> MetricsSample:
+        """Returns the current animal and food statistics. The means of the inherited
+        traits are kept up to date as animals are born and die, only size and food
+        energy change every tick.
+        """
+        animals, foods = self.animals, self.foods
+        traits = self.traits
+        return MetricsSample(
+            vision=traits["vision"],
+            size=sum(x.size for x in animals) / len(animals),
+            speed=traits["speed"],
+            energy_loss=traits["energy_loss"],
+            food_energy=sum(x.energy for x in foods) / len(foods),
+            food_amount=len(foods),
+            animal_amount=len(animals),
+        )
+
+
+def create_simulation(
+    params: RunnerParams,
+    food_cloner: FoodCloner,
+    vectorized: bool = False,
+    seed: int = SEED,
+    food_field: Optional[FoodFieldParams] = None,
+) -> Simulation:
+    """Returns a new simulation using the specified parameters. If vectorized is True,
+    the simulation runs on the array based engine (requires numpy). If food field
+    parameters are specified, food is simulated as a density grid (only supported by
+    the array based engine).
+    """
+    if food_field is not None and not vectorized:
+        raise ValueError("The food field is only supported by the vectorized engine")
+    if not vectorized:
+        return ObjectSimulation(params, food_cloner, seed=seed)
+
+    if ArraySimulation is None:
+        raise ImportError("The vectorized simulation requires numpy")
+    return ArraySimulation(
+        params,
+        food_cloner,
+        screen_size=SCREEN_SIZE,
+        seed=seed,
+        dispersion=ANIMAL_CLONE_DISPERSION,
+        vision_dispersion=ANIMAL_VISION_DISPERSION,
+        colour_dispersion=ANIMAL_COLOUR_DISPERSION,
+        cloning_size_factor=ANIMAL_CLONING_SIZE_FACTOR,
+        random_new_animal_chance=RANDOM_NEW_ANIMAL_CHANCE,
+        food_field_params=food_field,
+    )
+
+
+def main(  # pylint: disable=too-many-arguments
+    params: RunnerParams,
+    food_cloner: FoodCloner,
+    vectorized: bool = False,
+    telemetry_path: Optional[str] = None,
+    time_warp: Optional[TimeWarp] = None,
+    food_field: Optional[FoodFieldParams] = None,
+):
+    """Main function. If vectorized is True, the simulation runs on the array based
+    engine (requires numpy). If a telemetry path is specified, the metrics of every
+    tick are written to it (CSV, or Parquet if the path ends with .parquet).
+    The time warp decides how many ticks are run per rendered frame, by default one.
+    Food field parameters replace individual foods by a density grid, see
+    create_simulation.
+    """
+    # pylint: disable=no-member,too-many-branches,too-many-locals,too-many-statements
     print(f"{SEED=}")
-    random.seed(SEED)
-    foods = init_foods(params.food, params.position_clusterer)
-    animals = init_animals(params.animal, params.animal.initial_amount)
-    search_algorithm = params.animal.search_algorithm
+    simulation = create_simulation(
+        params, food_cloner, vectorized, seed=SEED, food_field=food_field
+    )
     pygame.init()
     clock = pygame.time.Clock()
     screen = pygame.display.set_mode(size=tuple(SCREEN_SIZE))
     terminated = False
 
-    plotting_data = PlotData()
-    while not terminated:
+    history = MetricsHistory()
+    overlay = TelemetryOverlay()
+    writer = TelemetryWriter(telemetry_path) if telemetry_path is not None else None
+    warp = time_warp if time_warp is not None else TimeWarp()
+    warp.target_frame_time = 1000 / FRAMERATE
+    running = True
+    while running and not terminated:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 terminated = True
@@ -151,88 +525,101 @@ def main(params: RunnerParams, food_cloner: FoodCloner):
                 if event.key == pygame.K_ESCAPE:
                     terminated = True
                 if event.key == pygame.K_RETURN:
-                    foods = init_foods(params.food, params.position_clusterer)
-                    animals = init_animals(params.animal, params.animal.initial_amount)
-
-        animals = [animal for animal in animals if not animal.dead]
-        foods = [food for food in foods if not food.dead]
-        food_cloner.clone(foods, SCREEN_SIZE)
-        search_algorithm.update(foods)  # type: ignore
-
-        foods_dict: DefaultDict[Coordinate, List[Food]] = defaultdict(list)
-        for food in foods:
-            foods_dict[food.position].append(food)
-        for animal in reversed(animals):
-            animal.update(foods, foods_dict)
-        for food in foods:
-            food.update()
-        clone_animals(
-            animals,
-            dispersion=ANIMAL_CLONE_DISPERSION,
-            vision_dispersion=ANIMAL_VISION_DISPERSION,
-            colour_dispersion=ANIMAL_COLOUR_DISPERSION,
-            cloning_size_factor=ANIMAL_CLONING_SIZE_FACTOR,
-        )
+                    simulation.reset()
+                if event.key == pygame.K_t:
+                    overlay.toggle()
+                if event.key == pygame.K_s:
+                    save_snapshot(SNAPSHOT_PATH, simulation, history)
+                if event.key == pygame.K_l and os.path.isfile(SNAPSHOT_PATH):
+                    try:
+                        restored = load_snapshot(SNAPSHOT_PATH, simulation)
+                    except ValueError as exc:
+                        print(f"Could not load snapshot: {exc}")
+                    else:
+                        if restored is not None:
+                            history = restored
+                if event.key == pygame.K_d:
+                    warp.toggle_rendering()
+                if event.key == pygame.K_w:
+                    warp.cycle_mode()
+                if event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                    warp.change_speed(2)
+                if event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    warp.change_speed(0.5)
+                if event.key == pygame.K_p:
+                    PROFILER.toggle()
+                    if not PROFILER.enabled:
+                        PROFILER.dump()
 
-        if RANDOM_NEW_ANIMAL_CHANCE >= random.random():
-            animals.extend(init_animals(params.animal, amount=1))
+        sample = None
+        for _ in warp.ticks():
+            with PROFILER.scope("tick"):
+                running = simulation.step()
+            if not running:
+                break
+            sample = simulation.sample()
+            if writer is not None:
+                writer.write(history.tick, sample)
+            history.append(sample)
+        if sample is not None:
+            overlay.update(sample)
 
-        screen.fill((0, 0, 0))
-        for entity in foods + animals:  # type: ignore
-            entity.draw(screen)
-        pygame.display.flip()
-        clock.tick(FRAMERATE)
-
-        if not animals or not foods:
-            break
-
-        plotting_data.vision.append(statistics.mean(x.vision for x in animals))
-        plotting_data.size.append(statistics.mean(x.size for x in animals))
-        plotting_data.speed.append(statistics.mean(x.speed for x in animals))
-        plotting_data.energy_loss.append(
-            statistics.mean(x.energy_loss for x in animals)
-        )
-        plotting_data.food_energy.append(statistics.mean(x.energy for x in foods))
-        plotting_data.food_amount.append(len(foods))
-        plotting_data.animal_amount.append(len(animals))
+        if warp.rendering:
+            render_start = time.perf_counter()
+            with PROFILER.scope("render"):
+                screen.fill((0, 0, 0))
+                simulation.draw(screen)
+                overlay.draw(screen)
+                pygame.display.flip()
+            warp.rendered((time.perf_counter() - render_start) * 1000)
+        # a frame of the main loop is profiled as one tick, including its rendering
+        PROFILER.end_tick()
+        pygame.display.set_caption(f"Evolution simulation: {warp}")
+        if warp.caps_frame_rate:
+            clock.tick(FRAMERATE)
 
     pygame.display.quit()
-    plot_data(plotting_data, "output.png")
+    if writer is not None:
+        writer.close()
+    plot_data(history.to_plot_data(), "output.png")
 
 
-if __name__ == "__main__":
-    main(
-        params=RunnerParams(
-            food=FoodParams(
-                initial_amount=500,
-                energy=Stat(average=10, standard_deviation=4, min=1),
-                energy_decay=Stat(average=0.7),
-            ),
-            animal=AnimalParams(
-                search_algorithm=RandomSearchAlgorithm(50),
-                initial_amount=50,
-                vision=Stat(average=70, standard_deviation=10, min=1),
-                energy_loss=Stat(
-                    average=0.000025, standard_deviation=0.00001, min=0.00001
-                ),
-                cloning_size=Stat(average=25, standard_deviation=5),
-                food_reach_distance=Stat(average=10, standard_deviation=2, min=1),
-                speed=Stat(average=5, standard_deviation=0.5, min=0.3),
-                food_size_factor=Stat(average=1),
-            ),
-            position_clusterer=SimplePositionClusterer(
-                PositionBinner(100), SimplePositionLerper(0.1)
-            ),
+def create_default_params() -> Tuple[RunnerParams, FoodCloner]:
+    """Returns the default simulation parameters and food cloner"""
+    params = RunnerParams(
+        food=FoodParams(
+            initial_amount=500,
+            energy=Stat(average=10, standard_deviation=4, min=1),
+            energy_decay=Stat(average=0.7),
+        ),
+        animal=AnimalParams(
+            search_algorithm=RandomSearchAlgorithm(50),
+            initial_amount=50,
+            vision=Stat(average=70, standard_deviation=10, min=1),
+            energy_loss=Stat(average=0.000025, standard_deviation=0.00001, min=0.00001),
+            cloning_size=Stat(average=25, standard_deviation=5),
+            food_reach_distance=Stat(average=10, standard_deviation=2, min=1),
+            speed=Stat(average=5, standard_deviation=0.5, min=0.3),
+            food_size_factor=Stat(average=1),
         ),
-        food_cloner=FoodCloner(
-            chance=0.05,
-            size_dispersion=0.2,
-            energy_dispersion=0.2,
-            max_dispersion=50,
-            max_length=800,
-            max_size=12,
-            min_size=3,
-            min_energy=2,
-            energy_decay_factor=0.8,
+        position_clusterer=ArrayPositionClusterer(
+            PositionBinner(100), SimplePositionLerper(0.1)
         ),
     )
+    food_cloner = FoodCloner(
+        chance=0.05,
+        size_dispersion=0.2,
+        energy_dispersion=0.2,
+        max_dispersion=50,
+        max_length=800,
+        max_size=12,
+        min_size=3,
+        min_energy=2,
+        energy_decay_factor=0.8,
+    )
+    return params, food_cloner
+
+
+if __name__ == "__main__":
+    default_params, default_food_cloner = create_default_params()
+    main(params=default_params, food_cloner=default_food_cloner)
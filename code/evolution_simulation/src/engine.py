@@ -0,0 +1,493 @@
+# -*- coding: utf-8 -*-
+"""Contains an array based simulation engine, which simulates animals and foods as
+columns of numpy arrays instead of individual Animal and Food objects.
+
+The engine follows the same rules as the object model in main.py, but all animals and
+foods are updated at once using batched array operations. Requires numpy.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+from typing import Dict
+from typing import Optional
+
+import numpy
+import pygame
+from src.coordinate import Coordinate
+from src.entity import Animal
+from src.entity import Food
+from src.entity import FoodCloner
+from src.food_field import FoodField
+from src.genome import create_animal_layout
+from src.genome import GenomeLayout
+from src.metrics import MetricsSample
+from src.metrics import TraitStatistics
+from src.params import AnimalParams
+from src.params import FoodFieldParams
+from src.params import RunnerParams
+from src.profiling import PROFILER
+from src.rendering import EntityRenderer
+from src.rng import RandomGenerators
+from src.search import array_to_positions
+from src.search import positions_to_array
+
+# pylint: disable=c-extension-no-member
+
+Columns = Dict[str, numpy.ndarray]
+
+
+@dataclass
+class Table:
+    """Named numpy arrays of equal length, one row per entity"""
+
+    columns: Columns
+
+    def __getitem__(self, name: str) -> numpy.ndarray:
+        return self.columns[name]
+
+    def __setitem__(self, name: str, value: numpy.ndarray):
+        self.columns[name] = value
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values())))
+
+    def filter(self, mask: numpy.ndarray):
+        """Only keeps the rows for which the mask is True"""
+        self.columns = {name: array[mask] for name, array in self.columns.items()}
+
+    def extend(self, columns: Columns):
+        """Appends the rows in the specified columns to the table"""
+        self.columns = {
+            name: numpy.concatenate((array, columns[name]))
+            for name, array in self.columns.items()
+        }
+
+
+def compute_food_colours(energies: numpy.ndarray) -> numpy.ndarray:
+    """Returns the colours of foods with the specified energies, see Food.colour"""
+    red, green, blue = Food.base_food_colour
+    offsets = (Food.food_quality_colour_factor * energies).astype(int)
+    colours = numpy.empty((len(energies), 3), dtype=int)
+    colours[:, 0] = numpy.clip(red - offsets, 0, 255)
+    colours[:, 1] = green
+    colours[:, 2] = numpy.clip(blue - offsets, 0, 255)
+    return colours
+
+
+@dataclass
+class ArraySimulation:  # pylint: disable=too-many-instance-attributes
+    """Array based evolution simulation of animals hunting for food.
+
+    Targets are chosen like the RandomSearchAlgorithm does: each tick, a random subset
+    of max_entities_considered foods is picked and each animal targets the first food
+    of that subset within its vision.
+    """
+
+    params: RunnerParams
+    food_cloner: FoodCloner
+    screen_size: Coordinate
+    seed: Optional[int] = None
+    dispersion: int = 20
+    vision_dispersion: int = 20
+    colour_dispersion: int = 20
+    cloning_size_factor: float = 0.5
+    random_new_animal_chance: float = 0
+    max_entities_considered: int = 50
+    chunk_size: int = 8192
+    genome_layout: Optional[GenomeLayout] = None
+    food_field_params: Optional[FoodFieldParams] = None
+
+    def __post_init__(self):
+        self.rng = RandomGenerators.from_seed(self.seed)
+        if self.genome_layout is None:
+            self.genome_layout = create_animal_layout(
+                self.vision_dispersion, self.colour_dispersion
+            )
+        self.max_entities_considered = getattr(
+            self.params.animal.search_algorithm,
+            "max_entities_considered",
+            self.max_entities_considered,
+        )
+        self.food_field: Optional[FoodField] = None
+        if self.food_field_params is not None:
+            self.food_field = FoodField(self.food_field_params, self.screen_size)
+        self.traits = TraitStatistics()
+        self.renderer = EntityRenderer()
+        self.reset()
+
+    def reset(self):
+        """Initialises new foods and animals. If the simulation uses a food field, the
+        initial foods are added to the field instead.
+        """
+        self.foods = self.init_foods()
+        if self.food_field is not None:
+            self.food_field.seed(self.foods["position"], self.foods["energy"])
+            self.foods.filter(numpy.zeros(len(self.foods), dtype=bool))
+        self.animals = Table(self.init_animals(self.params.animal.initial_amount))
+        self.traits.clear()
+        self.traits.add_columns(self.animals.columns)
+
+    def init_foods(self) -> Table:
+        """Returns a table of foods in random clustered positions"""
+        params = self.params.food
+        offset = params.screen_offset
+        amount = params.initial_amount
+        positions = self._generate_random_positions(amount, offset)
+        clusterer = self.params.position_clusterer
+        if getattr(clusterer, "supports_arrays", False):
+            clustered_positions = clusterer.cluster_array(positions)  # type: ignore
+        else:
+            clustered_positions = positions_to_array(
+                clusterer.cluster_positions(array_to_positions(positions))
+            )
+        energies = numpy.maximum(
+            0, params.energy.compute_random_numbers(amount, self.rng)
+        )
+        return Table(
+            {
+                "position": clustered_positions,
+                "size": params.size.compute_random_numbers(amount, self.rng),
+                "energy": energies,
+                "initial_energy": energies.copy(),
+                "energy_decay": params.energy_decay.compute_random_numbers(
+                    amount, self.rng
+                ),
+                "colour": compute_food_colours(energies),
+                "eaten": numpy.zeros(amount, dtype=bool),
+            }
+        )
+
+    def init_animals(self, amount: int) -> Columns:
+        """Returns the columns of the specified amount of new animals in random positions"""
+        params: AnimalParams = self.params.animal
+        rng = self.rng
+        colour = numpy.empty((amount, 3), dtype=int)
+        colour[:] = Animal.base_animal_colour
+        return {
+            "position": self._generate_random_positions(amount),
+            "target": numpy.zeros((amount, 2)),
+            "has_target": numpy.zeros(amount, dtype=bool),
+            "target_food": numpy.full(amount, -1),
+            "size": params.size.compute_random_numbers(amount, rng),
+            "speed": params.speed.compute_random_numbers(amount, rng),
+            "vision": params.vision.compute_random_numbers(amount, rng).astype(int),
+            "food_reach_distance": params.food_reach_distance.compute_random_numbers(
+                amount, rng
+            ),
+            "energy_loss": params.energy_loss.compute_random_numbers(amount, rng),
+            "cloning_size": params.cloning_size.compute_random_numbers(amount, rng),
+            "food_size_factor": params.food_size_factor.compute_random_numbers(
+                amount, rng
+            ),
+            "colour": colour,
+        }
+
+    def step(self) -> bool:
+        """Advances the simulation by one tick. Returns False if all animals or all
+        foods died out, else True.
+        """
+        profiler = PROFILER
+        with profiler.scope("remove_dead"):
+            self._remove_dead()
+        with profiler.scope("clone_foods"):
+            self.clone_foods()
+        if self.food_field is not None:
+            with profiler.scope("food_field"):
+                self.food_field.step()
+        with profiler.scope("update_animals"):
+            self.update_animals()
+        with profiler.scope("update_foods"):
+            self.foods["energy"] -= numpy.maximum(0, self.foods["energy_decay"])
+        amount_animals = len(self.animals)
+        with profiler.scope("clone_animals"):
+            self.clone_animals()
+        if self.random_new_animal_chance >= self.rng.numpy.random():
+            self.animals.extend(self.init_animals(amount=1))
+        born = numpy.arange(len(self.animals)) >= amount_animals
+        self.traits.add_columns(self.animals.columns, born)
+        profiler.count("animals", len(self.animals))
+        profiler.count("foods", len(self.foods))
+        profiler.count("births", len(self.animals) - amount_animals)
+        return bool(len(self.animals) and self._count_foods())
+
+    def clone_foods(self):
+        """Adds clones of randomly chosen foods, see FoodCloner.clone"""
+        cloner = self.food_cloner
+        foods = self.foods
+        amount = len(foods)
+        if not amount or amount > cloner.max_length:
+            return
+
+        parents = numpy.flatnonzero(self.rng.numpy.random(amount) < cloner.chance)
+        if not len(parents):  # pylint: disable=len-as-condition
+            return
+
+        half_dispersion = cloner.max_dispersion / 2
+        positions = foods["position"][parents] + self._compute_dispersion(
+            (len(parents), 2), cloner.max_dispersion
+        )
+        screen_size = numpy.array(tuple(self.screen_size), dtype=float)
+        positions = numpy.clip(
+            positions, half_dispersion, screen_size - half_dispersion
+        )
+        size_factors = 1 + self._compute_dispersion(
+            len(parents), cloner.size_dispersion
+        )
+        energy_factors = 1 + self._compute_dispersion(
+            len(parents), cloner.energy_dispersion
+        )
+        energies = numpy.maximum(
+            cloner.min_energy, energy_factors * foods["initial_energy"][parents]
+        )
+        foods.extend(
+            {
+                "position": positions,
+                "size": numpy.clip(
+                    size_factors * foods["size"][parents],
+                    cloner.min_size,
+                    cloner.max_size,
+                ),
+                "energy": energies,
+                "initial_energy": energies.copy(),
+                "energy_decay": cloner.energy_decay_factor
+                * energy_factors
+                * foods["energy_decay"][parents],
+                "colour": compute_food_colours(energies),
+                "eaten": numpy.zeros(len(parents), dtype=bool),
+            }
+        )
+
+    def update_animals(self):
+        """Lets all animals lose energy, choose a target, move towards it and eat the
+        targeted food if they are close enough, see Animal.update.
+        """
+        animals = self.animals
+        animals["size"] -= numpy.maximum(
+            Animal.min_energy_loss,
+            animals["energy_loss"] * animals["speed"] * animals["vision"],
+        )
+        with PROFILER.scope("animal.search"):
+            if self.food_field is None:
+                self._choose_targets()
+            else:
+                self._choose_field_targets()
+
+        positions = animals["position"]
+        deltas = animals["target"] - positions
+        distances = numpy.hypot(deltas[:, 0], deltas[:, 1])
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            factors = numpy.where(
+                distances > 0, numpy.minimum(animals["speed"] / distances, 1), 0
+            )
+        positions += deltas * factors[:, None]
+
+        distances = numpy.hypot(*(animals["target"] - positions).T)
+        reached = distances <= numpy.maximum(0, animals["food_reach_distance"])
+        with PROFILER.scope("animal.eat"):
+            self._eat(numpy.flatnonzero(reached & (animals["target_food"] >= 0)))
+        animals["has_target"][reached] = False
+        animals["target_food"][reached] = -1
+        if self.food_field is not None:
+            animals["size"] += numpy.sqrt(
+                self.food_field.consume(positions) * animals["food_size_factor"]
+            )
+
+    def clone_animals(self):
+        """Adds a mutated clone of each animal that reached its cloning size and shrinks
+        the parent animals, see clone_animals in main.py.
+        """
+        animals = self.animals
+        parents = numpy.flatnonzero(animals["size"] >= animals["cloning_size"])
+        amount = len(parents)
+        if not amount:
+            return
+
+        rng = self.rng.numpy
+        sizes = animals["size"][parents]
+        # columns not covered by the genome layout are inherited unchanged
+        clones = {
+            name: array[parents].copy() for name, array in animals.columns.items()
+        }
+        layout = self.genome_layout
+        layout.decode_columns(  # type: ignore
+            layout.mutate(layout.encode_columns(animals, parents), rng),  # type: ignore
+            clones,
+        )
+        clones["position"] = animals["position"][parents] + rng.integers(
+            0, self.dispersion, (amount, 2), endpoint=True
+        )
+        clones["target"] = numpy.zeros((amount, 2))
+        clones["has_target"] = numpy.zeros(amount, dtype=bool)
+        clones["target_food"] = numpy.full(amount, -1)
+        clones["size"] = numpy.maximum(1, (1 - self.cloning_size_factor) * sizes)
+        animals["size"][parents] = sizes * min(1, self.cloning_size_factor)
+        animals.extend(clones)
+
+    def draw(self, screen: pygame.surface.Surface):
+        """Draws all foods (or the food field) and animals on the screen"""
+        field = self.food_field
+        if field is not None:
+            colours = compute_food_colours(field.energy.ravel())
+            field.draw(screen, colours.reshape(field.shape + (3,)))
+        for table in (self.foods, self.animals):
+            self.renderer.draw_arrays(
+                screen, table["position"], table["size"], table["colour"]
+            )
+
+    def get_state(self) -> Dict[str, Any]:
+        """Returns copies of all columns and the random generator states, see set_state"""
+        return {
+            "engine": "array",
+            "animals": {name: x.copy() for name, x in self.animals.columns.items()},
+            "foods": {name: x.copy() for name, x in self.foods.columns.items()},
+            "food_field": None
+            if self.food_field is None
+            else self.food_field.energy.copy(),
+            "rng": self.rng.get_state(),
+            "traits": self.traits.get_state(),
+        }
+
+    def set_state(self, state: Dict[str, Any]):
+        """Replaces all animals, foods and random generator states with the ones in the
+        specified state, see get_state.
+        """
+        if state["engine"] != "array":
+            raise ValueError(
+                f"Cannot restore {state['engine']} state into {type(self).__name__}"
+            )
+        self.animals = Table({name: x.copy() for name, x in state["animals"].items()})
+        self.foods = Table({name: x.copy() for name, x in state["foods"].items()})
+        if self.food_field is not None and state["food_field"] is not None:
+            self.food_field.set_energy(state["food_field"])
+        self.rng.set_state(state["rng"])
+        self.traits.set_state(state["traits"])
+
+    def emigrate(self, amount: int) -> Columns:
+        """Removes up to the specified amount of random animals and returns their
+        columns, see immigrate. Migrants forget their targets.
+        """
+        animals = self.animals
+        amount = min(amount, len(animals))
+        leaving = numpy.zeros(len(animals), dtype=bool)
+        leaving[self.rng.numpy.choice(len(animals), amount, replace=False)] = True
+        columns = {name: array[leaving] for name, array in animals.columns.items()}
+        columns["has_target"][:] = False
+        columns["target_food"][:] = -1
+        self.traits.remove_columns(animals.columns, leaving)
+        animals.filter(~leaving)
+        return columns
+
+    def immigrate(self, columns: Columns):
+        """Adds the animals returned by emigrate of another ArraySimulation"""
+        self.traits.add_columns(columns)
+        self.animals.extend(columns)
+
+    def sample(self) -> MetricsSample:
+        """Returns the current animal and food statistics"""
+        traits = self.traits
+        if self.food_field is None:
+            food_energies = self.foods["energy"]
+        else:
+            field = self.food_field
+            food_energies = field.energy[field.food_mask]
+        return MetricsSample(
+            vision=traits["vision"],
+            size=float(numpy.mean(self.animals["size"])),
+            speed=traits["speed"],
+            energy_loss=traits["energy_loss"],
+            food_energy=float(numpy.mean(food_energies)),
+            food_amount=len(food_energies),
+            animal_amount=len(self.animals),
+        )
+
+    def _count_foods(self) -> int:
+        if self.food_field is None:
+            return len(self.foods)
+        return int(numpy.count_nonzero(self.food_field.food_mask))
+
+    def _remove_dead(self):
+        alive = self.animals["size"] > 0
+        self.traits.remove_columns(self.animals.columns, ~alive)
+        self.animals.filter(alive)
+
+        foods = self.foods
+        alive = ~foods["eaten"] & (foods["energy"] > 0)
+        if alive.all():
+            return
+
+        # food indices targeted by the animals need to be remapped after filtering
+        new_indices = numpy.where(alive, numpy.cumsum(alive) - 1, -1)
+        target_food = self.animals["target_food"]
+        targeted = target_food >= 0
+        target_food[targeted] = new_indices[target_food[targeted]]
+        foods.filter(alive)
+
+    def _choose_targets(self):
+        animals = self.animals
+        food_positions = self.foods["position"]
+        amount = min(len(food_positions), self.max_entities_considered + 1)
+        candidates = self.rng.numpy.choice(
+            len(food_positions), size=amount, replace=False
+        )
+        candidate_positions = food_positions[candidates]
+
+        for start in range(0, len(animals) if amount else 0, self.chunk_size):
+            chunk = slice(start, start + self.chunk_size)
+            positions = animals["position"][chunk]
+            square_distances = (
+                positions[:, None, 0] - candidate_positions[None, :, 0]
+            ) ** 2 + (positions[:, None, 1] - candidate_positions[None, :, 1]) ** 2
+            within_vision = square_distances <= animals["vision"][chunk, None] ** 2
+            found = within_vision.any(axis=1)
+            first = candidates[numpy.argmax(within_vision, axis=1)]
+            animals["target"][chunk][found] = food_positions[first[found]]
+            animals["target_food"][chunk][found] = first[found]
+            animals["has_target"][chunk][found] = True
+        self._choose_wandering_targets()
+
+    def _choose_field_targets(self):
+        # animals target the richest cell of the food field within their vision
+        animals = self.animals
+        found, targets = self.food_field.find_richest(  # type: ignore
+            animals["position"], animals["vision"]
+        )
+        animals["target"][found] = targets[found]
+        animals["has_target"][found] = True
+        self._choose_wandering_targets()
+
+    def _choose_wandering_targets(self):
+        animals = self.animals
+        wandering = numpy.flatnonzero(~animals["has_target"])
+        animals["target"][wandering] = self._generate_random_positions(len(wandering))
+        animals["target_food"][wandering] = -1
+        animals["has_target"][wandering] = True
+
+    def _eat(self, animal_indices: numpy.ndarray):
+        animals = self.animals
+        foods = self.foods
+        target_food = animals["target_food"][animal_indices]
+        # the object model updates animals in reverse order, so if several animals
+        # reach the same food in one tick, the one with the highest index eats it
+        reversed_indices = animal_indices[::-1]
+        food_indices, first = numpy.unique(target_food[::-1], return_index=True)
+        eaters = reversed_indices[first]
+        edible = ~foods["eaten"][food_indices]
+        eaters, food_indices = eaters[edible], food_indices[edible]
+        animals["size"][eaters] += numpy.sqrt(
+            foods["energy"][food_indices] * animals["food_size_factor"][eaters]
+        )
+        foods["eaten"][food_indices] = True
+
+    def _generate_random_positions(
+        self, amount: int, screen_offset: int = 0
+    ) -> numpy.ndarray:
+        positions = numpy.empty((amount, 2))
+        for axis, dimension in enumerate(self.screen_size):
+            positions[:, axis] = self.rng.numpy.integers(
+                screen_offset, int(dimension) - screen_offset, amount, endpoint=True
+            )
+        return positions
+
+    def _compute_dispersion(self, shape, factor: float) -> numpy.ndarray:
+        return (self.rng.numpy.random(shape) - 0.5) * 2 * factor
@@ -15,6 +15,7 @@ from typing import Tuple
 
 import pygame
 from src.coordinate import Coordinate
+from src.profiling import PROFILER
 from src.search import SearchAlgorithmInterface
 
 # pylint: disable=c-extension-no-member
@@ -34,40 +35,55 @@ class FoodCloner:
     min_energy: float
     energy_decay_factor: float
 
-    def clone(self, foods: List[Food], screen_size: Coordinate):
-        """Adds clones of the specified foods to the foods list"""
+    def clone(
+        self,
+        foods: List[Food],
+        screen_size: Coordinate,
+        rng: Optional[random.Random] = None,
+    ):
+        """Adds clones of the specified foods to the foods list. Uses the specified
+        random generator, or the global random state if None.
+        """
         if not foods:
             return
 
         if len(foods) > self.max_length:
             return
 
+        rng_ = rng if rng is not None else random
         new_foods: List[Food] = []
         for food in foods:
-            if self.chance <= random.random():
+            if self.chance <= rng_.random():
                 continue
 
             new_position = Coordinate(
-                self._compute_single_coordinate(screen_size.x, food.position.x),
-                self._compute_single_coordinate(screen_size.y, food.position.y),
+                self._compute_single_coordinate(screen_size.x, food.position.x, rng),
+                self._compute_single_coordinate(screen_size.y, food.position.y, rng),
             )
-            new_foods.append(self.create_new_food(food, new_position))
+            new_foods.append(self.create_new_food(food, new_position, rng))
         foods.extend(new_foods)
 
     def _compute_single_coordinate(
-        self, screen_dimension: float, food_coordinate: float
+        self,
+        screen_dimension: float,
+        food_coordinate: float,
+        rng: Optional[random.Random] = None,
     ) -> float:
         half_dispersion = self.max_dispersion / 2
         max_ = screen_dimension - half_dispersion
         value = food_coordinate + self._get_random_dispersion_factor(
-            self.max_dispersion
+            self.max_dispersion, rng
         )
         return min(max_, max(half_dispersion, value))
 
-    def create_new_food(self, food: Food, position: Coordinate) -> Food:
+    def create_new_food(
+        self, food: Food, position: Coordinate, rng: Optional[random.Random] = None
+    ) -> Food:
         """Returns a new food at the specified position, based on the specified food"""
-        size_factor = 1 + self._get_random_dispersion_factor(self.size_dispersion)
-        energy_factor = 1 + self._get_random_dispersion_factor(self.energy_dispersion)
+        size_factor = 1 + self._get_random_dispersion_factor(self.size_dispersion, rng)
+        energy_factor = 1 + self._get_random_dispersion_factor(
+            self.energy_dispersion, rng
+        )
         return Food(
             size=max(self.min_size, min(self.max_size, size_factor * food.size)),
             energy=max(self.min_energy, energy_factor * food.INITIAL_ENERGY),
@@ -76,8 +92,11 @@ class FoodCloner:
         )
 
     @staticmethod
-    def _get_random_dispersion_factor(factor: float) -> float:
-        return (random.random() - 0.5) * 2 * factor
+    def _get_random_dispersion_factor(
+        factor: float, rng: Optional[random.Random] = None
+    ) -> float:
+        rng_ = rng if rng is not None else random
+        return (rng_.random() - 0.5) * 2 * factor
 
 
 @dataclass
@@ -123,20 +142,19 @@ class Food:  # pylint: disable=too-many-instance-attributes
 
 def move_towards(
     origin_position: Coordinate, destination_position: Coordinate, speed: float
-):
-    """Updates the specified origin_position by moving it towards the destination_position
-    at the specified speed.
+) -> Coordinate:
+    """Returns the position reached by moving from the specified origin_position towards
+    the destination_position at the specified speed.
     """
     # pylint: disable=invalid-name
     x = destination_position.x - origin_position.x
     y = destination_position.y - origin_position.y
-    distance = origin_position.compute_distance(destination_position)
+    distance = math.hypot(x, y)
     if not distance:
-        return
+        return origin_position
 
     factor = min(speed / distance, 1)
-    origin_position.x += x * factor
-    origin_position.y += y * factor
+    return Coordinate(origin_position.x + x * factor, origin_position.y + y * factor)
 
 
 @dataclass
@@ -171,7 +189,7 @@ class Animal:  # pylint: disable=too-many-instance-attributes
             return
 
         self.target_position = target_positions[0]
-        move_towards(self.position, self.target_position, self.speed)
+        self.position = move_towards(self.position, self.target_position, self.speed)
         for target_position in target_positions:
             self._eat(foods_dict, target_position)
 
@@ -179,6 +197,7 @@ class Animal:  # pylint: disable=too-many-instance-attributes
         """Draws the animal on the screen"""
         pygame.draw.circle(screen, self.colour, tuple(self.position), self.size)
 
+    @PROFILER.timed("animal.eat")
     def _eat(
         self, foods: DefaultDict[Coordinate, List[Food]], target_position: Coordinate
     ):
@@ -199,6 +218,7 @@ class Animal:  # pylint: disable=too-many-instance-attributes
             self.size += math.sqrt(food.energy * self.food_size_factor)
             food.eat()
 
+    @PROFILER.timed("animal.search")
     def _choose_target_position(self, foods: List[Food]) -> List[Coordinate]:
         target_positions = self.search_algorithm.determine_target_position(
             self, foods, distance=self.vision  # type: ignore
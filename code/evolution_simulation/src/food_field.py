@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""Contains a food model for the array based engine, which represents food as a grid of
+energy densities instead of individual foods.
+
+Each tick, energy diffuses to the neighbouring cells and regrows logistically towards
+the cell capacity, using batched stencil updates of the whole grid. Animals eat the
+energy of the cell under them and search food by looking for the richest cell within a
+square window around them. The maxima of windows with power of two sides are computed
+at most once per tick (a sparse table), and the maximum of a window of any size is
+combined from four overlapping power of two windows, so the cost of food only depends
+on the grid size and not on the amount of food. Requires numpy.
+"""
+from __future__ import annotations
+
+from typing import Dict
+from typing import Tuple
+
+import numpy
+import pygame
+from src.coordinate import Coordinate
+from src.params import FoodFieldParams
+
+# pylint: disable=c-extension-no-member
+
+
+class FoodField:
+    """Grid of food energy densities covering the screen, see FoodFieldParams"""
+
+    def __init__(self, params: FoodFieldParams, screen_size: Coordinate):
+        self.params = params
+        self.shape = (
+            max(1, int(screen_size.y) // params.cell_size),
+            max(1, int(screen_size.x) // params.cell_size),
+        )
+        self.energy = numpy.zeros(self.shape)
+        # maxima (and the flat index of the maximum) of the windows starting at each
+        # cell, with 2 ** row level rows and 2 ** column level columns
+        self._maxima: Dict[Tuple[int, int], Tuple[numpy.ndarray, numpy.ndarray]] = {}
+
+    def seed(self, positions: numpy.ndarray, energies: numpy.ndarray):
+        """Replaces the field by the specified foods, adding the energy of each food to
+        the cell it is in (limited by the capacity).
+        """
+        self.energy[:] = 0
+        numpy.add.at(self.energy, self.compute_cells(positions), energies)
+        numpy.minimum(self.energy, self.params.capacity, out=self.energy)
+        self._maxima.clear()
+
+    def set_energy(self, energy: numpy.ndarray):
+        """Replaces the energy of all cells by the specified array"""
+        self.energy[:] = energy
+        self._maxima.clear()
+
+    def step(self):
+        """Diffuses and regrows the energy of all cells"""
+        params = self.params
+        energy = self.energy
+        padded = numpy.pad(energy, 1, mode="edge")
+        laplacian = (
+            padded[:-2, 1:-1]
+            + padded[2:, 1:-1]
+            + padded[1:-1, :-2]
+            + padded[1:-1, 2:]
+            - 4 * energy
+        )
+        energy += params.diffusion_rate * laplacian
+        energy += params.regrowth_rate * energy * (1 - energy / params.capacity)
+        numpy.clip(energy, 0, params.capacity, out=energy)
+        self._maxima.clear()
+
+    def compute_cells(self, positions: numpy.ndarray) -> Tuple[numpy.ndarray, ...]:
+        """Returns the row and column indices of the cells containing the positions"""
+        cells = (positions[:, ::-1] // self.params.cell_size).astype(int)
+        return (
+            numpy.clip(cells[:, 0], 0, self.shape[0] - 1),
+            numpy.clip(cells[:, 1], 0, self.shape[1] - 1),
+        )
+
+    def compute_centers(self, flat_cells: numpy.ndarray) -> numpy.ndarray:
+        """Returns the positions of the centers of the cells with the flat indices"""
+        rows, columns = divmod(flat_cells, self.shape[1])
+        return (numpy.column_stack((columns, rows)) + 0.5) * self.params.cell_size
+
+    def find_richest(  # pylint: disable=too-many-locals
+        self, positions: numpy.ndarray, radii: numpy.ndarray
+    ) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """Returns whether a non empty cell was found within the square window of the
+        specified radius (in pixels) around each position, and the center of the richest
+        cell in the window. The window contains all cells at most radius // cell_size
+        cells away along both axes.
+        """
+        cell_radii = numpy.maximum(numpy.asarray(radii) // self.params.cell_size, 0)
+        rows, columns = self.compute_cells(positions)
+        row_starts, row_levels = _compute_spans(rows, cell_radii, self.shape[0])
+        column_starts, column_levels = _compute_spans(
+            columns, cell_radii, self.shape[1]
+        )
+        values = numpy.full(len(rows), -numpy.inf)
+        cells = numpy.zeros(len(rows), dtype=int)
+        for row_level, column_level in set(
+            zip(row_levels.tolist(), column_levels.tolist())
+        ):
+            selected = numpy.flatnonzero(
+                (row_levels == row_level) & (column_levels == column_level)
+            )
+            maxima, indices = self._get_maxima(row_level, column_level)
+            for row_start in row_starts:
+                for column_start in column_starts:
+                    window = (row_start[selected], column_start[selected])
+                    better = maxima[window] > values[selected]
+                    values[selected] = numpy.where(
+                        better, maxima[window], values[selected]
+                    )
+                    cells[selected] = numpy.where(
+                        better, indices[window], cells[selected]
+                    )
+        return values >= self.params.min_energy, self.compute_centers(cells)
+
+    def consume(self, positions: numpy.ndarray) -> numpy.ndarray:
+        """Returns the energy eaten by an animal at each position, which eats all of the
+        energy of its cell if it is not empty. If several animals are in the same cell,
+        the one with the highest index eats it.
+        """
+        flat_cells = numpy.ravel_multi_index(self.compute_cells(positions), self.shape)
+        eaten = numpy.zeros(len(positions))
+        cells, first = numpy.unique(flat_cells[::-1], return_index=True)
+        eaters = len(positions) - 1 - first
+        energies = self.energy.flat[cells]
+        edible = energies >= self.params.min_energy
+        eaten[eaters[edible]] = energies[edible]
+        self.energy.flat[cells[edible]] = 0
+        if edible.any():
+            self._maxima.clear()
+        return eaten
+
+    @property
+    def food_mask(self) -> numpy.ndarray:
+        """Mask of the non empty cells"""
+        return self.energy >= self.params.min_energy
+
+    def draw(self, screen: pygame.surface.Surface, colours: numpy.ndarray):
+        """Draws the cells with the specified colours (array of shape rows x columns x
+        3) on the screen, leaving empty cells black.
+        """
+        colours = numpy.where(self.food_mask[:, :, None], colours, 0)
+        surface = pygame.surfarray.make_surface(colours.transpose(1, 0, 2))
+        cell_size = self.params.cell_size
+        screen.blit(
+            pygame.transform.scale(
+                surface, (self.shape[1] * cell_size, self.shape[0] * cell_size)
+            ),
+            (0, 0),
+        )
+
+    def _get_maxima(
+        self, row_level: int, column_level: int
+    ) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        # window maxima by doubling: a window with 2 ** (level + 1) rows (or columns)
+        # is the union of the window with 2 ** level rows at the same cell and the one
+        # 2 ** level rows further
+        maxima = self._maxima.get((row_level, column_level))
+        if maxima is not None:
+            return maxima
+        if row_level:
+            values, indices = self._get_maxima(row_level - 1, column_level)
+            maxima = _compute_shifted_maxima(values, indices, 1 << (row_level - 1), 0)
+        elif column_level:
+            values, indices = self._get_maxima(row_level, column_level - 1)
+            maxima = _compute_shifted_maxima(
+                values, indices, 1 << (column_level - 1), 1
+            )
+        else:
+            maxima = (self.energy, numpy.arange(self.energy.size).reshape(self.shape))
+        self._maxima[row_level, column_level] = maxima
+        return maxima
+
+
+def _compute_spans(
+    centers: numpy.ndarray, radii: numpy.ndarray, size: int
+) -> Tuple[Tuple[numpy.ndarray, numpy.ndarray], numpy.ndarray]:
+    # returns the starts of two power of two windows covering the span of the radius
+    # around each center (clipped to the size), which may overlap, and their levels
+    first = numpy.maximum(centers - radii, 0)
+    last = numpy.minimum(centers + radii, size - 1)
+    levels = numpy.frexp(last - first + 1)[1] - 1
+    return (first, last + 1 - (1 << levels)), levels
+
+
+def _compute_shifted_maxima(
+    values: numpy.ndarray, indices: numpy.ndarray, shift: int, axis: int
+) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    maxima, maxima_indices = values.copy(), indices.copy()
+    if shift >= values.shape[axis]:
+        return maxima, maxima_indices
+    target, source = [slice(None)] * 2, [slice(None)] * 2
+    target[axis], source[axis] = slice(None, -shift), slice(shift, None)
+    better = values[tuple(source)] > maxima[tuple(target)]
+    numpy.copyto(maxima[tuple(target)], values[tuple(source)], where=better)
+    numpy.copyto(maxima_indices[tuple(target)], indices[tuple(source)], where=better)
+    return maxima, maxima_indices
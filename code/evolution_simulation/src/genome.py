@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""Contains the genome representation of the heritable animal traits.
+
+A genome is a fixed width vector of floats, one gene per heritable trait, laid out as
+described by a GenomeLayout. The genomes of all animals cloned in a tick are mutated at
+once: a single matrix of random numbers is drawn and every gene is mutated using the
+parameters of its column, so adding a heritable trait only adds a column.
+
+Mutating genome arrays requires numpy, mutate_values is the (slower) fallback used by
+the object based simulation if numpy could not be imported.
+"""
+from __future__ import annotations
+
+import math
+import random
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Mapping
+from typing import Optional
+from typing import Tuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Mutation(Enum):
+    """How a gene is mutated when an animal is cloned"""
+
+    NONE = "none"
+    RELATIVE = "relative"  # value * (1 + uniform(-amount, amount))
+    ADDITIVE = "additive"  # value + uniform(-amount, amount)
+    GROWTH = "growth"  # value + uniform(0, amount)
+    INTEGER = "integer"  # value + randint(-amount, amount)
+
+
+@dataclass(frozen=True)
+class Gene:
+    """A single heritable trait. The component is used for traits stored as tuple
+    (like colours), it is the index of the gene's value in the tuple. Integer traits
+    are rounded when decoded, traits with integer mutation are always integer.
+    """
+
+    name: str
+    mutation: Mutation = Mutation.NONE
+    amount: float = 0
+    min: float = -math.inf
+    max: float = math.inf
+    component: Optional[int] = None
+    integer: bool = False
+
+    @property
+    def is_integer(self) -> bool:
+        """True if the trait only takes integer values"""
+        return self.integer or self.mutation is Mutation.INTEGER
+
+
+@dataclass(frozen=True)
+class GenomeLayout:
+    """Describes which trait is stored in which column of a genome"""
+
+    genes: Tuple[Gene, ...]
+
+    def __post_init__(self):
+        if numpy is None:
+            return
+        # per gene parameters of the batched mutation, as row vectors
+        mutations = [gene.mutation for gene in self.genes]
+        object.__setattr__(self, "_columns", self._compute_columns(mutations))
+
+    def _compute_columns(self, mutations: List[Mutation]) -> Dict[str, Any]:
+        amounts = numpy.array([gene.amount for gene in self.genes], dtype=float)
+        is_integer = numpy.array([x is Mutation.INTEGER for x in mutations])
+        low = numpy.where(
+            numpy.array([x is Mutation.GROWTH for x in mutations]), 0, -amounts
+        )
+        # integer genes draw from [-amount, amount + 1) and are floored
+        high = amounts + is_integer
+        return {
+            "low": numpy.where([x is Mutation.NONE for x in mutations], 0, low),
+            "range": numpy.where(
+                [x is Mutation.NONE for x in mutations], 0, high - low
+            ),
+            "relative": numpy.array([x is Mutation.RELATIVE for x in mutations]),
+            "integer": is_integer,
+            "min": numpy.array([gene.min for gene in self.genes], dtype=float),
+            "max": numpy.array([gene.max for gene in self.genes], dtype=float),
+        }
+
+    @property
+    def width(self) -> int:
+        """The amount of genes in a genome"""
+        return len(self.genes)
+
+    def mutate(self, genomes, rng):  # type: ignore
+        """Returns mutated copies of the genomes in the specified numpy array of shape
+        (amount, width), drawing all random numbers from the numpy generator at once.
+        """
+        columns = self._columns  # type: ignore # pylint: disable=no-member
+        changes = columns["low"] + rng.random(genomes.shape) * columns["range"]
+        changes = numpy.where(columns["integer"], numpy.floor(changes), changes)
+        mutated = numpy.where(
+            columns["relative"], genomes * (1 + changes), genomes + changes
+        )
+        return numpy.clip(mutated, columns["min"], columns["max"])
+
+    def mutate_values(self, values: List[float], rng: random.Random) -> List[float]:
+        """Returns a mutated copy of a single genome, see mutate. Does not need numpy."""
+        mutated = []
+        for gene, value in zip(self.genes, values):
+            mutation, amount = gene.mutation, gene.amount
+            if mutation is Mutation.RELATIVE:
+                value *= 1 + rng.uniform(-amount, amount)
+            elif mutation is Mutation.ADDITIVE:
+                value += rng.uniform(-amount, amount)
+            elif mutation is Mutation.GROWTH:
+                value += rng.uniform(0, amount)
+            elif mutation is Mutation.INTEGER:
+                value += rng.randint(-int(amount), int(amount))
+            mutated.append(min(gene.max, max(gene.min, value)))
+        return mutated
+
+    def encode_columns(self, columns: Mapping[str, Any], rows):  # type: ignore
+        """Returns the genomes of the specified rows of the numpy trait columns as array
+        of shape (len(rows), width).
+        """
+        genomes = numpy.empty((len(rows), self.width))
+        for i, gene in enumerate(self.genes):
+            column = columns[gene.name][rows]
+            genomes[:, i] = (
+                column if gene.component is None else column[:, gene.component]
+            )
+        return genomes
+
+    def decode_columns(self, genomes, columns: Dict[str, Any]):  # type: ignore
+        """Writes the traits in the specified numpy genome array into the specified
+        trait columns, which must have one row per genome.
+        """
+        for i, gene in enumerate(self.genes):
+            values = genomes[:, i]
+            if gene.is_integer:
+                values = numpy.rint(values)
+            if gene.component is None:
+                columns[gene.name][:] = values
+            else:
+                columns[gene.name][:, gene.component] = values
+
+    def encode_entity(self, entity: Any) -> List[float]:
+        """Returns the genome of the specified entity as list"""
+        values = []
+        for gene in self.genes:
+            value = getattr(entity, gene.name)
+            values.append(value if gene.component is None else value[gene.component])
+        return values
+
+    def decode_entity(self, values: Iterable[float]) -> Dict[str, Any]:
+        """Returns the traits of the specified genome as keyword arguments of an entity.
+        Traits stored as tuple are returned as tuple.
+        """
+        traits: Dict[str, Any] = {}
+        components: Dict[str, Dict[int, Any]] = {}
+        for gene, value in zip(self.genes, values):
+            if gene.is_integer:
+                value = int(round(value))
+            if gene.component is None:
+                traits[gene.name] = value
+            else:
+                components.setdefault(gene.name, {})[gene.component] = value
+        for name, values_ in components.items():
+            traits[name] = tuple(values_[i] for i in sorted(values_))
+        return traits
+
+
+def create_animal_layout(
+    vision_dispersion: int = 20, colour_dispersion: int = 20
+) -> GenomeLayout:
+    """Returns the genome layout of the animal traits: speed and energy loss drift by up
+    to 2.5%, cloning size grows by up to 1, vision and the red colour channel drift by
+    the specified dispersions.
+    """
+    return GenomeLayout(
+        (
+            Gene("speed", Mutation.RELATIVE, 0.025, min=0.05),
+            Gene("energy_loss", Mutation.RELATIVE, 0.025, min=0),
+            Gene("cloning_size", Mutation.GROWTH, 1, min=0),
+            Gene("vision", Mutation.INTEGER, vision_dispersion, min=1),
+            Gene("food_reach_distance"),
+            Gene("food_size_factor"),
+            Gene("colour", Mutation.INTEGER, colour_dispersion, 0, 255, component=0),
+            Gene("colour", min=0, max=255, component=1, integer=True),
+            Gene("colour", min=0, max=255, component=2, integer=True),
+        )
+    )
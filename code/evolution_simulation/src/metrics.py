@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""Contains streaming collectors for the metrics of a running simulation.
+
+The means of the inherited animal traits (vision, speed and energy loss) never change
+during the lifetime of an animal, so they are kept as running sums, which are only
+updated when animals are born or die. Recorded metrics are kept in fixed size buffers,
+which halve their resolution whenever they are full, so the memory used by a run stays
+bounded no matter how long it runs.
+"""
+from __future__ import annotations
+
+import dataclasses
+import math
+from collections import deque
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Deque
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Mapping
+from typing import Optional
+from typing import Tuple
+
+from src.plotting import PlotData
+
+ANIMAL_TRAITS = ("vision", "speed", "energy_loss")
+
+
+@dataclass(frozen=True)
+class MetricsSample:  # pylint: disable=too-many-instance-attributes
+    """The metrics of a simulation at a single tick, see PlotData"""
+
+    vision: float
+    size: float
+    speed: float
+    energy_loss: float
+    food_energy: float
+    food_amount: float
+    animal_amount: float
+
+
+METRICS = [x.name for x in dataclasses.fields(MetricsSample)]
+
+
+@dataclass
+class RunningMean:
+    """Mean of a collection of values, which is updated as values are added or removed"""
+
+    total: float = 0
+    count: int = 0
+
+    def add(self, total: float, count: int = 1):
+        """Adds values with the specified sum to the mean"""
+        self.total += total
+        self.count += count
+
+    def remove(self, total: float, count: int = 1):
+        """Removes values with the specified sum from the mean"""
+        self.total -= total
+        self.count -= count
+
+    def clear(self):
+        """Removes all values"""
+        self.total, self.count = 0, 0
+
+    @property
+    def mean(self) -> float:
+        """The mean of all values, or nan if there are no values"""
+        return self.total / self.count if self.count else math.nan
+
+
+@dataclass
+class TraitStatistics:
+    """Running means of the specified (constant) traits of all living animals.
+    Animals are added when they are born and removed when they die, so the means are
+    available without iterating over all animals.
+    """
+
+    traits: Tuple[str, ...] = ANIMAL_TRAITS
+    means: Dict[str, RunningMean] = field(init=False)
+
+    def __post_init__(self):
+        self.means = {trait: RunningMean() for trait in self.traits}
+
+    def add_entities(self, entities: Iterable[Any]):
+        """Adds the traits of the specified animals"""
+        for entity in entities:
+            for trait, mean in self.means.items():
+                mean.add(getattr(entity, trait))
+
+    def remove_entities(self, entities: Iterable[Any]):
+        """Removes the traits of the specified animals"""
+        for entity in entities:
+            for trait, mean in self.means.items():
+                mean.remove(getattr(entity, trait))
+
+    def add_columns(self, columns: Mapping[str, Any], mask: Optional[Any] = None):
+        """Adds the traits of the animals in the specified numpy columns, optionally
+        only those selected by the mask.
+        """
+        for trait, mean in self.means.items():
+            values = columns[trait] if mask is None else columns[trait][mask]
+            mean.add(float(values.sum()), len(values))
+
+    def remove_columns(self, columns: Mapping[str, Any], mask: Optional[Any] = None):
+        """Removes the traits of the animals in the specified numpy columns, optionally
+        only those selected by the mask.
+        """
+        for trait, mean in self.means.items():
+            values = columns[trait] if mask is None else columns[trait][mask]
+            mean.remove(float(values.sum()), len(values))
+
+    def clear(self):
+        """Removes all animals"""
+        for mean in self.means.values():
+            mean.clear()
+
+    def get_state(self) -> Dict[str, Tuple[float, int]]:
+        """Returns the running sums and counts of all traits, see set_state"""
+        return {trait: (mean.total, mean.count) for trait, mean in self.means.items()}
+
+    def set_state(self, state: Dict[str, Tuple[float, int]]):
+        """Restores the running sums and counts returned by get_state"""
+        for trait, (total, count) in state.items():
+            self.means[trait] = RunningMean(total, count)
+
+    def __getitem__(self, trait: str) -> float:
+        return self.means[trait].mean
+
+
+@dataclass
+class DownsampledHistory:
+    """History of a single metric using at most capacity points. When the history is
+    full, neighbouring points are averaged pairwise and every following point is the
+    average of twice as many values (stride), so the whole run stays covered at a
+    decreasing resolution.
+    """
+
+    capacity: int = 1024
+    stride: int = field(init=False, default=1)
+    values: List[float] = field(init=False, default_factory=list)
+    ticks: List[float] = field(init=False, default_factory=list)
+
+    def __post_init__(self):
+        self.capacity += self.capacity % 2
+        self._pending_sum = 0.0
+        self._pending_ticks = 0.0
+        self._pending_count = 0
+
+    def append(self, tick: int, value: float):
+        """Adds the value of the specified tick"""
+        self._pending_sum += value
+        self._pending_ticks += tick
+        self._pending_count += 1
+        if self._pending_count < self.stride:
+            return
+
+        self.values.append(self._pending_sum / self._pending_count)
+        self.ticks.append(self._pending_ticks / self._pending_count)
+        self._pending_sum, self._pending_ticks, self._pending_count = 0, 0, 0
+        if len(self.values) >= self.capacity:
+            self._compact()
+
+    def _compact(self):
+        self.values = _average_pairs(self.values)
+        self.ticks = _average_pairs(self.ticks)
+        self.stride *= 2
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+def _average_pairs(values: List[float]) -> List[float]:
+    return [(a + b) / 2 for a, b in zip(values[::2], values[1::2])]
+
+
+@dataclass
+class MetricsHistory:
+    """Bounded history of the metrics of a run. Keeps a downsampled history of the
+    whole run for plotting and a ring buffer of the most recent samples.
+    """
+
+    capacity: int = 1024
+    recent_length: int = 300
+    tick: int = field(init=False, default=0)
+    recent: Deque[MetricsSample] = field(init=False)
+
+    def __post_init__(self):
+        self.recent = deque(maxlen=self.recent_length)
+        self._histories = {x: DownsampledHistory(self.capacity) for x in METRICS}
+
+    def append(self, sample: MetricsSample):
+        """Adds the metrics of the next tick"""
+        for name, history in self._histories.items():
+            history.append(self.tick, getattr(sample, name))
+        self.recent.append(sample)
+        self.tick += 1
+
+    def to_plot_data(self) -> PlotData:
+        """Returns the downsampled history as plot data"""
+        histories = self._histories
+        return PlotData(
+            ticks=list(histories[METRICS[0]].ticks),
+            **{name: list(history.values) for name, history in histories.items()},
+        )
+
+    def __len__(self) -> int:
+        return self.tick
@@ -2,6 +2,7 @@
 """Contains parameters for the initialization of the simulation"""
 import random
 from dataclasses import dataclass
+from typing import Optional
 
 try:
     import numpy
@@ -11,6 +12,7 @@ except ImportError:
     )
     numpy = None
 
+from src.rng import RandomGenerators
 from src.search import SearchAlgorithmInterface, PositionClusterer
 
 
@@ -22,17 +24,38 @@ class Stat:
     standard_deviation: float = 0
     min: float = 0
 
-    def compute_random_number(self) -> float:
+    def compute_random_number(self, rng: Optional[RandomGenerators] = None) -> float:
         """Returns a random number taken from the a normal distribution
         defined by this Stat's average and standard deviation.
+        Uses the specified random generators, or the global random state if None.
         """
-        number: float = (
+        if rng is not None:
+            number: float = (
+                rng.numpy.normal(self.average, self.standard_deviation)
+                if rng.numpy is not None
+                else rng.python.random() * self.average
+            )
+            return max(self.min, number)
+
+        number = (
             numpy.random.normal(self.average, self.standard_deviation)  # type: ignore
             if numpy is not None
             else random.random() * self.average
         )
         return max(self.min, number)
 
+    def compute_random_numbers(
+        self, amount: int, rng: Optional[RandomGenerators] = None
+    ):
+        """Returns a numpy array of the specified amount of random numbers taken from
+        the normal distribution defined by this Stat's average and standard deviation.
+        Uses the specified random generators, or the global numpy random state if None.
+        Requires numpy.
+        """
+        generator = rng.numpy if rng is not None else numpy.random  # type: ignore
+        numbers = generator.normal(self.average, self.standard_deviation, size=amount)
+        return numpy.maximum(self.min, numbers)  # type: ignore
+
 
 @dataclass(frozen=True)
 class FoodParams:
@@ -45,6 +68,19 @@ class FoodParams:
     screen_offset: int = 50
 
 
+@dataclass(frozen=True)
+class FoodFieldParams:
+    """Parameters of the food field. The diffusion rate must not exceed 0.25, cells
+    with less than min_energy are considered empty.
+    """
+
+    cell_size: int = 10
+    capacity: float = 10
+    regrowth_rate: float = 0.02
+    diffusion_rate: float = 0.05
+    min_energy: float = 0.5
+
+
 @dataclass(frozen=True)
 class AnimalParams:  # pylint: disable=too-many-instance-attributes
     """Simulation init parameters related to animals"""
@@ -1,12 +1,12 @@
 # -*- coding: utf-8 -*-
 """Module containing code related to plotting"""
-import statistics
 from collections import deque
 from dataclasses import dataclass
 from dataclasses import field
 from typing import Any
 from typing import Deque
 from typing import List
+from typing import Sequence
 
 try:
     import matplotlib.pyplot as plt
@@ -15,7 +15,7 @@ except ImportError:
 
 
 @dataclass
-class PlotData:
+class PlotData:  # pylint: disable=too-many-instance-attributes
     """Class for data to be plotted"""
 
     vision: List[float] = field(default_factory=list)
@@ -25,6 +25,7 @@ class PlotData:
     food_energy: List[float] = field(default_factory=list)
     food_amount: List[float] = field(default_factory=list)
     animal_amount: List[float] = field(default_factory=list)
+    ticks: List[float] = field(default_factory=list)
 
 
 def plot_data(plotting_data: PlotData, output_filename: str):
@@ -36,11 +37,16 @@ def plot_data(plotting_data: PlotData, output_filename: str):
     fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(10, 6))  # type: ignore
     fig.tight_layout(pad=3)
     fig.suptitle("Evolution simulation results")  # type: ignore
+    ticks = plotting_data.ticks or list(range(len(plotting_data.animal_amount)))
 
     ax1.plot(  # type: ignore
-        normalize(plotting_data.food_amount), label="Amount of food", color="#6F7B75"
+        ticks,
+        normalize(plotting_data.food_amount),
+        label="Amount of food",
+        color="#6F7B75",
     )
     ax1.plot(  # type: ignore
+        ticks,
         normalize(plotting_data.animal_amount),
         label="Amount of animals",
         color="#da3b56",
@@ -52,11 +58,13 @@ def plot_data(plotting_data: PlotData, output_filename: str):
     ax1.grid(axis="x", linestyle="--", linewidth=1)  # type: ignore
 
     ax3.plot(  # type: ignore
+        ticks,
         normalize(smooth(plotting_data.food_energy, window=15)),
         label="Food energy",
         color="#6F7B75",
     )
     ax3.plot(  # type: ignore
+        ticks,
         normalize(smooth(plotting_data.size, window=3)),
         label="Animal size",
         color="#da3b56",
@@ -68,10 +76,10 @@ def plot_data(plotting_data: PlotData, output_filename: str):
     ax3.grid(axis="x", linestyle="--", linewidth=1)  # type: ignore
 
     ax2.plot(  # type: ignore
-        normalize(plotting_data.vision), label="Animal vision", color="#da3b56"
+        ticks, normalize(plotting_data.vision), label="Animal vision", color="#da3b56"
     )
     ax2.plot(  # type: ignore
-        normalize(plotting_data.speed), label="Animal speed", color="#213cc1"
+        ticks, normalize(plotting_data.speed), label="Animal speed", color="#213cc1"
     )
     ax2.set_xlabel("Simulation time")  # type: ignore
     ax2.set_ylabel("Animal stats")  # type: ignore
@@ -84,7 +92,12 @@ def plot_data(plotting_data: PlotData, output_filename: str):
     )
     ax2.grid(axis="x", linestyle="--", linewidth=1)  # type: ignore
 
-    ax4.plot(plotting_data.energy_loss, color="#da3b56", label="Animal energy loss")  # type: ignore
+    ax4.plot(  # type: ignore
+        ticks,
+        plotting_data.energy_loss,
+        color="#da3b56",
+        label="Animal energy loss",
+    )
     ax4.set_xlabel("Simulation time")  # type: ignore
     ax4.set_ylabel("Animal energy loss")  # type: ignore
     ax4.grid(axis="x", linestyle="--", linewidth=1)  # type: ignore
@@ -107,17 +120,23 @@ def _add_legend(axes, columns: int, **kwargs: Any):  # type: ignore
     )
 
 
-def normalize(data: List[float]) -> List[float]:
+def normalize(data: Sequence[float]) -> List[float]:
     """Returns data with a max value of 1 (not fully normalized between 1 and 0)"""
-    max_ = max(data)
+    max_ = max(data, default=0) or 1
     return [x / max_ for x in data]
 
 
-def smooth(data: List[float], window: int = 5) -> List[float]:
-    """Averages data over the specified window (the larger, the smoother)"""
-    deque_: Deque[float] = deque(maxlen=window)
+def smooth(data: Sequence[float], window: int = 5) -> List[float]:
+    """Averages data over the specified window (the larger, the smoother).
+    Keeps a running sum of the window, so smoothing takes O(n) regardless of the window.
+    """
+    deque_: Deque[float] = deque()
     new_data: List[float] = []
+    total = 0.0
     for point in data:
         deque_.append(point)
-        new_data.append(statistics.mean(deque_))
+        total += point
+        if len(deque_) > window:
+            total -= deque_.popleft()
+        new_data.append(total / len(deque_))
     return new_data
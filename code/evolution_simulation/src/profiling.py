@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""Contains a lightweight profiler for the hot paths of the simulation.
+
+Code is instrumented with named scopes (context managers or the timed decorator) and
+counters of the process wide PROFILER. While the profiler is enabled, the times (from
+a monotonic clock) and calls of every scope and the counter values are summed up per
+tick; end_tick stores the totals of the tick in a ring buffer of the last capacity
+ticks. While it is disabled, scopes and counters return immediately, and methods
+decorated with timed are not wrapped at all, so they can be used in per entity code.
+
+The report contains the mean, 95th percentile and maximum per tick of every scope and
+counter in the ring buffer, for example:
+    PROFILER.enable()
+    for _ in range(1000):
+        with PROFILER.scope("tick"):
+            simulation.step()
+        PROFILER.end_tick()
+    PROFILER.dump()
+"""
+from __future__ import annotations
+
+import contextlib
+import functools
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Callable
+from typing import ContextManager
+from typing import Deque
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import TypeVar
+
+Function = TypeVar("Function", bound=Callable[..., Any])
+
+_DISABLED_SCOPE = contextlib.nullcontext()
+
+
+@dataclass(frozen=True)
+class Statistics:
+    """Per tick statistics of a scope (times in milliseconds) or counter"""
+
+    name: str
+    mean: float
+    p95: float
+    max: float
+    calls: float = math.nan
+
+    @classmethod
+    def from_values(
+        cls, name: str, values: Sequence[float], calls: float = math.nan
+    ) -> Statistics:
+        """Returns the statistics of the specified per tick values"""
+        sorted_values = sorted(values)
+        amount = len(sorted_values)
+        return cls(
+            name,
+            mean=sum(sorted_values) / amount,
+            p95=sorted_values[max(0, math.ceil(0.95 * amount) - 1)],
+            max=sorted_values[-1],
+            calls=calls,
+        )
+
+
+class _Timed:  # pylint: disable=too-few-public-methods
+    # replaces itself by the original function when assigned as class attribute, the
+    # profiler swaps the timing wrapper in and out while it is enabled
+    def __init__(self, profiler: Profiler, name: str, function: Callable[..., Any]):
+        self.profiler = profiler
+        self.function = function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profiler.record(name, time.perf_counter_ns() - start)
+
+        self.wrapper = wrapper
+
+    def __set_name__(self, owner: type, attribute: str):
+        self.profiler.add_method(owner, attribute, self.function, self.wrapper)
+
+    def __call__(self, *args, **kwargs):
+        if self.profiler.enabled:
+            return self.wrapper(*args, **kwargs)
+        return self.function(*args, **kwargs)
+
+
+class _Scope:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler: Profiler, name: str):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+
+    def __exit__(self, *args):
+        self.profiler.record(self.name, time.perf_counter_ns() - self.start)
+
+
+@dataclass
+class Profiler:  # pylint: disable=too-many-instance-attributes
+    """Collects the times of named scopes and the values of counters per tick, see the
+    module docstring. Disabled by default.
+    """
+
+    capacity: int = 1000
+    enabled: bool = False
+    ticks: int = field(init=False, default=0)
+    _times: Dict[str, int] = field(init=False, default_factory=dict)
+    _calls: Dict[str, int] = field(init=False, default_factory=dict)
+    _counters: Dict[str, float] = field(init=False, default_factory=dict)
+    _time_history: Dict[str, Deque[float]] = field(init=False, default_factory=dict)
+    _call_history: Dict[str, Deque[int]] = field(init=False, default_factory=dict)
+    _counter_history: Dict[str, Deque[float]] = field(init=False, default_factory=dict)
+    _methods: List[Tuple[type, str, Callable[..., Any], Callable[..., Any]]] = field(
+        init=False, default_factory=list
+    )
+
+    def scope(self, name: str) -> ContextManager[Any]:
+        """Returns a context manager measuring the time spent in it"""
+        if not self.enabled:
+            return _DISABLED_SCOPE
+        return _Scope(self, name)
+
+    def timed(self, name: str) -> Callable[[Function], Function]:
+        """Returns a decorator measuring the time spent in the decorated function or
+        method. Decorated methods are only replaced by the timing wrapper while the
+        profiler is enabled.
+        """
+
+        def decorator(function: Function) -> Function:
+            return _Timed(self, name, function)  # type: ignore
+
+        return decorator
+
+    def add_method(
+        self,
+        owner: type,
+        attribute: str,
+        function: Callable[..., Any],
+        wrapper: Callable[..., Any],
+    ):
+        """Registers the timing wrapper of a method, see timed"""
+        self._methods.append((owner, attribute, function, wrapper))
+        setattr(owner, attribute, wrapper if self.enabled else function)
+
+    def record(self, name: str, duration: int):
+        """Adds a call of the scope with the specified duration in nanoseconds"""
+        self._times[name] = self._times.get(name, 0) + duration
+        self._calls[name] = self._calls.get(name, 0) + 1
+
+    def count(self, name: str, value: float = 1):
+        """Adds the value to the counter with the specified name"""
+        if self.enabled:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def end_tick(self):
+        """Stores the totals of the current tick in the ring buffer. Scopes and
+        counters that were not used in the tick are stored as zero.
+        """
+        if not self.enabled:
+            return
+        for totals, histories, scale in (
+            (self._times, self._time_history, 1e-6),
+            (self._calls, self._call_history, 1),
+            (self._counters, self._counter_history, 1),
+        ):
+            for name in totals.keys() - histories.keys():
+                histories[name] = deque(maxlen=self.capacity)
+            for name, history in histories.items():
+                history.append(totals.get(name, 0) * scale)
+            totals.clear()
+        self.ticks += 1
+
+    def enable(self):
+        """Enables the profiler"""
+        self.enabled = True
+        for owner, attribute, _, wrapper in self._methods:
+            setattr(owner, attribute, wrapper)
+
+    def disable(self):
+        """Disables the profiler, keeping the collected data"""
+        self.enabled = False
+        for owner, attribute, function, _ in self._methods:
+            setattr(owner, attribute, function)
+
+    def toggle(self):
+        """Disables the profiler if it is enabled, else enables it"""
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    def reset(self):
+        """Removes all collected data"""
+        for data in (
+            self._times,
+            self._calls,
+            self._counters,
+            self._time_history,
+            self._call_history,
+            self._counter_history,
+        ):
+            data.clear()
+        self.ticks = 0
+
+    def get_scopes(self) -> List[Statistics]:
+        """Returns the statistics of all scopes, slowest first"""
+        scopes = [
+            Statistics.from_values(
+                name,
+                history,
+                calls=sum(self._call_history[name]) / len(self._call_history[name]),
+            )
+            for name, history in self._time_history.items()
+        ]
+        return sorted(scopes, key=lambda x: x.mean, reverse=True)
+
+    def get_counters(self) -> List[Statistics]:
+        """Returns the statistics of all counters, sorted by name"""
+        return [
+            Statistics.from_values(name, history)
+            for name, history in sorted(self._counter_history.items())
+        ]
+
+    def format_report(self) -> str:
+        """Returns a table of the statistics of all scopes and counters"""
+        ticks = min(self.ticks, self.capacity)
+        lines = [f"Profile of the last {ticks} ticks (per tick)"]
+        lines.append(
+            f"{'scope':<24}{'mean ms':>10}{'p95 ms':>10}{'max ms':>10}{'calls':>10}"
+        )
+        for scope in self.get_scopes():
+            lines.append(
+                f"{scope.name:<24}{scope.mean:>10.3f}{scope.p95:>10.3f}"
+                f"{scope.max:>10.3f}{scope.calls:>10.1f}"
+            )
+        counters = self.get_counters()
+        if counters:
+            lines.append(f"{'counter':<24}{'mean':>10}{'p95':>10}{'max':>10}")
+            for counter in counters:
+                lines.append(
+                    f"{counter.name:<24}{counter.mean:>10.1f}{counter.p95:>10.1f}"
+                    f"{counter.max:>10.1f}"
+                )
+        return "\n".join(lines)
+
+    def dump(self, path: Optional[str] = None):
+        """Prints the report, or writes it to the specified path"""
+        report = self.format_report()
+        if path is None:
+            print(report)
+            return
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(report + "\n")
+
+
+PROFILER = Profiler()
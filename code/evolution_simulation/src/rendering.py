@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""Contains a batched renderer for the circles representing foods and animals.
+
+Instead of drawing a circle per entity per frame, circles are rasterized once per
+quantized radius and colour into a sprite atlas, and all entities are submitted to
+the screen in a single Surface.blits call.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Iterable
+from typing import List
+from typing import Protocol
+from typing import Sequence
+from typing import Tuple
+
+import pygame
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+SpriteKey = Tuple[int, Tuple[int, ...]]
+COLOUR_KEY = (0, 0, 0)
+
+
+class Circle(Protocol):  # pylint: disable=too-few-public-methods
+    """Interface for an entity drawn as circle"""
+
+    position: Tuple[float, float]
+    size: float
+
+    @property
+    def colour(self) -> Tuple[int, int, int]:
+        """The colour of the circle"""
+        ...
+
+
+def render_circle(radius: int, colour: Sequence[int]) -> pygame.surface.Surface:
+    """Renders a circle of the specified radius and colour, centered on the sprite.
+    Black is used as transparent colour key.
+    """
+    size = 2 * radius + 1
+    surface = pygame.Surface((size, size))
+    surface.set_colorkey(COLOUR_KEY, pygame.RLEACCEL)  # pylint: disable=no-member
+    pygame.draw.circle(surface, colour, (radius, radius), radius)
+    return surface
+
+
+@dataclass
+class SpriteAtlas:
+    """Least recently used cache of circle sprites, keyed by quantized radius and colour.
+
+    Radii are rounded to the nearest integer and colour components are quantized to
+    multiples of colour_step, which keeps the amount of distinct sprites small.
+    """
+
+    max_size: int = 1024
+    colour_step: int = 4
+    _sprites: "OrderedDict[SpriteKey, pygame.surface.Surface]" = field(
+        init=False, default_factory=OrderedDict
+    )
+    hits: int = field(init=False, default=0)
+    misses: int = field(init=False, default=0)
+
+    def get(self, radius: float, colour: Sequence[int]) -> pygame.surface.Surface:
+        """Returns the sprite for the specified radius and colour, rendering it if it is
+        not cached yet. Evicts the least recently used sprite if the atlas is full.
+        """
+        key = self.compute_key(radius, colour)
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self.hits += 1
+            self._sprites.move_to_end(key)
+            return sprite
+
+        self.misses += 1
+        sprite = render_circle(*key)
+        self._sprites[key] = sprite
+        if len(self._sprites) > self.max_size:
+            self._sprites.popitem(last=False)
+        return sprite
+
+    def compute_key(self, radius: float, colour: Sequence[int]) -> SpriteKey:
+        """Returns the quantized atlas key for the specified sprite parameters"""
+        step = self.colour_step
+        return (
+            int(radius + 0.5),
+            tuple(min(255, max(0, int(x) // step * step)) for x in colour[:3]),
+        )
+
+    def clear(self):
+        """Removes all sprites"""
+        self._sprites.clear()
+
+    def __len__(self) -> int:
+        return len(self._sprites)
+
+
+@dataclass
+class EntityRenderer:
+    """Draws circles using the sprites of a sprite atlas, in a single blits call.
+    Circles with a radius smaller than one pixel are skipped, like pygame does.
+    """
+
+    atlas: SpriteAtlas = field(default_factory=SpriteAtlas)
+
+    def draw(self, screen: pygame.surface.Surface, entities: Iterable[Circle]):
+        """Draws the specified entities as circles on the screen"""
+        get_sprite = self.atlas.get
+        blits: List[Tuple[pygame.surface.Surface, Tuple[float, float]]] = []
+        append = blits.append
+        for entity in entities:
+            if entity.size < 1:
+                continue
+            radius = int(entity.size + 0.5)
+            x, y = entity.position  # pylint: disable=invalid-name
+            append((get_sprite(radius, entity.colour), (x - radius, y - radius)))
+        screen.blits(blits, doreturn=False)
+
+    def draw_arrays(
+        self, screen: pygame.surface.Surface, positions, radii, colours  # type: ignore
+    ):
+        """Draws circles with the positions, radii and colours in the specified numpy
+        arrays on the screen. Requires numpy.
+        """
+        visible = radii >= 1
+        radii = numpy.floor(radii[visible] + 0.5).astype(int)  # type: ignore
+        colours = numpy.clip(colours[visible], 0, 255).astype(int)  # type: ignore
+
+        get_sprite = self.atlas.get
+        screen.blits(
+            [
+                (get_sprite(radius, colour), destination)
+                for destination, radius, colour in zip(
+                    (positions[visible] - radii[:, None]).tolist(),
+                    radii.tolist(),
+                    colours.tolist(),
+                )
+            ],
+            doreturn=False,
+        )
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""Contains the random number generators of a single simulation"""
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+from typing import Any
+from typing import Dict
+from typing import Optional
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+@dataclass
+class RandomGenerators:
+    """Python and numpy random number generators owned by a single simulation, so that
+    simulations with the same seed are reproducible and do not interfere with each
+    other (or with the global random state) when run side by side.
+    """
+
+    python: random.Random
+    numpy: Optional[Any] = None
+
+    @classmethod
+    def from_seed(cls, seed: Optional[int] = None) -> RandomGenerators:
+        """Returns new generators seeded with the specified seed. The numpy generator
+        is only created if numpy can be imported.
+        """
+        numpy_generator = numpy.random.default_rng(seed) if numpy is not None else None
+        return cls(python=random.Random(seed), numpy=numpy_generator)
+
+    def get_state(self) -> Dict[str, Any]:
+        """Returns the states of both generators, see set_state"""
+        return {
+            "python": self.python.getstate(),
+            "numpy": self.numpy.bit_generator.state if self.numpy is not None else None,
+        }
+
+    def set_state(self, state: Dict[str, Any]):
+        """Restores the generator states returned by get_state"""
+        self.python.setstate(state["python"])
+        if self.numpy is not None and state["numpy"] is not None:
+            self.numpy.bit_generator.state = state["numpy"]
@@ -2,6 +2,7 @@
 """Contains algorithms used to traverse 2d space using linear interpolation
 and position binning.
 """
+import math
 import random
 import statistics
 from collections import defaultdict
@@ -18,6 +19,11 @@ from typing import Tuple
 import pygame
 from src.coordinate import Coordinate
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 # pylint: disable=c-extension-no-member
 # pylint: disable=too-few-public-methods
 
@@ -30,6 +36,11 @@ class Entity(Protocol):
 
     position: Coordinate
 
+    @property
+    def dead(self) -> bool:
+        """Returns True if the entity is dead, else False"""
+        ...
+
     def draw(self, screen: pygame.surface.Surface):
         """Draws the entity on the screen"""
         ...
@@ -138,6 +149,63 @@ class SimplePositionClusterer:
         ]
 
 
+def positions_to_array(positions: Iterable[Coordinate]):
+    """Returns the specified positions as numpy array of shape (n, 2). Requires numpy."""
+    coordinates = numpy.fromiter(  # type: ignore
+        (value for position in positions for value in position), dtype=float
+    )
+    return coordinates.reshape((-1, 2))
+
+
+def array_to_positions(array) -> List[Coordinate]:  # type: ignore
+    """Returns the rows of the specified numpy array of shape (n, 2) as positions"""
+    return [Coordinate(x, y) for x, y in array.tolist()]
+
+
+@dataclass
+class ArrayPositionClusterer(SimplePositionClusterer):
+    """Clusters positions like the SimplePositionClusterer, but bins, averages and
+    lerps all positions at once using numpy arrays. Requires a lerper with a factor
+    (like the SimplePositionLerper). Falls back to the SimplePositionClusterer if numpy
+    could not be imported.
+    """
+
+    lerper: SimplePositionLerper
+
+    def cluster_positions(self, positions: Iterable[Coordinate]) -> List[Coordinate]:
+        """Clusters the specified positions by binning them, then using linear interpolation
+        to move positions in the same bin closer to each other.
+        """
+        if numpy is None:
+            return super().cluster_positions(list(positions))
+        return array_to_positions(self.cluster_array(positions_to_array(positions)))
+
+    def cluster_array(self, positions):  # type: ignore
+        """Clusters the positions in the specified numpy array of shape (n, 2) and returns
+        the resulting positions as new array.
+        """
+        if not len(positions):  # pylint: disable=len-as-condition
+            return positions.copy()
+
+        resolution = self.position_binner.bin_resolution
+        bins = numpy.floor_divide(positions, resolution).astype(numpy.int64)
+        bins -= bins.min(axis=0)
+        keys = bins[:, 0] * (bins[:, 1].max() + 1) + bins[:, 1]
+        _, inverse = numpy.unique(keys, return_inverse=True)
+        counts = numpy.bincount(inverse)
+        averages = numpy.empty((len(counts), 2))
+        for axis in range(2):
+            averages[:, axis] = numpy.bincount(inverse, positions[:, axis]) / counts
+
+        factor = self.lerper.factor
+        return positions * (1 - factor) + averages[inverse] * factor
+
+    @property
+    def supports_arrays(self) -> bool:
+        """True if numpy is available, so cluster_array can be used"""
+        return numpy is not None
+
+
 @dataclass
 class CompositePositionClusterer:
     """Allows position clusterer chains, while maintaining the same PositionClusterer interface."""
@@ -145,11 +213,31 @@ class CompositePositionClusterer:
     clusterers: List[PositionClusterer]
 
     def cluster_positions(self, positions: Iterable[Coordinate]) -> List[Coordinate]:
-        """Forms clusters using the specified positions and returns the resulting positions"""
+        """Forms clusters using the specified positions and returns the resulting positions.
+        If all clusterers can cluster arrays, the positions are only converted once.
+        """
+        if self.supports_arrays:
+            return array_to_positions(self.cluster_array(positions_to_array(positions)))
+
         for clusterer in self.clusterers:
             positions = clusterer.cluster_positions(positions)
         return positions  # type: ignore
 
+    def cluster_array(self, positions):  # type: ignore
+        """Passes the positions in the specified numpy array through all clusterers,
+        see ArrayPositionClusterer.cluster_array.
+        """
+        for clusterer in self.clusterers:
+            positions = clusterer.cluster_array(positions)  # type: ignore
+        return positions
+
+    @property
+    def supports_arrays(self) -> bool:
+        """True if numpy is available and all clusterers can cluster arrays"""
+        return numpy is not None and all(
+            getattr(x, "supports_arrays", False) for x in self.clusterers
+        )
+
 
 class SearchAlgorithmInterface(Protocol):
     """Search algorithm interface"""
@@ -164,6 +252,16 @@ class SearchAlgorithmInterface(Protocol):
         """Updates the search algorithm"""
         ...
 
+    def add_entities(self, entities: Iterable[Entity]):
+        """Notifies the search algorithm of entities added to the searched entities"""
+        ...
+
+    def remove_entities(self, entities: Iterable[Entity]):
+        """Notifies the search algorithm of entities removed from the searched
+        entities
+        """
+        ...
+
 
 @dataclass
 class SearchAlgorithm:
@@ -173,6 +271,7 @@ class SearchAlgorithm:
     binner_type = PositionBinner
     _position_bins: Dict[int, PositionBins] = field(init=False, default_factory=dict)
     max_determined_targets: int = 1
+    rng: Optional[random.Random] = None
 
     def determine_target_position(
         self, entity: Animal, entities: List[Entity], distance: int
@@ -189,7 +288,8 @@ class SearchAlgorithm:
 
         considered_entities = round(self.max_entities_considered * entity.vision / 50)
         if len(bin_) > considered_entities:
-            bin_ = random.sample(bin_, k=considered_entities)
+            rng = self.rng if self.rng is not None else random
+            bin_ = rng.sample(bin_, k=considered_entities)
         return sorted(bin_, key=entity.position.compute_distance)[
             : self.max_determined_targets
         ]
@@ -198,14 +298,21 @@ class SearchAlgorithm:
         """Updates the algorithm, needs to be called once every game tick."""
         self._position_bins = {}
 
+    def add_entities(self, entities: Iterable[Entity]):
+        """Does nothing, the position bins are recomputed every tick"""
+
+    def remove_entities(self, entities: Iterable[Entity]):
+        """Does nothing, the position bins are recomputed every tick"""
+
     def _compute_bins(
         self, binner: PositionBinner, entities: Iterable[Entity]
     ) -> PositionBins:
-        bins_ = self._position_bins.get(
-            binner.bin_resolution,
-            binner.compute_position_bins(positions=[x.position for x in entities]),
-        )
-        self._position_bins[binner.bin_resolution] = bins_
+        bins_ = self._position_bins.get(binner.bin_resolution)
+        if bins_ is None:
+            bins_ = binner.compute_position_bins(
+                positions=[x.position for x in entities]
+            )
+            self._position_bins[binner.bin_resolution] = bins_
         return bins_
 
 
@@ -215,6 +322,8 @@ class RandomSearchAlgorithm:
 
     max_entities_considered: int
     _positions: Optional[Iterable[Tuple[float, float]]] = None
+    _entities: Optional[List[Entity]] = None
+    rng: Optional[random.Random] = None
 
     def determine_target_position(  # pylint: disable=invalid-name
         self, entity: Animal, entities: List[Entity], distance: int
@@ -222,6 +331,8 @@ class RandomSearchAlgorithm:
         """Picks the first entity found within the specified distance"""
         # Note that this function is slightly ugly, this is for optimization purposes.
         # This assumes that entities and their positions are constant during 1 processing tick.
+        if self._entities is not None:
+            entities = self._entities
         if self._positions is None:
             self._positions = tuple(tuple(x.position) for x in entities)  # type: ignore
 
@@ -237,6 +348,152 @@ class RandomSearchAlgorithm:
         return None
 
     def update(self, entities: List[Entity]):
-        """Randomly shuffles entities to avoid always returning same target pos"""
-        random.shuffle(entities)
+        """Randomly shuffles a copy of the entities to avoid always returning the same
+        target pos, without reordering the specified list.
+        """
+        rng = self.rng if self.rng is not None else random
+        self._entities = list(entities)
+        rng.shuffle(self._entities)
         self._positions = None
+
+    def add_entities(self, entities: Iterable[Entity]):
+        """Does nothing, the entities are shuffled every tick"""
+
+    def remove_entities(self, entities: Iterable[Entity]):
+        """Does nothing, the entities are shuffled every tick"""
+
+
+Cell = Tuple[int, int]
+GridItem = Tuple[float, float, Entity]
+
+
+@dataclass
+class UniformGrid:
+    """Spatial index that buckets entities into square cells of the specified size.
+    Entities are assumed not to move while they are in the grid.
+    """
+
+    cell_size: float
+    _cells: DefaultDict[Cell, Dict[int, GridItem]] = field(
+        init=False, default_factory=lambda: defaultdict(dict)
+    )
+    _entity_cells: Dict[int, Cell] = field(init=False, default_factory=dict)
+
+    def compute_cell(self, position: Coordinate) -> Cell:
+        """Returns the cell containing the specified position"""
+        return (
+            int(position.x // self.cell_size),
+            int(position.y // self.cell_size),
+        )
+
+    def add(self, entity: Entity):
+        """Adds the entity to the cell containing its position"""
+        position = entity.position
+        cell = self.compute_cell(position)
+        self._cells[cell][id(entity)] = (position.x, position.y, entity)
+        self._entity_cells[id(entity)] = cell
+
+    def remove(self, entity: Entity):
+        """Removes the entity from the grid, if it is in the grid"""
+        self._remove(id(entity))
+
+    def find_nearest(  # pylint: disable=too-many-locals
+        self, position: Coordinate, distance: float
+    ) -> Optional[Entity]:
+        """Returns the nearest entity that is not dead within the specified distance
+        of the specified position, or None if there is none.
+
+        Cells are searched in rings of increasing distance around the cell containing
+        the position, stopping as soon as no closer entity can be found in the next ring.
+        """
+        cell_size = self.cell_size
+        pos_x, pos_y = position.x, position.y
+        cell_x, cell_y = int(pos_x // cell_size), int(pos_y // cell_size)
+        # distance from the position to the closest edge of its own cell
+        edge_distance = min(
+            pos_x - cell_x * cell_size,
+            (cell_x + 1) * cell_size - pos_x,
+            pos_y - cell_y * cell_size,
+            (cell_y + 1) * cell_size - pos_y,
+        )
+        best_entity = None
+        best_square_distance = distance ** 2
+        cells = self._cells
+        for ring in range(math.ceil(distance / cell_size) + 1):
+            for cell in _compute_ring(cell_x, cell_y, ring):
+                items = cells.get(cell)
+                if not items:
+                    continue
+                for x, y, entity in items.values():  # pylint: disable=invalid-name
+                    square_distance = (x - pos_x) ** 2 + (y - pos_y) ** 2
+                    if square_distance <= best_square_distance and not entity.dead:
+                        best_entity = entity
+                        best_square_distance = square_distance
+            # entities outside of the searched rings are at least this far away
+            if (
+                best_entity is not None
+                and best_square_distance <= (ring * cell_size + edge_distance) ** 2
+            ):
+                break
+        return best_entity
+
+    def _remove(self, entity_id: int):
+        cell = self._entity_cells.pop(entity_id, None)
+        if cell is None:
+            return
+
+        items = self._cells[cell]
+        del items[entity_id]
+        if not items:
+            del self._cells[cell]
+
+    def __len__(self) -> int:
+        return len(self._entity_cells)
+
+
+def _compute_ring(cell_x: int, cell_y: int, ring: int) -> Iterable[Cell]:
+    if not ring:
+        return [(cell_x, cell_y)]
+
+    top, bottom = cell_y - ring, cell_y + ring
+    left, right = cell_x - ring, cell_x + ring
+    cells = [(x, y) for x in range(left, right + 1) for y in (top, bottom)]
+    cells.extend((x, y) for x in (left, right) for y in range(top + 1, bottom))
+    return cells
+
+
+@dataclass
+class GridSearchAlgorithm:
+    """Search algorithm that finds the closest target within the specified distance
+    using a uniform grid. Instead of being rebuilt every tick, the grid is kept up to
+    date by add_entities and remove_entities, which have to be called whenever entities
+    spawn or die.
+    """
+
+    cell_size: float = 20
+    _grid: UniformGrid = field(init=False)
+
+    def __post_init__(self):
+        self._grid = UniformGrid(self.cell_size)
+
+    def determine_target_position(  # pylint: disable=unused-argument
+        self, entity: Animal, entities: List[Entity], distance: int
+    ) -> Optional[List[Coordinate]]:
+        """Returns the position of the closest entity within the specified distance,
+        or None if there is none.
+        """
+        nearest = self._grid.find_nearest(entity.position, distance)
+        return None if nearest is None else [nearest.position]
+
+    def update(self, entities: List[Entity]):
+        """Does nothing, the grid is updated as entities are added and removed"""
+
+    def add_entities(self, entities: Iterable[Entity]):
+        """Adds the entities to the grid"""
+        for entity in entities:
+            self._grid.add(entity)
+
+    def remove_entities(self, entities: Iterable[Entity]):
+        """Removes the entities from the grid"""
+        for entity in entities:
+            self._grid.remove(entity)
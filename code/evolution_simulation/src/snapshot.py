@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""Contains functions to save the complete state of a running simulation to a snapshot
+and to resume it later, or to fork it by restoring it into a simulation with different
+parameters.
+
+A snapshot consists of a header (magic bytes and format version) followed by the
+pickled state of the simulation: the columns of all animals and foods, the random
+generator states, the running trait statistics and optionally the metrics history.
+Animals and foods are stored as columns of plain values (or numpy arrays for the
+vectorized engine) rather than as objects, so search algorithms and position
+generators are never pickled and large populations are written quickly.
+"""
+from __future__ import annotations
+
+import gc
+import os
+import pickle
+import struct
+from contextlib import contextmanager
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import Optional
+from typing import Protocol
+from typing import Tuple
+
+from src.metrics import MetricsHistory
+
+MAGIC = b"EVOSNAP\0"
+VERSION = 1
+_HEADER = struct.Struct("<8sH")
+
+
+class SnapshotSimulation(Protocol):
+    """Interface for a simulation whose state can be saved in a snapshot"""
+
+    def get_state(self) -> Dict[str, Any]:
+        """Returns the complete state of the simulation"""
+        ...
+
+    def set_state(self, state: Dict[str, Any]):
+        """Restores the state returned by get_state"""
+        ...
+
+
+def dumps(
+    simulation: SnapshotSimulation, history: Optional[MetricsHistory] = None
+) -> bytes:
+    """Returns a snapshot of the simulation and the (optional) metrics history"""
+    with _paused_gc():
+        payload = {"state": simulation.get_state(), "history": history}
+        return _HEADER.pack(MAGIC, VERSION) + pickle.dumps(
+            payload, protocol=pickle.HIGHEST_PROTOCOL
+        )
+
+
+def loads(data: bytes, simulation: SnapshotSimulation) -> Optional[MetricsHistory]:
+    """Restores the snapshot into the simulation, which must use the same engine as the
+    simulation the snapshot was taken of. Returns the metrics history stored in the
+    snapshot, if any.
+    """
+    with _paused_gc():
+        state, history = _parse(data)
+        simulation.set_state(state)
+    return history
+
+
+def save_snapshot(
+    path: str,
+    simulation: SnapshotSimulation,
+    history: Optional[MetricsHistory] = None,
+):
+    """Writes a snapshot of the simulation and the (optional) metrics history to the
+    specified path. The snapshot is written to a temporary file first, so an
+    interrupted save never leaves a truncated snapshot behind.
+    """
+    data = dumps(simulation, history)
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(data)
+    os.replace(temporary_path, path)
+
+
+def load_snapshot(
+    path: str, simulation: SnapshotSimulation
+) -> Optional[MetricsHistory]:
+    """Restores the snapshot at the specified path into the simulation, see loads"""
+    with open(path, "rb") as file:
+        return loads(file.read(), simulation)
+
+
+@contextmanager
+def _paused_gc() -> Iterator[None]:
+    # creating many objects at once triggers repeated garbage collections of the
+    # whole heap, although none of the new objects are garbage
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _parse(data: bytes) -> Tuple[Dict[str, Any], Optional[MetricsHistory]]:
+    if len(data) < _HEADER.size:
+        raise ValueError("Not a simulation snapshot: too short")
+    magic, version = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a simulation snapshot: invalid magic bytes")
+    if version != VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}, expected {VERSION}")
+
+    try:
+        payload = pickle.loads(memoryview(data)[_HEADER.size :])
+        return payload["state"], payload["history"]
+    except (pickle.UnpicklingError, EOFError, KeyError, TypeError) as exc:
+        raise ValueError("Not a simulation snapshot: corrupt payload") from exc
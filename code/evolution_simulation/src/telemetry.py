@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""Contains live telemetry for a running simulation: an in-window overlay with
+sparklines of the most important metrics, and a background writer which appends the
+metrics of every tick to a CSV or Parquet file.
+
+The overlay keeps one small surface per sparkline, which is scrolled by one pixel and
+extended by a single line segment per tick, so it is only fully redrawn when a value
+leaves the plotted range. Labels are rendered once, values are re-rendered every few
+ticks.
+
+Writing Parquet files requires pyarrow.
+"""
+from __future__ import annotations
+
+import csv
+import math
+import queue
+import threading
+from collections import deque
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Deque
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import pygame
+from src.metrics import METRICS
+from src.metrics import MetricsSample
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+Colour = Tuple[int, int, int]
+
+BACKGROUND_COLOUR = (20, 20, 20)
+TEXT_COLOUR = (220, 220, 220)
+OVERLAY_METRICS = (
+    ("animal_amount", "Animals", (218, 59, 86)),
+    ("food_amount", "Food", (111, 123, 117)),
+    ("size", "Size", (230, 160, 60)),
+    ("vision", "Vision", (90, 170, 220)),
+    ("speed", "Speed", (33, 60, 193)),
+)
+
+
+@dataclass
+class Sparkline:  # pylint: disable=too-many-instance-attributes
+    """Scrolling line plot of the last width values of a single metric"""
+
+    colour: Colour
+    width: int = 150
+    height: int = 24
+    margin: float = 0.1
+    surface: pygame.surface.Surface = field(init=False)
+    values: Deque[float] = field(init=False)
+
+    def __post_init__(self):
+        self.surface = pygame.Surface((self.width, self.height))
+        self.surface.fill(BACKGROUND_COLOUR)
+        self.values = deque(maxlen=self.width)
+        self._minimum = math.inf
+        self._maximum = -math.inf
+        self._appended = 0
+
+    def append(self, value: float):
+        """Adds the value to the right end of the sparkline, scrolling older values
+        to the left. Values which are not a number are skipped.
+        """
+        if math.isnan(value):
+            return
+        self.values.append(value)
+        self._appended += 1
+        out_of_range = not self._minimum <= value <= self._maximum
+        # the range is shrunk to the visible values once per full scroll
+        if out_of_range or self._appended % self.width == 0:
+            self._fit_range()
+            self.redraw()
+            return
+
+        self.surface.scroll(dx=-1)
+        self.surface.fill(BACKGROUND_COLOUR, (self.width - 1, 0, 1, self.height))
+        if len(self.values) > 1:
+            x = self.width - 1  # pylint: disable=invalid-name
+            pygame.draw.line(
+                self.surface,
+                self.colour,
+                (x - 1, self._compute_y(self.values[-2])),
+                (x, self._compute_y(value)),
+            )
+
+    def redraw(self):
+        """Redraws all values"""
+        self.surface.fill(BACKGROUND_COLOUR)
+        if len(self.values) < 2:
+            return
+        offset = self.width - len(self.values)
+        points = [
+            (offset + i, self._compute_y(value)) for i, value in enumerate(self.values)
+        ]
+        pygame.draw.lines(self.surface, self.colour, False, points)
+
+    def _fit_range(self):
+        minimum, maximum = min(self.values), max(self.values)
+        padding = (maximum - minimum) * self.margin or abs(maximum) * self.margin or 1
+        self._minimum, self._maximum = minimum - padding, maximum + padding
+
+    def _compute_y(self, value: float) -> int:
+        fraction = (value - self._minimum) / (self._maximum - self._minimum)
+        return round((self.height - 1) * (1 - fraction))
+
+
+@dataclass
+class TelemetryOverlay:  # pylint: disable=too-many-instance-attributes
+    """Overlay drawing a labelled sparkline and the current value of each metric"""
+
+    position: Tuple[int, int] = (10, 10)
+    metrics: Sequence[Tuple[str, str, Colour]] = OVERLAY_METRICS
+    sparkline_width: int = 150
+    sparkline_height: int = 24
+    font_size: int = 16
+    text_interval: int = 10
+    visible: bool = False
+
+    def __post_init__(self):
+        self.font = pygame.font.Font(None, self.font_size)
+        self.sparklines = [
+            Sparkline(colour, self.sparkline_width, self.sparkline_height)
+            for _, _, colour in self.metrics
+        ]
+        self.labels = [
+            self.font.render(label, True, colour) for _, label, colour in self.metrics
+        ]
+        self.value_texts: List[Optional[pygame.surface.Surface]] = [None] * len(
+            self.metrics
+        )
+        label_width = max(label.get_width() for label in self.labels)
+        self._sparkline_x = label_width + 8
+        self._value_x = self._sparkline_x + self.sparkline_width + 8
+        self._row_height = self.sparkline_height + 4
+        self.background = pygame.Surface(
+            (self._value_x + 60, self._row_height * len(self.metrics) + 4)
+        )
+        self.background.fill(BACKGROUND_COLOUR)
+        self.background.set_alpha(200)
+        self._ticks = 0
+
+    def update(self, sample: MetricsSample):
+        """Adds the metrics of the current tick to the sparklines"""
+        update_text = self._ticks % self.text_interval == 0
+        for i, ((name, _, _), sparkline) in enumerate(
+            zip(self.metrics, self.sparklines)
+        ):
+            value = getattr(sample, name)
+            sparkline.append(value)
+            if update_text:
+                self.value_texts[i] = self.font.render(
+                    f"{value:.4g}", True, TEXT_COLOUR
+                )
+        self._ticks += 1
+
+    def toggle(self):
+        """Shows the overlay if it is hidden, else hides it"""
+        self.visible = not self.visible
+
+    def draw(self, screen: pygame.surface.Surface):
+        """Draws the overlay on the screen, if it is visible"""
+        if not self.visible:
+            return
+        x, y = self.position  # pylint: disable=invalid-name
+        blits: List[Tuple[pygame.surface.Surface, Tuple[int, int]]] = [
+            (self.background, (x, y))
+        ]
+        for i, (label, sparkline, value_text) in enumerate(
+            zip(self.labels, self.sparklines, self.value_texts)
+        ):
+            row_y = y + 4 + i * self._row_height
+            text_y = row_y + (self.sparkline_height - label.get_height()) // 2
+            blits.append((label, (x + 4, text_y)))
+            blits.append((sparkline.surface, (x + self._sparkline_x, row_y)))
+            if value_text is not None:
+                blits.append((value_text, (x + self._value_x, text_y)))
+        screen.blits(blits, doreturn=False)
+
+
+class _CsvSink:
+    def __init__(self, path: str, columns: Sequence[str]):
+        self.file = open(  # pylint: disable=consider-using-with
+            path, "w", newline="", encoding="utf-8"
+        )
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write(self, rows: List[Sequence[Any]]):
+        """Appends the rows to the file"""
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        """Closes the file"""
+        self.file.close()
+
+
+class _ParquetSink:
+    def __init__(self, path: str, columns: Sequence[str]):
+        if pyarrow is None:
+            raise ImportError("Writing Parquet files requires pyarrow")
+        self.columns = list(columns)
+        self.schema = pyarrow.schema(
+            [(columns[0], pyarrow.int64())]
+            + [(name, pyarrow.float64()) for name in columns[1:]]
+        )
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write(self, rows: List[Sequence[Any]]):
+        """Appends the rows to the file as a new row group"""
+        columns = {name: list(values) for name, values in zip(self.columns, zip(*rows))}
+        self.writer.write_table(pyarrow.Table.from_pydict(columns, self.schema))
+
+    def close(self):
+        """Closes the file"""
+        self.writer.close()
+
+
+@dataclass
+class TelemetryWriter:
+    """Appends the metrics of every tick to a CSV file, or a Parquet file if the path
+    ends with .parquet. Samples are queued and written in batches by a background
+    thread, so writing never blocks the game loop. Use as context manager, or call
+    close to write the remaining samples.
+    """
+
+    path: str
+    batch_size: int = 256
+    flush_interval: float = 1.0
+
+    def __post_init__(self):
+        columns = ["tick"] + METRICS
+        sink_type = _ParquetSink if self.path.endswith(".parquet") else _CsvSink
+        self._sink = sink_type(self.path, columns)
+        self._queue: queue.Queue = queue.Queue()
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, tick: int, sample: MetricsSample):
+        """Queues the metrics of the specified tick to be written. Reraises the error
+        that stopped the background thread, if writing failed, instead of queueing
+        samples that are never written.
+        """
+        if self._error is not None:
+            raise self._error
+        self._queue.put_nowait([tick] + [getattr(sample, name) for name in METRICS])
+
+    def close(self):
+        """Writes all queued samples, closes the file and stops the background thread.
+        Reraises the first error raised while writing.
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self) -> TelemetryWriter:
+        return self
+
+    def __exit__(self, *args: Any):
+        self.close()
+
+    def _run(self):
+        try:
+            stopped = False
+            while not stopped:
+                batch, stopped = self._collect_batch()
+                if batch:
+                    self._sink.write(batch)
+        except Exception as error:  # pylint: disable=broad-except
+            self._error = error
+        finally:
+            self._sink.close()
+
+    def _collect_batch(self) -> Tuple[List[Sequence[Any]], bool]:
+        batch: List[Sequence[Any]] = []
+        try:
+            row = self._queue.get(timeout=self.flush_interval)
+            while row is not None:
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    break
+                row = self._queue.get_nowait()
+        except queue.Empty:
+            return batch, False
+        return batch, row is None
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Contains the time warp controller, which decides how many simulation ticks are run
+per rendered frame.
+
+In fixed mode, a fixed amount of ticks is run per frame. In adaptive mode, the amount
+of ticks per frame is adapted to the measured tick and render times, so that ticks and
+rendering together take the target frame time. In uncapped mode, ticks are run as fast
+as possible and a frame is only rendered every render_period milliseconds of wall time.
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from dataclasses import field
+from enum import Enum
+from typing import Iterator
+from typing import Optional
+
+
+class WarpMode(Enum):
+    """How the amount of ticks per frame is chosen"""
+
+    FIXED = "fixed"
+    ADAPTIVE = "adaptive"
+    UNCAPPED = "uncapped"
+
+
+@dataclass
+class TimeWarp:  # pylint: disable=too-many-instance-attributes
+    """Decides how many ticks to run per frame, see WarpMode. Times are specified in
+    milliseconds. If rendering is disabled, ticks are run like in uncapped mode.
+    """
+
+    mode: WarpMode = WarpMode.FIXED
+    ticks_per_frame: int = 1
+    target_frame_time: float = 1000 / 60
+    render_period: float = 100
+    max_ticks_per_frame: int = 10000
+    smoothing: float = 0.2
+    rendering: bool = True
+    tick_time: Optional[float] = field(init=False, default=None)
+    render_time: float = field(init=False, default=0)
+    ticks_per_second: float = field(init=False, default=0)
+
+    def __post_init__(self):
+        self._last_frame_start: Optional[float] = None
+        self._ticks_last_frame = 0
+
+    def ticks(self) -> Iterator[int]:
+        """Yields once for every tick to run in the current frame. The tick time is
+        measured (and the ticks per frame adapted) once all ticks were run.
+        """
+        start = time.perf_counter()
+        if self._last_frame_start is not None and start > self._last_frame_start:
+            self.ticks_per_second = self._smooth(
+                self.ticks_per_second,
+                self._ticks_last_frame / (start - self._last_frame_start),
+            )
+        self._last_frame_start = start
+
+        count = 0
+        if self.caps_frame_rate:
+            yield from range(self.ticks_per_frame)
+            count = self.ticks_per_frame
+        else:
+            deadline = start + self.render_period / 1000
+            while True:
+                yield count
+                count += 1
+                if time.perf_counter() >= deadline:
+                    break
+
+        self._ticks_last_frame = count
+        tick_time = (time.perf_counter() - start) * 1000 / count
+        self.tick_time = self._smooth(self.tick_time, tick_time)
+        if self.mode is WarpMode.ADAPTIVE:
+            self._adapt()
+
+    def rendered(self, render_time: float):
+        """Records the time it took to render the last frame"""
+        self.render_time = self._smooth(self.render_time, render_time)
+
+    @property
+    def caps_frame_rate(self) -> bool:
+        """True if frames should wait for the frame rate, which is the case unless
+        running uncapped or without rendering.
+        """
+        return self.rendering and self.mode is not WarpMode.UNCAPPED
+
+    def cycle_mode(self):
+        """Switches to the next mode"""
+        modes = list(WarpMode)
+        self.mode = modes[(modes.index(self.mode) + 1) % len(modes)]
+        if self.mode is WarpMode.FIXED:
+            self.ticks_per_frame = 1
+
+    def change_speed(self, factor: float):
+        """Multiplies the ticks per frame (fixed mode) or the render period (uncapped
+        mode) by the specified factor.
+        """
+        if self.mode is WarpMode.UNCAPPED:
+            self.render_period = min(2000, max(10, self.render_period * factor))
+        else:
+            self.mode = WarpMode.FIXED
+            self.ticks_per_frame = min(
+                self.max_ticks_per_frame, max(1, round(self.ticks_per_frame * factor))
+            )
+
+    def toggle_rendering(self):
+        """Disables rendering if it is enabled, else enables it"""
+        self.rendering = not self.rendering
+
+    def _adapt(self):
+        remaining_time = max(0, self.target_frame_time - self.render_time)
+        ticks_per_frame = remaining_time / max(self.tick_time, 1e-6)  # type: ignore
+        self.ticks_per_frame = int(
+            min(self.max_ticks_per_frame, max(1, round(ticks_per_frame)))
+        )
+
+    def _smooth(self, average: Optional[float], value: float) -> float:
+        if not average:
+            return value
+        return average + self.smoothing * (value - average)
+
+    def __str__(self) -> str:
+        if not self.rendering:
+            speed = "rendering disabled"
+        elif self.mode is WarpMode.UNCAPPED:
+            speed = f"frame every {self.render_period:.0f} ms"
+        else:
+            speed = f"{self.ticks_per_frame} ticks per frame"
+        return f"{self.mode.value}, {speed}, {self.ticks_per_second:.0f} ticks/s"
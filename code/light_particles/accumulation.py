@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Contains a renderer that accumulates the light particles of all light sources in a
+single float buffer, instead of blitting every particle onto the screen separately.
+
+The particles of all light sources are splatted into a (optionally lower resolution)
+buffer, which is blurred to produce the glow, decayed over time to produce the light
+trails and tone-mapped and blitted onto the screen once per frame.
+
+Requires numpy.
+
+@author: Korean_Crimson
+"""
+from dataclasses import dataclass
+from typing import Iterable
+from typing import Protocol
+from typing import Tuple
+
+import numpy
+import pygame
+
+
+class ArrayParticleSource(Protocol):
+    """Interface for a light source that exposes its particles as arrays"""
+
+    def particle_arrays(self) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """Returns the positions, energies and colours of all live particles"""
+        ...
+
+
+def box_blur(array: numpy.ndarray, radius: int, axis: int) -> numpy.ndarray:
+    """Returns the array blurred with a box filter of the specified radius along the
+    specified axis, computed with a cumulative sum in O(n), regardless of the radius.
+    """
+    if radius <= 0:
+        return array
+
+    moved = numpy.moveaxis(array, axis, 0)
+    padding = [(radius + 1, radius)] + [(0, 0)] * (moved.ndim - 1)
+    cumulative = numpy.cumsum(numpy.pad(moved, padding), axis=0)
+    window = 2 * radius + 1
+    blurred = (cumulative[window:] - cumulative[:-window]) / window
+    return numpy.moveaxis(blurred, 0, axis)
+
+
+@dataclass
+class AccumulationRenderer:  # pylint: disable=too-many-instance-attributes
+    """Renders the particles of any amount of light sources using a float buffer.
+
+    The buffer has the size of the screen divided by the scale. Each frame, the buffer
+    is dimmed by the decay (the equivalent of subtracting it from the screen), the new
+    particles are splatted into it and blurred to produce the glow, and the result is
+    tone-mapped, scaled up and blitted onto the screen in a single blit.
+    """
+
+    size: Tuple[int, int]
+    scale: int = 2
+    decay: float = 5
+    intensity: float = 0.5
+    glow_strength: float = 4
+    blur_radius: int = 3
+    blur_passes: int = 1
+    exposure: float = 2
+    max_value: float = 1024
+
+    def __post_init__(self):
+        width, height = self.size
+        self.buffer_size = (max(1, width // self.scale), max(1, height // self.scale))
+        self.buffer = numpy.zeros((*self.buffer_size, 3), dtype=numpy.float32)
+        self._small_surface = pygame.Surface(self.buffer_size, depth=32)
+        self._surface = pygame.Surface(self.size, depth=32)
+
+    def render(self, screen: pygame.Surface, sources: Iterable[ArrayParticleSource]):
+        """Accumulates the particles of all specified light sources and renders the
+        resulting light onto the screen.
+        """
+        splat = self.splat(sources)
+        glow = splat
+        for _ in range(self.blur_passes):
+            glow = box_blur(box_blur(glow, self.blur_radius, 0), self.blur_radius, 1)
+
+        buffer = self.buffer
+        buffer -= self.decay
+        buffer += splat
+        buffer += glow * self.glow_strength
+        numpy.clip(buffer, 0, self.max_value, out=buffer)
+
+        pygame.surfarray.blit_array(self._small_surface, self.tone_map(buffer))
+        pygame.transform.smoothscale(self._small_surface, self.size, self._surface)
+        screen.blit(self._surface, (0, 0))
+
+    def splat(self, sources: Iterable[ArrayParticleSource]) -> numpy.ndarray:
+        """Returns a new buffer containing the light of all particles of the specified
+        sources, each particle adding its colour, weighted by its energy, to the buffer
+        cell it is in.
+        """
+        width, height = self.buffer_size
+        indices, weights, colours = [], [], []
+        for source in sources:
+            positions, energies, source_colours = source.particle_arrays()
+            cells = (positions // self.scale).astype(int)
+            inside = (
+                (cells[:, 0] >= 0)
+                & (cells[:, 0] < width)
+                & (cells[:, 1] >= 0)
+                & (cells[:, 1] < height)
+            )
+            indices.append(cells[inside, 0] * height + cells[inside, 1])
+            weights.append(numpy.maximum(energies[inside], 1) * self.intensity)
+            colours.append(source_colours[inside, :3])
+
+        splat = numpy.zeros((width, height, 3), dtype=numpy.float32)
+        if not indices:
+            return splat
+
+        all_indices = numpy.concatenate(indices)
+        all_weights = numpy.concatenate(weights)
+        all_colours = numpy.concatenate(colours)
+        for channel in range(3):
+            splat[:, :, channel] = numpy.bincount(
+                all_indices,
+                weights=all_colours[:, channel] * all_weights,
+                minlength=width * height,
+            ).reshape((width, height))
+        return splat
+
+    def tone_map(self, buffer: numpy.ndarray) -> numpy.ndarray:
+        """Maps the unbounded light values of the buffer to displayable 8-bit colours"""
+        mapped = 255 * (1 - numpy.exp(buffer * (-self.exposure / 255)))
+        return mapped.astype(numpy.uint8)
+
+    def clear(self):
+        """Removes all accumulated light from the buffer"""
+        self.buffer.fill(0)
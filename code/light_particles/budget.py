@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Contains a controller that distributes a particle budget between light sources.
+
+The controller measures the frame time and scales the spawn rate of all light sources
+down when the frame takes longer than the target frame time, and back up when there is
+time to spare (additive increase, multiplicative decrease). The energy of each light
+source is scaled with its spawn rate, so that fewer particles are spawned instead of
+bigger ones. When the budget is scaled down, light sources switch to smaller (cheaper)
+glow tiers, whose sprite colours are quantized more coarsely, so that sources with
+similar colours share the same cached glow sprites. A global particle cap is split
+between the light sources according to their requested spawn rates.
+
+@author: Korean_Crimson
+"""
+from collections import deque
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Deque
+from typing import List
+from typing import Optional
+from typing import Protocol
+from typing import Tuple
+
+
+class BudgetedLightSource(Protocol):
+    """Interface for a light source whose particles can be budgeted"""
+
+    spawn: int
+    energy: float
+    max_particles: Optional[int]
+    max_radius_increase: int
+    colour_step: Optional[int]
+
+    @property
+    def particle_count(self) -> int:
+        """The amount of particles currently alive"""
+        ...
+
+
+@dataclass
+class BudgetDecision:  # pylint: disable=too-many-instance-attributes
+    """The decisions made by the budget controller in a single frame"""
+
+    frame: int
+    frame_time: float
+    smoothed_frame_time: float
+    scale: float
+    particle_count: int
+    glow_tier: int
+    colour_step: int
+    spawns: List[int]
+    max_particles: List[int]
+
+    def __str__(self) -> str:
+        return (
+            f"frame {self.frame}: {len(self.spawns)} sources, "
+            f"{self.particle_count} particles, {self.frame_time:.1f} ms "
+            f"(avg {self.smoothed_frame_time:.1f} ms), scale {self.scale:.2f}, "
+            f"glow {self.glow_tier} (colour step {self.colour_step})"
+        )
+
+
+@dataclass
+class ParticleBudgetController:  # pylint: disable=too-many-instance-attributes
+    """Adapts the spawn rates and glow tiers of the registered light sources to the
+    measured frame time, while keeping the total amount of particles below global_cap.
+    Frame times are specified in milliseconds.
+    """
+
+    target_frame_time: float = 20
+    global_cap: int = 20000
+    min_scale: float = 0.05
+    increase_step: float = 0.02
+    decrease_factor: float = 0.85
+    smoothing: float = 0.2
+    glow_tiers: Tuple[int, ...] = (7, 5, 3, 1)
+    colour_steps: Tuple[int, ...] = (8, 16, 32, 64)  # per glow tier
+    history_length: int = 300
+    scale: float = field(init=False, default=1)
+    history: Deque[BudgetDecision] = field(init=False)
+
+    def __post_init__(self):
+        self.history = deque(maxlen=self.history_length)
+        self._sources: List[BudgetedLightSource] = []
+        self._base_spawns: List[int] = []
+        self._base_energies: List[float] = []
+        self._smoothed_frame_time: Optional[float] = None
+        self._frame = 0
+
+    def register(self, source: BudgetedLightSource):
+        """Registers the light source, its current spawn rate and energy are the
+        maximum spawn rate and energy it will be assigned.
+        """
+        self._sources.append(source)
+        self._base_spawns.append(source.spawn)
+        self._base_energies.append(source.energy)
+        self._distribute()
+
+    def unregister(self, source: BudgetedLightSource):
+        """Stops budgeting the specified light source and restores its spawn rate"""
+        index = self._sources.index(source)
+        source.spawn = self._base_spawns.pop(index)
+        source.energy = self._base_energies.pop(index)
+        source.max_particles = None
+        del self._sources[index]
+        self._distribute()
+
+    def update(self, frame_time: float) -> BudgetDecision:
+        """Updates the budget using the time (in ms) it took to compute the last frame
+        and returns the resulting decisions.
+        """
+        if self._smoothed_frame_time is None:
+            self._smoothed_frame_time = frame_time
+        self._smoothed_frame_time += self.smoothing * (
+            frame_time - self._smoothed_frame_time
+        )
+
+        if self._smoothed_frame_time > self.target_frame_time:
+            self.scale *= self.decrease_factor
+        else:
+            self.scale += self.increase_step
+        self.scale = min(1, max(self.min_scale, self.scale))
+
+        particle_count = sum(source.particle_count for source in self._sources)
+        if particle_count > self.global_cap:
+            self.scale = max(
+                self.min_scale, self.scale * self.global_cap / particle_count
+            )
+        self._distribute()
+
+        self._frame += 1
+        decision = BudgetDecision(
+            frame=self._frame,
+            frame_time=frame_time,
+            smoothed_frame_time=self._smoothed_frame_time,
+            scale=self.scale,
+            particle_count=particle_count,
+            glow_tier=self.glow_tier,
+            colour_step=self.colour_step,
+            spawns=[source.spawn for source in self._sources],
+            max_particles=[source.max_particles for source in self._sources],  # type: ignore
+        )
+        self.history.append(decision)
+        return decision
+
+    @property
+    def glow_tier(self) -> int:
+        """The glow size (max_radius_increase) assigned to all sources, which shrinks
+        as the budget scale drops.
+        """
+        return self.glow_tiers[self._tier_index]
+
+    @property
+    def colour_step(self) -> int:
+        """The glow sprite colour quantization assigned to all sources, which gets
+        coarser with the glow tier.
+        """
+        return self.colour_steps[min(len(self.colour_steps) - 1, self._tier_index)]
+
+    @property
+    def _tier_index(self) -> int:
+        tiers = self.glow_tiers
+        return min(len(tiers) - 1, int((1 - self.scale) * len(tiers)))
+
+    @property
+    def latest(self) -> Optional[BudgetDecision]:
+        """The decisions made in the last frame, or None if no frame was budgeted yet"""
+        return self.history[-1] if self.history else None
+
+    def _distribute(self):
+        total_spawn = sum(self._base_spawns) or 1
+        glow_tier = self.glow_tier
+        colour_step = self.colour_step
+        for source, base_spawn, base_energy in zip(
+            self._sources, self._base_spawns, self._base_energies
+        ):
+            # energy is scaled with the spawn rate to keep the particle sizes constant
+            source.spawn = max(1, round(base_spawn * self.scale))
+            source.energy = base_energy * source.spawn / base_spawn
+            source.max_particles = max(
+                1, int(self.global_cap * base_spawn / total_spawn)
+            )
+            source.max_radius_increase = glow_tier
+            source.colour_step = colour_step
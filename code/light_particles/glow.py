@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Contains a cache of pre-rendered glow sprites used to render light particles.
+
+Instead of allocating a new surface for every particle in every frame, glow sprites
+are rendered once per quantized radius and colour and then reused, so that rendering
+a particle only costs a single additive blit.
+
+@author: Korean_Crimson
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import pygame
+
+GlowKey = Tuple[int, Tuple[int, ...], int]
+
+
+def saturate(value, min_val=0, max_val=255):
+    """Saturates a number between the provided min and max values"""
+    return min(max(value, min_val), max_val)
+
+
+def render_glow(
+    radius: int, colour: Sequence[int], max_increase: int
+) -> pygame.Surface:
+    """Renders a glow sprite consisting of a number of concentric circles around a
+    core circle of the specified radius and colour. The sprite is centered on the core.
+    """
+    max_radius = radius + max_increase
+    surf = pygame.Surface((max_radius * 2, max_radius * 2))
+    centre = (max_radius, max_radius)
+    for i in range(max_increase, 0, -2):
+        glow_colour = tuple(
+            saturate(x * (max_increase - i) / (max_increase / 2)) for x in colour
+        )
+        pygame.draw.circle(surf, glow_colour, centre, radius + i)
+    pygame.draw.circle(surf, colour, centre, radius)
+    return surf
+
+
+@dataclass
+class GlowCache:
+    """Least recently used cache of glow sprites, keyed by quantized radius and colour.
+
+    Radii are rounded to the nearest integer and colour components are quantized to
+    multiples of colour_step (unless a coarser step is requested per lookup), which
+    keeps the amount of distinct sprites small.
+    """
+
+    max_size: int = 2048
+    colour_step: int = 8
+    _sprites: "OrderedDict[GlowKey, pygame.Surface]" = field(
+        init=False, default_factory=OrderedDict
+    )
+    hits: int = field(init=False, default=0)
+    misses: int = field(init=False, default=0)
+
+    def get(
+        self,
+        radius: float,
+        colour: Sequence[float],
+        max_increase: int,
+        colour_step: Optional[int] = None,
+    ) -> pygame.Surface:
+        """Returns the glow sprite for the specified radius, colour and glow size,
+        rendering it if it is not cached yet. Evicts the least recently used sprite
+        if the cache is full.
+        """
+        return self.get_quantized(
+            self.compute_key(radius, colour, max_increase, colour_step)
+        )
+
+    def get_quantized(self, key: GlowKey) -> pygame.Surface:
+        """Returns the glow sprite for the specified, already quantized, cache key"""
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self.hits += 1
+            self._sprites.move_to_end(key)
+            return sprite
+
+        self.misses += 1
+        sprite = render_glow(*key)
+        self._sprites[key] = sprite
+        if len(self._sprites) > self.max_size:
+            self._sprites.popitem(last=False)
+        return sprite
+
+    def compute_key(
+        self,
+        radius: float,
+        colour: Sequence[float],
+        max_increase: int,
+        colour_step: Optional[int] = None,
+    ) -> GlowKey:
+        """Returns the quantized cache key for the specified sprite parameters, colour
+        components are quantized to multiples of colour_step (the cache default if None)
+        """
+        step = colour_step or self.colour_step
+        quantized_colour = tuple(
+            saturate(int(round(x / step)) * step) for x in colour[:3]
+        )
+        return (max(0, int(round(radius))), quantized_colour, max_increase)
+
+    def clear(self):
+        """Removes all cached sprites"""
+        self._sprites.clear()
+
+    def __len__(self) -> int:
+        return len(self._sprites)
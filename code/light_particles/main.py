@@ -4,16 +4,34 @@ A light source experiment based on emitting light particles from a source point.
 
 Use W and S keys to increase and decrease the particle speed
 (and thus the perceived brightness of the light source) during the simulation.
+Use R to toggle between rendering each particle separately and rendering all particles
+through a single accumulation buffer (requires numpy).
+Use N to add a light source in a random position and backspace to remove the last one.
+The particle budget of all light sources adapts to the measured frame time, the decisions
+of the budget controller are shown in the window caption.
 
 @author: Korean_Crimson
 """
 # pylint: disable=no-member
 import random
+import time
 from dataclasses import dataclass
 from typing import List
+from typing import Optional
 from typing import Tuple
 
 import pygame
+from budget import ParticleBudgetController
+from glow import GlowCache
+from glow import saturate
+
+try:
+    import numpy
+    from accumulation import AccumulationRenderer
+except ImportError:
+    print("Could not import numpy, falling back to the object based light source")
+    numpy = None
+    AccumulationRenderer = None  # pylint: disable=invalid-name
 
 
 WIDTH = 800
@@ -23,11 +41,10 @@ MIN_ENERGY = 0.05
 SPEED_SCALING = 5
 COLLISION_REDUCTION_FACTOR = 0.2
 MAX_RADIUS_INCREASE = 7  # this defines how chunky a particle will look!
+FRAMERATE = 50
 
 
-def saturate(value, min_val=0, max_val=255):
-    """Saturates a number between the provided min and max values"""
-    return min(max(value, min_val), max_val)
+GLOW_CACHE = GlowCache()
 
 
 @dataclass
@@ -75,22 +92,24 @@ class LightParticle:
             self.speed = (speed_x, -speed_y)
             self.energy *= COLLISION_REDUCTION_FACTOR
 
-    def render(self, screen):
-        """Renders the particle on the screen"""
-        # render a number of circles around the main particle circle
-        max_increase = self.max_radius_increase
-        max_radius = self.radius + max_increase
-        surf = pygame.Surface((max_radius * 2, max_radius * 2))
-        for i in range(max_increase, 0, -2):
-            colour = tuple(
-                saturate(x * (max_increase - i) / (max_increase / 2))
-                for x in self.colour
-            )
-            radius = self.radius + i
-            pygame.draw.circle(surf, colour, (radius, radius), radius)
-        screen.blit(surf, self.position, special_flags=pygame.BLEND_RGBA_ADD)
+    def render(self, screen, glow_cache: GlowCache = GLOW_CACHE):
+        """Renders the particle on the screen using a cached glow sprite"""
+        screen.blit(*self.compute_blit(glow_cache))
 
-        pygame.draw.circle(screen, self.colour, self.position, self.radius)
+    def compute_blit(
+        self, glow_cache: GlowCache = GLOW_CACHE, colour_step: Optional[int] = None
+    ):
+        """Returns the blit arguments (sprite, destination, area, flags) used to render
+        the particle glow centered on the particle position. The colour of the sprite
+        is quantized to multiples of colour_step (the glow cache default if None).
+        """
+        sprite = glow_cache.get(
+            self.radius, self.colour, self.max_radius_increase, colour_step
+        )
+        half_size = sprite.get_width() / 2
+        pos_x, pos_y = self.position
+        destination = (pos_x - half_size, pos_y - half_size)
+        return sprite, destination, None, pygame.BLEND_RGBA_ADD
 
     @property
     def radius(self) -> float:
@@ -104,13 +123,16 @@ class LightParticle:
 
 
 @dataclass
-class LightSource:
+class LightSource:  # pylint: disable=too-many-instance-attributes
     """Light source, which emits light particles each tick"""
 
     spawn: int = 1
     energy: float = 10
     position: Tuple[int, int] = (0, 0)
     colour: Tuple[int, int, int] = (255, 255, 255)
+    max_radius_increase: int = MAX_RADIUS_INCREASE
+    max_particles: Optional[int] = None
+    colour_step: Optional[int] = None  # glow sprite colour quantization
 
     def __post_init__(self):
         self.particles: List[LightParticle] = []
@@ -127,33 +149,239 @@ class LightSource:
         rate. Each particle will get a unit vector (magnitude 1) that specifies the angle
         at which it is emitted, as well as a slight colour variation of the light source colour,
         and an energy between 0% and 200% of the light source energy.
+        No particles are spawned beyond max_particles, if specified.
         """
         energy = self.energy / self.spawn
-        for _ in range(self.spawn):
+        for _ in range(self._compute_spawn_amount()):
             vel_x = random.randint(-10000, 10000) / 10000
             vel_y = (1 - abs(vel_x)) * random.choice([1, -1])
             speed = (vel_x, vel_y)
             colour = tuple(saturate(x + random.randint(-10, 10)) for x in self.colour)
             self.particles.append(
                 LightParticle(
-                    energy * random.randint(0, 200) / 100, self.position, speed, colour
+                    energy * random.randint(0, 200) / 100,
+                    self.position,
+                    speed,
+                    colour,
+                    self.max_radius_increase,
                 )
             )
 
-    def render(self, screen):
-        """Renders the light source on the screen"""
-        for particle in self.particles:
-            particle.render(screen)
+    def _compute_spawn_amount(self) -> int:
+        if self.max_particles is None:
+            return self.spawn
+        return max(0, min(self.spawn, self.max_particles - self.particle_count))
+
+    def render(self, screen, glow_cache: GlowCache = GLOW_CACHE):
+        """Renders the light source on the screen in a single batch of blits"""
+        screen.blits(
+            [
+                particle.compute_blit(glow_cache, self.colour_step)
+                for particle in self.particles
+            ],
+            doreturn=False,
+        )
+
+    @property
+    def particle_count(self) -> int:
+        """The amount of particles currently alive"""
+        return len(self.particles)
+
+
+@dataclass
+class ArrayLightSource:  # pylint: disable=too-many-instance-attributes
+    """Light source that simulates its particles as numpy arrays instead of individual
+    LightParticle objects. Behaves the same as LightSource, but spawning, decaying,
+    colour shifting, collisions and expiry are all batched array operations.
+    """
+
+    spawn: int = 1
+    energy: float = 10
+    position: Tuple[int, int] = (0, 0)
+    colour: Tuple[int, ...] = (255, 255, 255)
+    max_radius_increase: int = MAX_RADIUS_INCREASE
+    max_particles: Optional[int] = None
+    colour_step: Optional[int] = None  # glow sprite colour quantization
+    seed: Optional[int] = None
+    initial_capacity: int = 1024
+
+    def __post_init__(self):
+        self.rng = numpy.random.default_rng(self.seed)  # type: ignore
+        self.count = 0
+        self._allocate(self.initial_capacity)
+
+    def update(self):
+        """Updates all particles, removes expired particles and spawns new ones"""
+        count = self.count
+        if count:
+            energies = self.energies[:count]
+            speeds = self.speeds[:count]
+            positions = self.positions[:count]
+            colours = self.colours[:count]
+
+            positions += speeds * SPEED_SCALING
+            energies *= 1 - ENERGY_DECAY
+            # same as LightParticle.update_colour, including the truncation to int
+            colours[:, 0] = numpy.floor(
+                numpy.clip(colours[:, 0] - energies * 0.1, 0, 255)
+            )
+            colours[:, 1] = numpy.floor(
+                numpy.clip(colours[:, 1] + energies * 0.01, 0, 255)
+            )
+            self._collide(positions[:, 0], speeds[:, 0], energies, WIDTH)
+            self._collide(positions[:, 1], speeds[:, 1], energies, HEIGHT)
+            self._remove_expired()
+        self.spawn_particles()
+
+    def spawn_particles(self):
+        """Spawns a number of particles with the same distribution of angles, colours
+        and energies as LightSource.spawn_particles, using one vectorized random draw
+        per particle property. No particles are spawned beyond max_particles, if specified.
+        """
+        amount = self.spawn
+        if self.max_particles is not None:
+            amount = min(amount, self.max_particles - self.count)
+        if amount <= 0:
+            return
+
+        start = self.count
+        self._reserve(start + amount)
+        end = start + amount
+        rng = self.rng
+
+        vel_x = rng.integers(-10000, 10000, size=amount, endpoint=True) / 10000
+        vel_y = (1 - numpy.abs(vel_x)) * rng.choice((1, -1), size=amount)
+        self.speeds[start:end, 0] = vel_x
+        self.speeds[start:end, 1] = vel_y
+        self.positions[start:end] = self.position
+        colour_offsets = rng.integers(
+            -10, 10, size=(amount, len(self.colour)), endpoint=True
+        )
+        self.colours[start:end] = numpy.clip(
+            numpy.asarray(self.colour) + colour_offsets, 0, 255
+        )
+        energy = self.energy / self.spawn
+        self.energies[start:end] = (
+            energy * rng.integers(0, 200, size=amount, endpoint=True) / 100
+        )
+        self.count = end
+
+    def render(self, screen, glow_cache: GlowCache = GLOW_CACHE):
+        """Renders the light source on the screen in a single batch of blits"""
+        screen.blits(self.compute_blits(glow_cache), doreturn=False)
+
+    def compute_blits(self, glow_cache: GlowCache = GLOW_CACHE) -> list:
+        """Returns the blit sequence (sprite, destination, area, flags) used to render
+        all particles. Sprite keys are quantized in a single array operation.
+        """
+        count = self.count
+        step = self.colour_step or glow_cache.colour_step
+        radii = numpy.rint(numpy.maximum(self.energies[:count], 0)).astype(int)
+        colours = numpy.clip(
+            numpy.rint(self.colours[:count, :3] / step).astype(int) * step, 0, 255
+        )
+        max_increase = self.max_radius_increase
+        get_sprite = glow_cache.get_quantized
+        flags = pygame.BLEND_RGBA_ADD
+        blits = []
+        for radius, colour, (pos_x, pos_y) in zip(
+            radii.tolist(), colours.tolist(), self.positions[:count].tolist()
+        ):
+            half_size = radius + max_increase
+            sprite = get_sprite((radius, tuple(colour), max_increase))
+            blits.append((sprite, (pos_x - half_size, pos_y - half_size), None, flags))
+        return blits
+
+    @property
+    def particle_count(self) -> int:
+        """The amount of particles currently alive"""
+        return self.count
+
+    def particle_arrays(self):
+        """Returns views of the positions, energies and colours of all live particles"""
+        count = self.count
+        return self.positions[:count], self.energies[:count], self.colours[:count]
+
+    @staticmethod
+    def _collide(coordinates, speeds, energies, limit: float):
+        collided = (coordinates < 0) | (coordinates > limit)
+        speeds[collided] *= -1
+        energies[collided] *= COLLISION_REDUCTION_FACTOR
+
+    def _remove_expired(self):
+        count = self.count
+        alive = self.energies[:count] > MIN_ENERGY
+        remaining = int(numpy.count_nonzero(alive))
+        if remaining == count:
+            return
+
+        for array in (self.energies, self.speeds, self.positions, self.colours):
+            array[:remaining] = array[:count][alive]
+        self.count = remaining
+
+    def _reserve(self, capacity: int):
+        if capacity <= len(self.energies):
+            return
+
+        old_arrays = (self.energies, self.speeds, self.positions, self.colours)
+        self._allocate(max(capacity, 2 * len(self.energies)))
+        new_arrays = (self.energies, self.speeds, self.positions, self.colours)
+        for old_array, new_array in zip(old_arrays, new_arrays):
+            new_array[: self.count] = old_array[: self.count]
+
+    def _allocate(self, capacity: int):
+        self.energies = numpy.zeros(capacity)
+        self.speeds = numpy.zeros((capacity, 2))
+        self.positions = numpy.zeros((capacity, 2))
+        self.colours = numpy.zeros((capacity, len(self.colour)))
+
+
+def create_light_source(
+    position: Tuple[int, int], colour: Tuple[int, ...] = (255, 50, 20, 20)
+):
+    """Returns a new light source at the specified position, simulated with numpy
+    arrays if numpy is available.
+    """
+    source_type = ArrayLightSource if numpy is not None else LightSource
+    return source_type(spawn=25, energy=30, position=position, colour=colour)
+
+
+def create_scene(amount: int) -> list:
+    """Returns the specified amount of light sources in random positions, with random
+    orange-ish colours.
+    """
+    return [
+        create_light_source(
+            position=(random.randint(0, WIDTH), random.randint(0, HEIGHT)),
+            colour=(
+                random.randint(150, 255),
+                random.randint(20, 120),
+                random.randint(0, 60),
+                20,
+            ),
+        )
+        for _ in range(amount)
+    ]
 
 
-def main():
-    """Main function"""
+def main(amount_of_sources: int = 0):  # pylint: disable=too-many-branches
+    """Main function. Creates one light source following the mouse, as well as the
+    specified amount of additional light sources in random positions.
+    """
     pygame.init()
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
     clock = pygame.time.Clock()
-    light_source = LightSource(
-        spawn=25, energy=30, position=(200, 200), colour=(255, 50, 20, 20)
+    mouse_light_source = create_light_source(position=(200, 200))
+    light_sources = [mouse_light_source] + create_scene(amount_of_sources)
+    budget = ParticleBudgetController(target_frame_time=1000 / FRAMERATE)
+    for light_source in light_sources:
+        budget.register(light_source)
+    renderer = (
+        AccumulationRenderer((WIDTH, HEIGHT))
+        if AccumulationRenderer is not None
+        else None
     )
+    use_accumulation = False
 
     terminated = False
     while not terminated:
@@ -166,15 +394,31 @@ def main():
                     SPEED_SCALING -= 1
                 if event.key == pygame.K_w:
                     SPEED_SCALING += 1
+                if event.key == pygame.K_r and renderer is not None:
+                    use_accumulation = not use_accumulation
+                    renderer.clear()
+                if event.key == pygame.K_n:
+                    light_sources.extend(create_scene(amount=1))
+                    budget.register(light_sources[-1])
+                if event.key == pygame.K_BACKSPACE and len(light_sources) > 1:
+                    budget.unregister(light_sources.pop())
 
-        light_source.update()
-        light_source.position = pygame.mouse.get_pos()
-        screen.fill(
-            (5, 5, 5), special_flags=pygame.BLEND_RGBA_SUB
-        )  # dim colours over time
-        light_source.render(screen)
+        start_time = time.perf_counter()
+        mouse_light_source.position = pygame.mouse.get_pos()
+        for light_source in light_sources:
+            light_source.update()
+        if use_accumulation:
+            renderer.render(screen, light_sources)  # type: ignore
+        else:
+            screen.fill(
+                (5, 5, 5), special_flags=pygame.BLEND_RGBA_SUB
+            )  # dim colours over time
+            for light_source in light_sources:
+                light_source.render(screen)
+        decision = budget.update((time.perf_counter() - start_time) * 1000)
+        pygame.display.set_caption(str(decision))
         pygame.display.flip()
-        clock.tick(50)
+        clock.tick(FRAMERATE)
 
     pygame.display.quit()
 
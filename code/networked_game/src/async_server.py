@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""Asyncio based game server, serving all clients on a single event loop.
+
+The server runs an authoritative simulation of the entity positions at a fixed tick
+rate. Each client is greeted with its id. SET messages are the inputs of a client:
+they are collected during a tick (the latest one of each client wins) and applied at
+the start of the next tick, creating the entity of the client on its first input.
+After each tick, a SNAPSHOT message with the positions and speeds of the entities is
+sent to every client which sent a SUBSCRIBE message: a client following an entity only
+receives the entities in its area of interest (see interest.py), all other subscribers
+receive all entities. Subscribers with the same area share the encoded message. GET
+messages are still answered directly with the latest speed input (like server.py).
+Received data is written directly into the ReceiveBuffer of the connection (see
+protocol.py). As all connections are handled by one event loop, the shared state
+needs no locking.
+"""
+import argparse
+import asyncio
+import itertools
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import config
+from interest import Cell
+from interest import InterestGrid
+from protocol import encode
+from protocol import encode_with_records
+from protocol import MessageType
+from protocol import ProtocolError
+from protocol import ReceiveBuffer
+
+
+@dataclass
+class Session:
+    """State of a single client connection"""
+
+    id: int  # pylint: disable=invalid-name
+    address: Any
+    connected_at: float = field(default_factory=time.monotonic)
+    requests: int = 0
+    last_request: Optional[MessageType] = None
+
+
+@dataclass
+class Entity:
+    """Entity controlled by the inputs of a client"""
+
+    id: int  # pylint: disable=invalid-name
+    x: int  # pylint: disable=invalid-name
+    y: int  # pylint: disable=invalid-name
+    speed: Tuple[int, ...] = (0, 0)
+
+    def move(self):
+        """Moves the entity by its speed, staying inside of the world"""
+        width, height = config.WORLD_SIZE
+        self.x = min(max(self.x + self.speed[0], 0), width - 1)
+        self.y = min(max(self.y + self.speed[1], 0), height - 1)
+
+    @property
+    def record(self) -> Tuple[int, ...]:
+        """Record of the entity in a snapshot: id, x, y, speed x, speed y"""
+        return (self.id, self.x, self.y, *self.speed)
+
+
+@dataclass
+class Subscription:
+    """Subscription of a client to the snapshots"""
+
+    send: Callable[[bytes], Any]
+    focus: int = -1  # id of the followed entity, -1 for all entities
+
+
+@dataclass
+class GameServer:  # pylint: disable=too-many-instance-attributes
+    """Game state shared by all clients and the sessions of the connected clients"""
+
+    speed: Tuple[int, ...] = (0, 0)
+    sessions: Dict[int, Session] = field(default_factory=dict)
+    entities: Dict[int, Entity] = field(default_factory=dict)
+    inputs: Dict[int, Tuple[int, ...]] = field(default_factory=dict)
+    subscribers: Dict[int, Subscription] = field(default_factory=dict)
+    tick_listeners: List[Callable[[], Any]] = field(default_factory=list)
+    tick_count: int = 0
+    grid: InterestGrid = field(default_factory=InterestGrid)
+    _ids: Iterator[int] = field(default_factory=itertools.count)
+
+    def open_session(self, address: Any) -> Session:
+        """Returns a new session for the client with the specified address"""
+        session = Session(next(self._ids), address)
+        self.sessions[session.id] = session
+        return session
+
+    def close_session(self, session: Session):
+        """Removes the session of a disconnected client, its entity and subscription"""
+        self.sessions.pop(session.id, None)
+        self.entities.pop(session.id, None)
+        self.grid.remove(session.id)
+        self.inputs.pop(session.id, None)
+        self.subscribers.pop(session.id, None)
+
+    def handle_message(
+        self,
+        session: Session,
+        message_type: MessageType,
+        values: Tuple[int, ...],
+        send: Optional[Callable[[bytes], Any]] = None,
+    ) -> Optional[bytes]:
+        """Handles the message of the session, returns the encoded reply if the message
+        is answered directly. Subscribed sessions receive the snapshots by calling
+        send.
+        """
+        session.requests += 1
+        session.last_request = message_type
+        if message_type == MessageType.SET:
+            self.inputs[session.id] = values
+            return None
+        if message_type == MessageType.SUBSCRIBE and send is not None:
+            self.subscribers[session.id] = Subscription(send, values[0])
+            return None
+        return encode(MessageType.STATE, *self.speed)
+
+    def tick(self):
+        """Applies the inputs received since the last tick, moves all entities and
+        sends the snapshot to the subscribers
+        """
+        for session_id, speed in self.inputs.items():
+            entity = self.entities.get(session_id)
+            if entity is None:
+                entity = self.entities[session_id] = self._create_entity(session_id)
+            entity.speed = self.speed = speed
+        self.inputs.clear()
+        grid = self.grid
+        for entity in self.entities.values():
+            entity.move()
+        grid.update([entity.record for entity in self.entities.values()])
+        self.tick_count += 1
+        frames: Dict[Optional[Cell], bytes] = {}
+        for subscription in self.subscribers.values():
+            area = grid.get_area(subscription.focus)
+            key = None if area is None else area[len(area) // 2]
+            frame = frames.get(key)
+            if frame is None:
+                frame = frames[key] = encode_with_records(
+                    MessageType.SNAPSHOT, grid.get_packed(area), self.tick_count
+                )
+            subscription.send(frame)
+        for listener in self.tick_listeners:
+            listener()
+
+    def get_snapshot(self, focus: int = -1) -> Tuple[int, ...]:
+        """Returns the records of the entities in the area of interest of the followed
+        entity (all entities if it does not exist), flattened into a tuple
+        """
+        return self.grid.get_values(self.grid.get_area(focus))
+
+    @staticmethod
+    def _create_entity(entity_id: int) -> Entity:
+        # spreads the entities over the world
+        width, height = config.WORLD_SIZE
+        return Entity(entity_id, 37 * entity_id % width, 53 * entity_id % height)
+
+    async def run(self):
+        """Runs the simulation at the tick rate until cancelled. If a tick is late by
+        more than a tick interval, the simulation skips ahead instead of catching up.
+        A failing tick is reported without stopping the simulation.
+        """
+        loop = asyncio.get_running_loop()
+        interval = 1 / config.TICK_RATE
+        next_time = loop.time()
+        while True:
+            try:
+                self.tick()
+            except Exception:  # pylint: disable=broad-except
+                traceback.print_exc()
+            next_time = max(next_time + interval, loop.time() - interval)
+            await asyncio.sleep(max(0, next_time - loop.time()))
+
+    async def serve(
+        self, host: str, port: int, ready: Optional[threading.Event] = None
+    ):
+        """Accepts connections and runs the simulation until cancelled. Sets the ready
+        event (if specified) once the server is listening.
+        """
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(
+            lambda: ClientProtocol(self), host, port, backlog=config.BACKLOG
+        )
+        if ready is not None:
+            ready.set()
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.run())
+
+
+class ClientProtocol(asyncio.BufferedProtocol):
+    """Connection of a single client, handling its messages"""
+
+    def __init__(self, server: GameServer):
+        self.server = server
+        self.buffer = ReceiveBuffer()
+        self.transport: Optional[asyncio.Transport] = None
+        self.session: Optional[Session] = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.session = self.server.open_session(transport.get_extra_info("peername"))
+        transport.write(encode(MessageType.CONNECTED, self.session.id))
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        return self.buffer.get_buffer()
+
+    def buffer_updated(self, nbytes: int):
+        self.buffer.advance(nbytes)
+        replies = []
+        try:
+            for message_type, values in self.buffer.read_messages():
+                reply = self.server.handle_message(
+                    self.session, message_type, values, self.send  # type: ignore
+                )
+                if reply is not None:
+                    replies.append(reply)
+        except ProtocolError:
+            self.transport.close()  # type: ignore
+            return
+        if replies:
+            self.transport.writelines(replies)  # type: ignore
+
+    def send(self, frame: bytes):
+        """Sends the frame, unless the client does not keep up with reading the
+        previous ones: a newer snapshot will replace it.
+        """
+        if self.transport.get_write_buffer_size() < config.WRITE_BUFFER_LIMIT:  # type: ignore
+            self.transport.write(frame)  # type: ignore
+
+    def connection_lost(self, exc: Optional[Exception]):
+        if self.session is not None:
+            self.server.close_session(self.session)
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=config.SERVER_IP, help="Address to bind")
+    parser.add_argument("--port", type=int, default=config.PORT, help="Port to bind")
+    args = parser.parse_args()
+    print("Waiting for connections, Server Started")
+    try:
+        asyncio.run(GameServer().serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
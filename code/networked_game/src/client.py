@@ -4,35 +4,226 @@ Created on Sun May 16 18:46:57 2021
 
 @author: Korean_Crimson
 """
+import collections
+import queue
 import socket
+import threading
+import time
+from dataclasses import dataclass
+from typing import Deque
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
 
 import config
+from protocol import encode
+from protocol import Message
+from protocol import MessageType
+from protocol import ProtocolError
+from protocol import ReceiveBuffer
 
 
-class Network:
-    """Class used to connect to the server"""
+@dataclass(frozen=True)
+class State:
+    """State received from the server"""
+
+    speed: Tuple[int, ...]
+    received_at: float
+    sequence: int  # amount of states received before this one
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Entities of a tick of the server simulation, mapping their ids to their
+    positions and speeds (x, y, speed x, speed y)
+    """
+
+    tick: int
+    entities: Dict[int, Tuple[int, ...]]
+    received_at: float
+
+    @classmethod
+    def from_records(cls, tick: int, records: Tuple[int, ...]) -> "Snapshot":
+        """Returns the snapshot of the entity records (id, x, y, speed x, speed y)"""
+        entities = {
+            records[i]: records[i + 1 : i + 5] for i in range(0, len(records), 5)
+        }
+        return cls(tick, entities, time.monotonic())
+
+    def get_positions(
+        self, now: Optional[float] = None
+    ) -> Dict[int, Tuple[float, ...]]:
+        """Returns the positions of the entities. If the current time is specified,
+        the positions are predicted by moving the entities with their speed for the
+        ticks passed since the snapshot was received.
+        """
+        ticks = 0.0 if now is None else (now - self.received_at) * config.TICK_RATE
+        return {
+            id_: (x + ticks * speed_x, y + ticks * speed_y)
+            for id_, (x, y, speed_x, speed_y) in self.entities.items()
+        }
+
+
+class StateReceiver:
+    """Keeps the latest state and snapshot received from the server"""
 
     def __init__(self):
+        self.state: Optional[State] = None
+        self.snapshot: Optional[Snapshot] = None
+        self._last_state: Optional[State] = None
+
+    def get_speed(self) -> Optional[Tuple[int, ...]]:
+        """Returns the speed of the latest received state (None before the first
+        state is received)
+        """
+        state = self.state
+        return None if state is None else state.speed
+
+    def poll_state(self) -> Optional[State]:
+        """Returns the latest received state, if it has not been returned by a
+        previous call
+        """
+        state = self.state
+        if state is self._last_state:
+            return None
+        self._last_state = state
+        return state
+
+
+class Network(StateReceiver):  # pylint: disable=too-many-instance-attributes
+    """Class used to connect to the server.
+
+    After connecting, all socket I/O runs on two background threads: messages passed to
+    send are put into the outgoing queue and written by the sender thread, while the
+    receiver thread decodes the messages of the server, keeps the latest state and
+    snapshot and puts all other messages into the incoming queue. None of the methods
+    wait for the server.
+    """
+
+    def __init__(self):
+        super().__init__()
         self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server = config.SERVER_IP
         self.port = config.PORT
         self.addr = (self.server, self.port)
+        self.buffer = ReceiveBuffer()
+        self.outgoing: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        self.incoming: Deque[Message] = collections.deque(
+            maxlen=config.INCOMING_MESSAGES
+        )
+        self.connected = False
+        self._last_speed: Optional[Tuple[int, int]] = None
+        self._state_requested = threading.Event()
         self.id = self.connect()  # pylint: disable=invalid-name
 
-    def connect(self):
-        """Sends its address to the server and receives the server response"""
+    def connect(self) -> Optional[int]:
+        """Connects to the server, starts the I/O threads and returns the client id
+        sent by the server
+        """
         try:
             self.client.connect(self.addr)
-            return self.client.recv(config.CHUNKSIZE).decode()
+            message_type, values = self.receive()
         except:  # pylint: disable=bare-except
             print("failed")
+            return None
+        self.connected = True
+        threading.Thread(target=self._send_loop, daemon=True).start()
+        threading.Thread(target=self._receive_loop, daemon=True).start()
+        if message_type == MessageType.CONNECTED:
+            return values[0]
         return None
 
-    def send(self, data):
-        """Sends the data (str) and returns the server response (str)"""
+    def close(self):
+        """Stops the I/O threads, the socket is closed by the receiver thread"""
+        self.connected = False
+        self.outgoing.put(None)
         try:
-            self.client.send(str.encode(data))
-            return self.client.recv(config.CHUNKSIZE).decode()
-        except socket.error as exc:
-            print(exc)
-        return None
+            self.client.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def send(self, message_type: MessageType, *values: int):
+        """Queues a message for sending, without waiting for the server response"""
+        if self.connected:
+            self.outgoing.put(encode(message_type, *values))
+
+    def receive(self) -> Message:
+        """Waits for the next message of the server and returns it. Only used while
+        connecting, afterwards messages are received by the receiver thread.
+        """
+        while True:
+            message = self.buffer.read_message()
+            if message is not None:
+                return message
+            if not self.buffer.recv_into(self.client):
+                raise ConnectionError("Connection closed by the server")
+
+    def get_messages(self) -> List[Message]:
+        """Removes and returns all messages received since the last call"""
+        messages = []
+        while self.incoming:
+            messages.append(self.incoming.popleft())
+        return messages
+
+    def set_speed(self, speed: Tuple[int, int]):
+        """Sends the speed to the server, if it differs from the last speed sent"""
+        if speed != self._last_speed:
+            self._last_speed = speed
+            self.send(MessageType.SET, *speed)
+
+    def subscribe(self, entity_id: int = -1):
+        """Requests a snapshot of the entities in the area of interest of the entity
+        (-1 for all entities) after every tick of the server
+        """
+        self.send(MessageType.SUBSCRIBE, entity_id)
+
+    def request_state(self):
+        """Requests the server state, unless a requested state is still outstanding"""
+        if not self._state_requested.is_set():
+            self._state_requested.set()
+            self.send(MessageType.GET)
+
+    def get_speed(self) -> Optional[Tuple[int, ...]]:
+        """Requests a new state and returns the speed of the latest received state"""
+        self.request_state()
+        return super().get_speed()
+
+    def poll_state(self) -> Optional[State]:
+        """Requests a new state and returns the latest received state, if it is new"""
+        self.request_state()
+        return super().poll_state()
+
+    def _send_loop(self):
+        while True:
+            data = self.outgoing.get()
+            if data is None:
+                break
+            try:
+                self.client.sendall(data)
+            except socket.error as exc:
+                if self.connected:
+                    print(exc)
+                break
+        self.connected = False
+
+    def _receive_loop(self):
+        sequence = 0
+        try:
+            while self.buffer.recv_into(self.client):
+                for message in self.buffer.read_messages():
+                    message_type, values = message
+                    if message_type == MessageType.SNAPSHOT:
+                        self.snapshot = Snapshot.from_records(values[0], values[1:])
+                        continue
+                    if message_type == MessageType.STATE:
+                        self.state = State(values, time.monotonic(), sequence)
+                        sequence += 1
+                        self._state_requested.clear()
+                    self.incoming.append(message)
+        except (socket.error, ProtocolError) as exc:
+            if self.connected:
+                print(exc)
+        self.connected = False
+        self.outgoing.put(None)
+        self.client.close()
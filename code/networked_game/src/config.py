@@ -9,3 +9,19 @@ SERVER_IP = "192.168.178.41"
 PORT = 5555
 CHUNKSIZE = 2048
 MAX_CLIENTS = 2
+BACKLOG = 1024
+INCOMING_MESSAGES = 256
+CLIENT_PREDICTION = True
+UDP_PORT = 5556
+TRANSPORT = "tcp"  # "tcp" or "udp"
+SNAPSHOT_HISTORY = 32
+RESEND_INTERVAL = 0.1
+CONNECTION_TIMEOUT = 5.0
+TICK_RATE = 30
+WORLD_SIZE = (600, 600)
+WRITE_BUFFER_LIMIT = 65536
+INTEREST_CELL_SIZE = 100
+INTEREST_RADIUS = 1  # cells around the cell of the followed entity
+FOLLOW_ENTITY = -1  # id of the entity followed by game.py, -1 for all entities
+MAX_FRAME_SIZE = 1 << 24  # bytes, larger frames are rejected as invalid
+MAX_DATAGRAM_SIZE = 1200  # bytes, larger snapshots are split into parts
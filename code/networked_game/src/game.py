@@ -4,17 +4,22 @@ Created on Sun May 16 18:46:57 2021
 
 @author: Korean_Crimson
 """
+import time
+
+import config
 import pygame
 from client import Network
+from udp import UdpNetwork
 
 # pylint: disable=no-member
 def main():
     """Main function"""
     pygame.init()
-    screen = pygame.display.set_mode((600, 600))
+    screen = pygame.display.set_mode(config.WORLD_SIZE)
     clock = pygame.time.Clock()
     rect = pygame.Rect(0, 0, 50, 50)
-    network = Network()
+    network = UdpNetwork() if config.TRANSPORT == "udp" else Network()
+    network.subscribe(config.FOLLOW_ENTITY)
 
     running = True
     while running:
@@ -22,17 +27,20 @@ def main():
             if event.type == pygame.QUIT:
                 running = False
 
-        data = network.send("get")
-        print(data)
-        if data and "," in data:
-            speed = [int(x) for x in data.split(",")]
-            rect = rect.move(speed)
-
+        # never waits for the server: draws the entities of the latest snapshot of the
+        # server simulation, moved by their speed since the snapshot was received if
+        # client side prediction is enabled
         screen.fill((0, 0, 0))
-        pygame.draw.rect(screen, (255, 255, 255), rect)
+        snapshot = network.snapshot
+        if snapshot is not None:
+            now = time.monotonic() if config.CLIENT_PREDICTION else None
+            for position in snapshot.get_positions(now).values():
+                rect.center = (round(position[0]), round(position[1]))
+                pygame.draw.rect(screen, (255, 255, 255), rect)
         pygame.display.flip()
         clock.tick(60)
 
+    network.close()
     pygame.quit()
 
 
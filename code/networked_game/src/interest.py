@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""Area of interest management, so clients only receive the entities near them.
+
+The world is divided into a grid of square cells. The area of interest of a cell are
+the cells within the interest radius around it, a client following an entity receives
+the entities in the area of interest of the cell of that entity. The grid keeps the
+records of the entities in each cell, which are only moved between cells when an
+entity crosses a cell border. The flattened and packed records of a cell are cached
+until an entity in the cell changes, so each tick, every changed cell is encoded once
+and the snapshot of an area is joined from the packed cells.
+"""
+import itertools
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+import config
+from protocol import MessageType
+from protocol import pack_records
+
+Cell = Tuple[int, int]
+Record = Tuple[int, ...]
+
+
+@dataclass
+class InterestGrid:  # pylint: disable=too-many-instance-attributes
+    """Grid of cells containing the records of the entities"""
+
+    cell_size: int = config.INTEREST_CELL_SIZE
+    radius: int = config.INTEREST_RADIUS  # in cells
+    cells: Dict[Cell, Dict[int, Record]] = field(default_factory=dict)
+    entity_cells: Dict[int, Cell] = field(default_factory=dict)
+    crossings: int = 0  # amount of cell borders crossed by entities
+    _changed: Set[Cell] = field(default_factory=set)
+    _values: Dict[Cell, Record] = field(default_factory=dict)
+    _packed: Dict[Cell, bytes] = field(default_factory=dict)
+    _areas: Dict[Cell, List[Cell]] = field(default_factory=dict)
+
+    def get_cell(self, x: int, y: int) -> Cell:
+        """Returns the cell containing the position"""
+        return x // self.cell_size, y // self.cell_size
+
+    def update(self, records: Iterable[Record]):
+        """Sets the records (starting with entity id, x, y) of the entities, moving an
+        entity to another cell if it crossed a cell border
+        """
+        cell_size = self.cell_size
+        cells = self.cells
+        entity_cells = self.entity_cells
+        changed = self._changed
+        for record in records:
+            entity_id = record[0]
+            cell = (record[1] // cell_size, record[2] // cell_size)
+            previous = entity_cells.get(entity_id)
+            if previous == cell:
+                cell_records = cells[cell]
+                if cell_records[entity_id] == record:
+                    continue
+            else:
+                if previous is not None:
+                    self._remove(previous, entity_id)
+                    self.crossings += 1
+                entity_cells[entity_id] = cell
+                cell_records = cells.setdefault(cell, {})
+            cell_records[entity_id] = record
+            changed.add(cell)
+
+    def remove(self, entity_id: int):
+        """Removes the entity from the grid"""
+        cell = self.entity_cells.pop(entity_id, None)
+        if cell is not None:
+            self._remove(cell, entity_id)
+
+    def _remove(self, cell: Cell, entity_id: int):
+        records = self.cells[cell]
+        del records[entity_id]
+        if not records:
+            del self.cells[cell]
+        self._changed.add(cell)
+
+    def _clear_changed(self):
+        # removes the cached records of the changed cells
+        for cell in self._changed:
+            self._values.pop(cell, None)
+            self._packed.pop(cell, None)
+        self._changed.clear()
+
+    def get_area(self, entity_id: int) -> Optional[List[Cell]]:
+        """Returns the cells in the area of interest of the entity, None if it is not
+        in the grid
+        """
+        cell = self.entity_cells.get(entity_id)
+        if cell is None:
+            return None
+        area = self._areas.get(cell)
+        if area is None:
+            column, row = cell
+            offsets = range(-self.radius, self.radius + 1)
+            area = self._areas[cell] = [
+                (column + i, row + j) for i, j in itertools.product(offsets, offsets)
+            ]
+        return area
+
+    def get_values(self, cells: Optional[Iterable[Cell]] = None) -> Record:
+        """Returns the flattened records of the entities in the cells (all cells if
+        None)
+        """
+        if self._changed:
+            self._clear_changed()
+        values = self._values
+        chunks = []
+        for cell in self.cells if cells is None else cells:
+            chunk = values.get(cell)
+            if chunk is None:
+                if cell not in self.cells:
+                    continue
+                chunk = values[cell] = tuple(
+                    itertools.chain.from_iterable(self.cells[cell].values())
+                )
+            chunks.append(chunk)
+        return tuple(itertools.chain.from_iterable(chunks))
+
+    def get_packed(self, cells: Optional[Iterable[Cell]] = None) -> bytes:
+        """Returns the records of the entities in the cells (all cells if None),
+        packed as records of a SNAPSHOT message
+        """
+        if self._changed:
+            self._clear_changed()
+        packed = self._packed
+        chunks = []
+        for cell in self.cells if cells is None else cells:
+            chunk = packed.get(cell)
+            if chunk is None:
+                if cell not in self.cells:
+                    continue
+                chunk = packed[cell] = pack_records(
+                    MessageType.SNAPSHOT, *self.get_values((cell,))
+                )
+            chunks.append(chunk)
+        return b"".join(chunks)
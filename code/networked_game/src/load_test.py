@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""Load generator for the game servers, reporting requests per second and latency
+percentiles.
+
+Opens the specified amount of concurrent client connections, each sending a number of
+requests (alternating a GET message and a SET message followed by a GET message, as
+inputs are not answered) and waiting for every reply. Targets async_server.py by
+default; with --legacy, it targets server.py, which answers every message, so the SET
+messages are sent on their own. With --local, an async_server is started on a
+background thread of this process:
+    python load_test.py --local --clients 1000 --requests 100
+
+Note: thousands of connections may require raising the open file limit (ulimit -n).
+"""
+import argparse
+import asyncio
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import List
+from typing import Sequence
+
+import config
+from async_server import GameServer
+from protocol import encode
+from protocol import HEADER
+from protocol import MessageType
+
+REQUESTS = (
+    encode(MessageType.GET),
+    encode(MessageType.SET, 1, 0) + encode(MessageType.GET),
+)
+LEGACY_REQUESTS = (encode(MessageType.GET), encode(MessageType.SET, 1, 0))
+
+
+@dataclass(frozen=True)
+class LoadTestResult:
+    """Result of a load test, latencies are in milliseconds"""
+
+    requests: int
+    duration: float
+    p50: float
+    p95: float
+    p99: float
+    max: float
+
+    @property
+    def requests_per_second(self) -> float:
+        """Requests answered per second"""
+        return self.requests / self.duration
+
+    def __str__(self) -> str:
+        return (
+            f"{self.requests} requests in {self.duration:.2f}s "
+            f"({self.requests_per_second:.0f} requests/s), latency ms: "
+            f"p50 {self.p50:.2f}, p95 {self.p95:.2f}, p99 {self.p99:.2f}, "
+            f"max {self.max:.2f}"
+        )
+
+
+def compute_percentile(sorted_values: Sequence[float], percentile: float) -> float:
+    """Returns the percentile (0 - 100) of the sorted values, using nearest rank"""
+    rank = math.ceil(percentile / 100 * len(sorted_values))
+    return sorted_values[max(0, rank - 1)]
+
+
+async def read_frame(reader: asyncio.StreamReader) -> bytes:
+    """Reads a complete frame and returns it"""
+    header = await reader.readexactly(HEADER.size)
+    length, _ = HEADER.unpack(header)
+    return header + await reader.readexactly(length)
+
+
+async def run_client(
+    host: str,
+    port: int,
+    requests: int,
+    latencies: List[float],
+    messages: Sequence[bytes] = REQUESTS,
+):
+    """Sends the specified amount of requests, cycling through the specified messages
+    that must be answered by exactly one reply each, and appends their latencies.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    await read_frame(reader)  # greeting
+    for i in range(requests):
+        start = time.perf_counter()
+        writer.write(messages[i % len(messages)])
+        await writer.drain()
+        await read_frame(reader)
+        latencies.append((time.perf_counter() - start) * 1000)
+    writer.close()
+
+
+async def run_load_test(
+    host: str, port: int, clients: int, requests: int, legacy: bool = False
+) -> LoadTestResult:
+    """Runs the specified amount of clients concurrently. If legacy is True, the
+    requests are suitable for server.py instead of async_server.py.
+    """
+    messages = LEGACY_REQUESTS if legacy else REQUESTS
+    latencies: List[float] = []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            run_client(host, port, requests, latencies, messages)
+            for _ in range(clients)
+        )
+    )
+    duration = time.perf_counter() - start
+    latencies.sort()
+    return LoadTestResult(
+        len(latencies),
+        duration,
+        p50=compute_percentile(latencies, 50),
+        p95=compute_percentile(latencies, 95),
+        p99=compute_percentile(latencies, 99),
+        max=latencies[-1],
+    )
+
+
+def start_local_server(host: str, port: int):
+    """Starts an async game server on a background thread and waits until it is
+    listening.
+    """
+    ready = threading.Event()
+    thread = threading.Thread(
+        target=asyncio.run, args=(GameServer().serve(host, port, ready),), daemon=True
+    )
+    thread.start()
+    ready.wait()
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=config.SERVER_IP, help="Server address")
+    parser.add_argument("--port", type=int, default=config.PORT, help="Server port")
+    parser.add_argument("--clients", type=int, default=100, help="Connections")
+    parser.add_argument("--requests", type=int, default=100, help="Per connection")
+    parser.add_argument(
+        "--local",
+        action="store_true",
+        help="Start an async server on 127.0.0.1 in this process",
+    )
+    parser.add_argument(
+        "--legacy",
+        action="store_true",
+        help="Target the threaded server.py instead of async_server.py",
+    )
+    args = parser.parse_args()
+    if args.legacy and args.local:
+        parser.error("--local starts an async server, it cannot be used with --legacy")
+    host = args.host
+    if args.local:
+        host = "127.0.0.1"
+        start_local_server(host, args.port)
+    result = asyncio.run(
+        run_load_test(host, args.port, args.clients, args.requests, args.legacy)
+    )
+    print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""Binary wire protocol of the game.
+
+Every message is sent as a frame: a header containing the payload length (unsigned
+int) and the message type (unsigned char), followed by the payload, whose values are
+packed with the struct format of the message type. Some message types are followed by
+a variable amount of records, e.g. one per entity. As TCP may split or coalesce
+messages, received bytes are collected in a ReceiveBuffer, which is filled in place by
+socket.recv_into (or an asyncio.BufferedProtocol) and decodes complete frames directly
+from the buffer with struct.unpack_from, without copying them.
+"""
+import functools
+import struct
+from enum import IntEnum
+from typing import Dict
+from typing import Iterator
+from typing import Optional
+from typing import Tuple
+
+import config
+
+HEADER = struct.Struct("!IB")
+
+
+class MessageType(IntEnum):
+    """Type of a message, determines the format of its payload"""
+
+    CONNECTED = 1  # server greeting: client id
+    GET = 2  # request of the current state
+    SET = 3  # input: speed x, speed y
+    STATE = 4  # state: speed x, speed y
+    CONNECT = 5  # connection request (UDP transport)
+    DISCONNECT = 6  # connection close (UDP transport)
+    SUBSCRIBE = 7  # request of a snapshot every tick: followed entity id (-1 for all)
+    SNAPSHOT = 8  # tick, records: entity id, x, y, speed x, speed y
+
+
+PAYLOAD_FORMATS: Dict[MessageType, str] = {
+    MessageType.CONNECTED: "I",
+    MessageType.GET: "",
+    MessageType.SET: "bb",
+    MessageType.STATE: "hh",
+    MessageType.CONNECT: "",
+    MessageType.DISCONNECT: "",
+    MessageType.SUBSCRIBE: "i",
+    MessageType.SNAPSHOT: "I",
+}
+# format of the records following the payload, for message types with records
+RECORD_FORMATS: Dict[MessageType, str] = {
+    MessageType.SNAPSHOT: "Ihhbb",
+}
+# header and payload of each message type, packed with a single call
+FRAMES: Dict[MessageType, struct.Struct] = {
+    type_: struct.Struct(HEADER.format + format_)
+    for type_, format_ in PAYLOAD_FORMATS.items()
+}
+PAYLOADS: Dict[MessageType, struct.Struct] = {
+    type_: struct.Struct("!" + format_) for type_, format_ in PAYLOAD_FORMATS.items()
+}
+
+Message = Tuple[MessageType, Tuple[int, ...]]
+
+# lookup tables indexed by the message type value, as hashing and creating enum
+# members is slow compared to indexing a tuple
+_TYPES = tuple(
+    MessageType(i) if i in MessageType.__members__.values() else None
+    for i in range(max(MessageType) + 1)
+)
+_RECORD_FORMATS = tuple(
+    None if type_ is None else RECORD_FORMATS.get(type_) for type_ in _TYPES
+)
+_unpack_header = HEADER.unpack_from
+_HEADER_SIZE = HEADER.size
+
+
+@functools.lru_cache(maxsize=256)
+def _get_struct(format_: str) -> struct.Struct:
+    return struct.Struct(format_)
+
+
+def _create_record_packer(message_type: MessageType):
+    # returns a function like Struct.pack, packing any amount of records
+    payload_format = PAYLOAD_FORMATS[message_type]
+    record_format = RECORD_FORMATS[message_type]
+
+    def pack(_, type_: int, *values: int) -> bytes:
+        count, remainder = divmod(len(values) - len(payload_format), len(record_format))
+        if remainder:
+            raise struct.error(f"Incomplete record of {message_type.name}")
+        frame = _get_struct(HEADER.format + payload_format + record_format * count)
+        return frame.pack(frame.size - _HEADER_SIZE, type_, *values)
+
+    return pack
+
+
+_ENCODERS = tuple(
+    None
+    if type_ is None
+    else (
+        _create_record_packer(type_) if type_ in RECORD_FORMATS else FRAMES[type_].pack,
+        FRAMES[type_].size - HEADER.size,
+    )
+    for type_ in _TYPES
+)
+_DECODERS = tuple(
+    None
+    if type_ is None
+    else (type_, PAYLOADS[type_].unpack_from, PAYLOADS[type_].size)
+    for type_ in _TYPES
+)
+
+
+class ProtocolError(ValueError):
+    """Raised when a received frame is invalid"""
+
+
+def encode(message_type: MessageType, *values: int) -> bytes:
+    """Returns the frame of a message with the specified type and payload values"""
+    pack, length = _ENCODERS[message_type]  # type: ignore
+    return pack(length, message_type, *values)
+
+
+def pack_records(message_type: MessageType, *values: int) -> bytes:
+    """Returns the packed records of a message type with records, without header and
+    payload, which can be joined with other packed records by encode_with_records
+    """
+    record_format = RECORD_FORMATS[message_type]
+    count, remainder = divmod(len(values), len(record_format))
+    if remainder:
+        raise struct.error(f"Incomplete record of {message_type.name}")
+    return _get_struct("!" + record_format * count).pack(*values)
+
+
+def encode_with_records(
+    message_type: MessageType, records: bytes, *values: int
+) -> bytes:
+    """Returns the frame of a message with the payload values, followed by the records
+    packed by pack_records
+    """
+    payload = PAYLOADS[message_type].pack(*values)
+    return HEADER.pack(len(payload) + len(records), message_type) + payload + records
+
+
+def decode(data: bytes) -> Message:
+    """Returns the message of a single complete frame"""
+    buffer = ReceiveBuffer(len(data))
+    buffer.get_buffer(len(data))[: len(data)] = data
+    buffer.advance(len(data))
+    message = buffer.read_message()
+    if message is None or buffer.end:
+        raise ProtocolError("Data is not a single complete frame")
+    return message
+
+
+class ReceiveBuffer:
+    """Buffer of received bytes, from which complete frames are decoded in place.
+
+    Data is written into the free space returned by get_buffer, followed by a call to
+    advance. Decoded bytes are only discarded (by moving the remaining bytes to the
+    start of the buffer) once more space is needed.
+    """
+
+    def __init__(self, size: int = config.CHUNKSIZE):
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+
+    def get_buffer(self, min_size: int = 1) -> memoryview:
+        """Returns the free space at the end of the buffer, making room for at least
+        min_size bytes.
+        """
+        if len(self.buffer) - self.end < min_size:
+            self._compact(min_size)
+        return self.view[self.end :]
+
+    def advance(self, size: int):
+        """Marks the specified amount of bytes written into get_buffer as received"""
+        self.end += size
+
+    def recv_into(self, socket_) -> int:
+        """Receives data from the socket into the buffer. Returns the amount of bytes
+        received, 0 if the connection was closed.
+        """
+        size = socket_.recv_into(self.get_buffer())
+        self.advance(size)
+        return size
+
+    def read_message(self) -> Optional[Message]:
+        """Decodes and returns the next complete message, None if there is none"""
+        start, end = self.start, self.end
+        if end - start < _HEADER_SIZE:
+            return None
+        length, type_ = _unpack_header(self.buffer, start)
+        frame_end = start + _HEADER_SIZE + length
+        if frame_end > end:
+            if frame_end - start > len(self.buffer):
+                if length > config.MAX_FRAME_SIZE:
+                    raise ProtocolError(f"Frame length {length} exceeds the maximum")
+                self._compact(frame_end - end)
+            return None
+
+        decoder = _DECODERS[type_] if type_ < len(_DECODERS) else None
+        if decoder is None:
+            raise ProtocolError(f"Unknown message type {type_}")
+        message_type, unpack, size = decoder
+        if length == size:
+            values = unpack(self.buffer, start + _HEADER_SIZE)
+        else:
+            values = self._unpack_records(message_type, start, length)
+        if frame_end == end:
+            self.start = self.end = 0
+        else:
+            self.start = frame_end
+        return message_type, values
+
+    def read_messages(self) -> Iterator[Message]:
+        """Decodes and yields all complete messages"""
+        read_message = self.read_message
+        message = read_message()
+        while message is not None:
+            yield message
+            message = read_message()
+
+    def _unpack_records(
+        self, message_type: MessageType, start: int, length: int
+    ) -> Tuple[int, ...]:
+        # unpacks the payload of a message type with records
+        record_format = _RECORD_FORMATS[message_type]
+        payload_format = PAYLOAD_FORMATS[message_type]
+        size = PAYLOADS[message_type].size
+        if record_format is None or length < size:
+            raise ProtocolError(f"Invalid length {length} of {message_type.name}")
+        count, remainder = divmod(length - size, struct.calcsize("!" + record_format))
+        if remainder:
+            raise ProtocolError(f"Invalid length {length} of {message_type.name}")
+        payload = _get_struct("!" + payload_format + record_format * count)
+        return payload.unpack_from(self.buffer, start + _HEADER_SIZE)
+
+    def _compact(self, min_size: int):
+        # moves the undecoded bytes to the start, growing the buffer if necessary
+        remaining = self.end - self.start
+        if remaining + min_size > len(self.buffer):
+            buffer = bytearray(max(2 * len(self.buffer), remaining + min_size))
+            buffer[:remaining] = self.view[self.start : self.end]
+            self.buffer, self.view = buffer, memoryview(buffer)
+        else:
+            self.view[:remaining] = self.view[self.start : self.end]
+        self.start, self.end = 0, remaining
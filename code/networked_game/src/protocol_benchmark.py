@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Microbenchmark of the binary wire protocol against the previous string messages.
+
+Reports the bytes per message and the time to encode and decode a message. Frames are
+decoded from a ReceiveBuffer, either written into it one by one or received as a
+stream of coalesced messages.
+"""
+import timeit
+
+from protocol import encode
+from protocol import MessageType
+from protocol import ReceiveBuffer
+
+AMOUNT = 100000
+STREAM_LENGTH = 1000
+
+
+def encode_string(speed):
+    """Encodes the speed like the previous string protocol"""
+    return str.encode(f"set:{speed[0]},{speed[1]}")
+
+
+def decode_string(data):
+    """Decodes a message of the previous string protocol"""
+    _, speed = data.decode("utf-8").split(":")
+    return tuple(int(x) for x in speed.split(","))
+
+
+def decode_frame(buffer, data):
+    """Writes the frame into the buffer and decodes it"""
+    buffer.get_buffer(len(data))[: len(data)] = data
+    buffer.advance(len(data))
+    return buffer.read_message()
+
+
+def decode_stream(data):
+    """Decodes all frames of the coalesced data"""
+    buffer = ReceiveBuffer(len(data))
+    buffer.get_buffer(len(data))[: len(data)] = data
+    buffer.advance(len(data))
+    return list(buffer.read_messages())
+
+
+def report(name, size, seconds, amount):
+    """Prints the bytes per message and the time per message"""
+    print(f"{name:<28}{size:>6} bytes{seconds / amount * 1e9:>10.0f} ns/message")
+
+
+def main():
+    """Main function"""
+    speed = (-1, 0)
+    set_ = MessageType.SET  # enum attribute lookups are slow, keep them out of the loop
+    string_message = encode_string(speed)
+    frame = encode(MessageType.SET, *speed)
+    assert decode_string(string_message) == speed
+    buffer = ReceiveBuffer()
+    assert decode_frame(buffer, frame) == (MessageType.SET, speed)
+
+    report(
+        "string encode",
+        len(string_message),
+        timeit.timeit(lambda: encode_string(speed), number=AMOUNT),
+        AMOUNT,
+    )
+    report(
+        "frame encode",
+        len(frame),
+        timeit.timeit(lambda: encode(set_, *speed), number=AMOUNT),
+        AMOUNT,
+    )
+    report(
+        "string decode",
+        len(string_message),
+        timeit.timeit(lambda: decode_string(string_message), number=AMOUNT),
+        AMOUNT,
+    )
+    report(
+        "frame receive and decode",
+        len(frame),
+        timeit.timeit(lambda: decode_frame(buffer, frame), number=AMOUNT),
+        AMOUNT,
+    )
+    stream = frame * STREAM_LENGTH
+    repetitions = AMOUNT // STREAM_LENGTH
+    report(
+        f"frame decode ({STREAM_LENGTH} coalesced)",
+        len(frame),
+        timeit.timeit(lambda: decode_stream(stream), number=repetitions),
+        repetitions * STREAM_LENGTH,
+    )
+
+
+if __name__ == "__main__":
+    main()
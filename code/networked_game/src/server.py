@@ -4,39 +4,43 @@ Created on Sun May 16 18:46:57 2021
 
 @author: Korean_Crimson
 """
+import itertools
 import socket
 from _thread import start_new_thread
 
 import config
+from protocol import encode
+from protocol import MessageType
+from protocol import ReceiveBuffer
 
 # pylint: disable=invalid-name
 # pylint: disable=global-statement
-speed = "0,0"
+speed = (0, 0)
+client_ids = itertools.count()
 
 
 def threaded_client(conn):
-    """Tries to receive data from the client connection until the connection is
-    terminated. Currently sends back the data received to all clients, unless
-    the data received is equal to 'get', in which case it sends the last reply.
+    """Tries to receive messages from the client connection until the connection is
+    terminated. Set messages replace the speed, every message is answered with the
+    current speed.
     """
     global speed
 
-    conn.send(str.encode("Connected"))
+    buffer = ReceiveBuffer()
+    conn.sendall(encode(MessageType.CONNECTED, next(client_ids)))
     while True:
         try:
-            data = conn.recv(config.CHUNKSIZE)
-            if not data:
+            if not buffer.recv_into(conn):
                 print("Disconnected")
                 break
 
-            request_ = data.decode("utf-8")
+            for message_type, values in buffer.read_messages():
+                if message_type == MessageType.SET:
+                    speed = values
 
-            if request_.startswith("set:"):
-                _, speed = request_.split(":")
-
-            reply = speed
-            print(f"Received {request_}. Sending: {reply}.")
-            conn.sendall(str.encode(reply))
+                reply = speed
+                print(f"Received {message_type.name}{values}. Sending: {reply}.")
+                conn.sendall(encode(MessageType.STATE, *reply))
         except Exception as exc:
             raise exc
 
@@ -0,0 +1,553 @@
+# -*- coding: utf-8 -*-
+"""UDP transport of the game, avoiding the head-of-line blocking of TCP.
+
+Every datagram starts with a packet header: the packet type, a sequence number and the
+latest sequence number received from the other side (its ack, only used by the server
+for ACK packets). There are two channels:
+- Unreliable: the server sends a snapshot of the entities (see async_server.py) to
+  every client after each tick of its simulation and clients send their inputs. Lost
+  packets are never resent, as the next one replaces them, and packets older than the
+  latest received one are dropped. Snapshots are delta compressed per entity against
+  the latest snapshot acknowledged by the client: only changed entities are sent, each
+  with its id, a bit mask of its changed fields and only the changed fields. Snapshots
+  larger than the maximum datagram size are split into parts, a snapshot is only used
+  once all of its parts are received.
+- Reliable: control messages (connect, disconnect) are resent until acknowledged and
+  delivered in order, exactly once.
+Payloads of inputs and control messages are frames of the TCP protocol (protocol.py).
+
+The Connection class implements both channels without any I/O; UdpServer and
+UdpNetwork send and receive its packets (see udp_loopback.py for a test with simulated
+packet loss and latency):
+    python udp.py --host 127.0.0.1
+"""
+import argparse
+import asyncio
+import socket
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from dataclasses import field
+from enum import IntEnum
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import config
+from async_server import GameServer
+from async_server import Session
+from client import Snapshot
+from client import StateReceiver
+from protocol import decode
+from protocol import encode
+from protocol import MessageType
+from protocol import ProtocolError
+from protocol import RECORD_FORMATS
+
+PACKET_HEADER = struct.Struct("!BHH")  # packet type, sequence, ack
+SNAPSHOT_HEADER = struct.Struct("!HHH")  # baseline sequence, part, amount of parts
+SEQUENCE_MODULO = 1 << 16
+RECEIVE_SIZE = 65535
+
+# snapshot entries use the formats of the SNAPSHOT records: entity id, then the fields
+_RECORD_FORMAT = RECORD_FORMATS[MessageType.SNAPSHOT]
+ENTITY_HEADER = struct.Struct("!" + _RECORD_FORMAT[0] + "B")  # entity id, field mask
+ALL_FIELDS = (1 << (len(_RECORD_FORMAT) - 1)) - 1
+REMOVED = 0x80  # field mask of a removed entity
+_FIELDS = tuple(
+    struct.Struct(
+        "!" + "".join(f for i, f in enumerate(_RECORD_FORMAT[1:]) if mask >> i & 1)
+    )
+    for mask in range(ALL_FIELDS + 1)
+)
+_ZEROS = (0,) * (len(_RECORD_FORMAT) - 1)
+
+Values = Tuple[int, ...]
+Entities = Dict[int, Tuple[int, ...]]
+
+
+class PacketType(IntEnum):
+    """Type of a datagram"""
+
+    CONTROL = 1  # reliable, payload: message frame
+    CONTROL_ACK = 2  # acknowledges the control message with the sequence number
+    SNAPSHOT = 3  # unreliable, payload: delta compressed values
+    INPUT = 4  # unreliable, payload: message frame
+    ACK = 5  # acknowledges the snapshot with the sequence number ack, no payload
+
+
+def is_newer(sequence: int, other: int) -> bool:
+    """Returns whether the sequence number follows the other one, with wrap around"""
+    return 0 < (sequence - other) % SEQUENCE_MODULO < SEQUENCE_MODULO // 2
+
+
+def get_entities(records: Values) -> Entities:
+    """Returns the entities of the flattened snapshot records, mapping the entity ids
+    to their fields
+    """
+    size = len(_RECORD_FORMAT)
+    return {records[i]: records[i + 1 : i + size] for i in range(0, len(records), size)}
+
+
+def encode_delta(entities: Entities, baseline: Entities) -> List[bytes]:
+    """Returns an entry for each entity differing from the baseline: the entity id, the
+    mask of the changed fields and the changed fields. New entities contain all
+    fields, entities of the baseline missing from the entities are marked as removed.
+    """
+    entries = []
+    for entity_id, fields in entities.items():
+        previous = baseline.get(entity_id)
+        if previous is None:
+            mask = ALL_FIELDS
+        elif previous == fields:
+            continue
+        else:
+            mask = 0
+            for i, (value, previous_value) in enumerate(zip(fields, previous)):
+                if value != previous_value:
+                    mask |= 1 << i
+        changed = [value for i, value in enumerate(fields) if mask >> i & 1]
+        entries.append(
+            ENTITY_HEADER.pack(entity_id, mask) + _FIELDS[mask].pack(*changed)
+        )
+    for entity_id in baseline:
+        if entity_id not in entities:
+            entries.append(ENTITY_HEADER.pack(entity_id, REMOVED))
+    return entries
+
+
+def decode_delta(data: bytes, entities: Entities):
+    """Applies the entries encoded by encode_delta to the entities"""
+    offset = 0
+    try:
+        while offset < len(data):
+            entity_id, mask = ENTITY_HEADER.unpack_from(data, offset)
+            offset += ENTITY_HEADER.size
+            if mask == REMOVED:
+                entities.pop(entity_id, None)
+                continue
+            if mask > ALL_FIELDS:
+                raise ProtocolError(f"Invalid field mask {mask}")
+            changed = iter(_FIELDS[mask].unpack_from(data, offset))
+            offset += _FIELDS[mask].size
+            fields = entities.get(entity_id, _ZEROS)
+            entities[entity_id] = tuple(
+                next(changed) if mask >> i & 1 else value
+                for i, value in enumerate(fields)
+            )
+    except struct.error as exc:
+        raise ProtocolError(f"Invalid snapshot entry: {exc}") from exc
+
+
+@dataclass
+class ReliableChannel:
+    """Resends messages until acknowledged, delivers received messages in order"""
+
+    next_sequence: int = 0
+    unacked: Dict[int, Tuple[bytes, float]] = field(default_factory=dict)
+    next_expected: int = 0
+    out_of_order: Dict[int, bytes] = field(default_factory=dict)
+
+    def send(self, payload: bytes, now: float) -> Tuple[int, bytes]:
+        """Returns the sequence number assigned to the payload, which is kept until
+        acknowledged
+        """
+        sequence = self.next_sequence
+        self.next_sequence = (sequence + 1) % SEQUENCE_MODULO
+        self.unacked[sequence] = (payload, now)
+        return sequence, payload
+
+    def get_resends(self, now: float) -> List[Tuple[int, bytes]]:
+        """Returns the unacknowledged messages sent longer than the resend interval
+        ago
+        """
+        resends = []
+        for sequence, (payload, sent_at) in self.unacked.items():
+            if now - sent_at >= config.RESEND_INTERVAL:
+                self.unacked[sequence] = (payload, now)
+                resends.append((sequence, payload))
+        return resends
+
+    def acknowledge(self, sequence: int):
+        """Stops resending the message with the sequence number"""
+        self.unacked.pop(sequence, None)
+
+    def receive(self, sequence: int, payload: bytes) -> List[bytes]:
+        """Returns the messages which can be delivered in order after receiving the
+        message with the sequence number (none for duplicates)
+        """
+        if sequence != self.next_expected:
+            if is_newer(sequence, self.next_expected):
+                self.out_of_order[sequence] = payload
+            return []
+        delivered = [payload]
+        self.next_expected = (sequence + 1) % SEQUENCE_MODULO
+        while self.next_expected in self.out_of_order:
+            delivered.append(self.out_of_order.pop(self.next_expected))
+            self.next_expected = (self.next_expected + 1) % SEQUENCE_MODULO
+        return delivered
+
+
+@dataclass
+class Connection:  # pylint: disable=too-many-instance-attributes
+    """Both channels of a connection, encoding and decoding its packets.
+
+    The history holds the latest snapshots sent (server) or received (client), indexed
+    by their sequence number modulo the history size.
+    """
+
+    address: Any
+    reliable: ReliableChannel = field(default_factory=ReliableChannel)
+    sequence: int = 0  # of the next unreliable packet sent
+    received: Optional[int] = None  # latest unreliable packet received
+    acked: Optional[int] = None  # latest unreliable packet acknowledged
+    history: List[Optional[Tuple[int, Entities]]] = field(
+        default_factory=lambda: [None] * config.SNAPSHOT_HISTORY
+    )
+    assembling: Optional[int] = None  # sequence of the snapshot of the parts
+    parts: Dict[int, bytes] = field(default_factory=dict)
+    last_received_at: float = field(default_factory=time.monotonic)
+    full_bytes: int = 0
+    delta_bytes: int = 0
+
+    def _next_header(self, packet_type: PacketType) -> bytes:
+        sequence = self.sequence
+        self.sequence = (sequence + 1) % SEQUENCE_MODULO
+        return PACKET_HEADER.pack(packet_type, sequence, self.received or 0)
+
+    def _get_snapshot(self, sequence: Optional[int]) -> Optional[Entities]:
+        if sequence is None:
+            return None
+        entry = self.history[sequence % len(self.history)]
+        if entry is None or entry[0] != sequence:
+            return None
+        return entry[1]
+
+    def encode_snapshot(self, values: Values) -> List[bytes]:
+        """Returns the packets of the snapshot of the flattened entity records, delta
+        compressed against the latest snapshot acknowledged and split into parts
+        fitting into a datagram. A baseline equal to the sequence number of the
+        snapshot means it is compressed against no entities.
+        """
+        entities = get_entities(values)
+        sequence = self.sequence
+        baseline = self._get_snapshot(self.acked)
+        if baseline is None:
+            baseline_sequence, baseline = sequence, {}
+        else:
+            baseline_sequence = self.acked  # type: ignore
+        self.history[sequence % len(self.history)] = (sequence, entities)
+        header = self._next_header(PacketType.SNAPSHOT)
+
+        limit = config.MAX_DATAGRAM_SIZE - PACKET_HEADER.size - SNAPSHOT_HEADER.size
+        parts: List[List[bytes]] = [[]]
+        size = 0
+        for entry in encode_delta(entities, baseline):
+            if size + len(entry) > limit and parts[-1]:
+                parts.append([])
+                size = 0
+            parts[-1].append(entry)
+            size += len(entry)
+        packets = [
+            header
+            + SNAPSHOT_HEADER.pack(baseline_sequence, i, len(parts))
+            + b"".join(part)
+            for i, part in enumerate(parts)
+        ]
+        self.full_bytes += (
+            PACKET_HEADER.size
+            + SNAPSHOT_HEADER.size
+            + struct.calcsize("!" + _RECORD_FORMAT) * len(entities)
+        )
+        self.delta_bytes += sum(len(packet) for packet in packets)
+        return packets
+
+    def decode_snapshot(self, sequence: int, payload: bytes) -> Optional[Entities]:
+        """Collects the parts of a received snapshot, returns its entities once all
+        parts are received. Returns None if the snapshot is incomplete, outdated or its
+        baseline is no longer known.
+        """
+        if self.received is not None and not is_newer(sequence, self.received):
+            return None
+        if self.assembling != sequence:
+            if self.assembling is not None and is_newer(self.assembling, sequence):
+                return None
+            self.assembling = sequence
+            self.parts.clear()
+        if len(payload) < SNAPSHOT_HEADER.size:
+            raise ProtocolError("Snapshot shorter than the snapshot header")
+        baseline_sequence, part, amount = SNAPSHOT_HEADER.unpack_from(payload)
+        if part >= amount:
+            raise ProtocolError(f"Invalid snapshot part {part} of {amount}")
+        self.parts[part] = payload[SNAPSHOT_HEADER.size :]
+        if len(self.parts) < amount:
+            return None
+
+        if baseline_sequence == sequence:
+            baseline: Optional[Entities] = {}
+        else:
+            baseline = self._get_snapshot(baseline_sequence)
+            if baseline is None:
+                return None
+        entities = dict(baseline)  # type: ignore
+        for i in range(amount):
+            decode_delta(self.parts[i], entities)
+        self.parts.clear()
+        self.history[sequence % len(self.history)] = (sequence, entities)
+        self.received = sequence
+        return entities
+
+    def encode_input(self, message_type: MessageType, *values: int) -> bytes:
+        """Returns an unreliable packet with the message, acknowledging the latest
+        snapshot received
+        """
+        return self._next_header(PacketType.INPUT) + encode(message_type, *values)
+
+    def encode_ack(self) -> bytes:
+        """Returns a packet acknowledging the latest snapshot received"""
+        return PACKET_HEADER.pack(PacketType.ACK, 0, self.received or 0)
+
+    def receive_input(self, sequence: int) -> bool:
+        """Returns whether the input with the sequence number is the latest one"""
+        if self.received is not None and not is_newer(sequence, self.received):
+            return False
+        self.received = sequence
+        return True
+
+    def receive_ack(self, ack: int):
+        """Updates the latest unreliable packet acknowledged"""
+        if self.acked is None or is_newer(ack, self.acked):
+            self.acked = ack
+
+    def encode_control(self, message_type: MessageType, *values: int) -> bytes:
+        """Returns the reliable packet of the message, resent until acknowledged"""
+        sequence, payload = self.reliable.send(
+            encode(message_type, *values), time.monotonic()
+        )
+        return self._encode_control(sequence, payload)
+
+    def get_resends(self) -> List[bytes]:
+        """Returns the packets of the reliable messages to resend"""
+        return [
+            self._encode_control(sequence, payload)
+            for sequence, payload in self.reliable.get_resends(time.monotonic())
+        ]
+
+    def _encode_control(self, sequence: int, payload: bytes) -> bytes:
+        return PACKET_HEADER.pack(PacketType.CONTROL, sequence, 0) + payload
+
+    @staticmethod
+    def encode_control_ack(sequence: int) -> bytes:
+        """Returns the packet acknowledging the control message"""
+        return PACKET_HEADER.pack(PacketType.CONTROL_ACK, sequence, 0)
+
+
+def decode_packet(data: bytes) -> Tuple[PacketType, int, int, bytes]:
+    """Returns the packet type, sequence number, ack and payload of a datagram"""
+    if len(data) < PACKET_HEADER.size:
+        raise ProtocolError("Datagram shorter than the packet header")
+    packet_type, sequence, ack = PACKET_HEADER.unpack_from(data)
+    try:
+        packet_type = PacketType(packet_type)
+    except ValueError as exc:
+        raise ProtocolError(f"Unknown packet type {packet_type}") from exc
+    return packet_type, sequence, ack, data[PACKET_HEADER.size :]
+
+
+class UdpServer(asyncio.DatagramProtocol):
+    """Serves the game state of a GameServer over UDP, sending a snapshot of the
+    entities to every connected client after each tick. Clients controlling an entity
+    only receive the entities in its area of interest.
+    """
+
+    def __init__(self, game: GameServer):
+        self.game = game
+        self.connections: Dict[Any, Tuple[Connection, Session]] = {}
+        self.transport: Optional[asyncio.DatagramTransport] = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr: Any):
+        try:
+            packet_type, sequence, ack, payload = decode_packet(data)
+            if packet_type == PacketType.CONTROL:
+                self._receive_control(addr, sequence, payload)
+                return
+            if addr not in self.connections:
+                return
+            connection, session = self.connections[addr]
+            connection.last_received_at = time.monotonic()
+            if packet_type == PacketType.CONTROL_ACK:
+                connection.reliable.acknowledge(sequence)
+                return
+            if packet_type == PacketType.ACK:
+                connection.receive_ack(ack)
+            elif packet_type == PacketType.INPUT and connection.receive_input(sequence):
+                self.game.handle_message(session, *decode(payload))
+        except (ProtocolError, struct.error):
+            pass
+
+    def _receive_control(self, addr: Any, sequence: int, payload: bytes):
+        connection, session = self.connections.get(addr, (None, None))
+        if connection is None:
+            connection = Connection(addr)
+        self.transport.sendto(Connection.encode_control_ack(sequence), addr)
+        for frame in connection.reliable.receive(sequence, payload):
+            message_type, _ = decode(frame)
+            if message_type == MessageType.CONNECT and session is None:
+                session = self.game.open_session(addr)
+                self.connections[addr] = (connection, session)
+                packet = connection.encode_control(MessageType.CONNECTED, session.id)
+                self.transport.sendto(packet, addr)
+            elif message_type == MessageType.DISCONNECT and session is not None:
+                self.close(addr)
+
+    def close(self, addr: Any):
+        """Removes the connection of the client with the address"""
+        _, session = self.connections.pop(addr)
+        self.game.close_session(session)
+
+    def send_snapshots(self):
+        """Sends the snapshot of the current state to all clients, resends unacked
+        control messages and removes clients which timed out
+        """
+        now = time.monotonic()
+        for addr, (connection, session) in list(self.connections.items()):
+            if now - connection.last_received_at > config.CONNECTION_TIMEOUT:
+                self.close(addr)
+                continue
+            for packet in connection.get_resends():
+                self.transport.sendto(packet, addr)
+            for packet in connection.encode_snapshot(
+                self.game.get_snapshot(session.id)
+            ):
+                self.transport.sendto(packet, addr)
+
+    async def serve(
+        self, host: str, port: int, ready: Optional[threading.Event] = None
+    ):
+        """Runs the simulation, sending snapshots after each tick, until cancelled.
+        Sets the ready event (if specified) once the server is listening.
+        """
+        loop = asyncio.get_running_loop()
+        await loop.create_datagram_endpoint(lambda: self, local_addr=(host, port))
+        if ready is not None:
+            ready.set()
+        self.game.tick_listeners.append(self.send_snapshots)
+        try:
+            await self.game.run()
+        finally:
+            self.transport.close()  # type: ignore
+
+
+class UdpNetwork(StateReceiver):  # pylint: disable=too-many-instance-attributes
+    """UDP counterpart of client.Network: connects to a UdpServer and receives the
+    snapshots on a background thread, none of the methods wait for the server.
+    """
+
+    def __init__(self, host: str = config.SERVER_IP, port: int = config.UDP_PORT):
+        super().__init__()
+        self.client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.client.settimeout(config.RESEND_INTERVAL)
+        self.addr = (host, port)
+        self.connection = Connection(self.addr)
+        self.lock = threading.Lock()
+        self.connected = threading.Event()
+        self.running = True
+        self.id: Optional[int] = None  # pylint: disable=invalid-name
+        self.id = self.connect()
+
+    def connect(self) -> Optional[int]:
+        """Sends the connect message, starts the receiver thread and waits until the
+        server sent the client id, which is returned
+        """
+        self._send(self.connection.encode_control(MessageType.CONNECT))
+        threading.Thread(target=self._receive_loop, daemon=True).start()
+        if not self.connected.wait(config.CONNECTION_TIMEOUT):
+            print("failed")
+        return self.id
+
+    def close(self):
+        """Sends a disconnect message (not resent, the server otherwise removes the
+        client after the connection timeout) and stops the receiver thread
+        """
+        with self.lock:
+            self._send(self.connection.encode_control(MessageType.DISCONNECT))
+        self.running = False
+
+    def subscribe(self, _: int = -1):
+        """Does nothing, as every client receives the snapshots of the area of interest
+        of its own entity (or all entities)
+        """
+
+    def set_speed(self, speed: Tuple[int, int]):
+        """Sends the speed to the server. Inputs are unreliable, so the speed should
+        be set every frame.
+        """
+        with self.lock:
+            self._send(self.connection.encode_input(MessageType.SET, *speed))
+
+    def _send(self, packet: bytes):
+        try:
+            self.client.sendto(packet, self.addr)
+        except OSError as exc:
+            print(exc)
+
+    def _receive_loop(self):
+        while self.running:
+            try:
+                data = self.client.recv(RECEIVE_SIZE)
+            except socket.timeout:
+                data = None
+            except OSError as exc:
+                print(exc)
+                break
+            with self.lock:
+                if data is not None:
+                    self._receive(data)
+                for packet in self.connection.get_resends():
+                    self._send(packet)
+        self.client.close()
+
+    def _receive(self, data: bytes):
+        try:
+            packet_type, sequence, _, payload = decode_packet(data)
+            if packet_type == PacketType.SNAPSHOT:
+                entities = self.connection.decode_snapshot(sequence, payload)
+                if entities is not None:
+                    self.snapshot = Snapshot(sequence, entities, time.monotonic())
+                    self._send(self.connection.encode_ack())
+            elif packet_type == PacketType.CONTROL_ACK:
+                self.connection.reliable.acknowledge(sequence)
+            elif packet_type == PacketType.CONTROL:
+                self._send(Connection.encode_control_ack(sequence))
+                for frame in self.connection.reliable.receive(sequence, payload):
+                    message_type, values = decode(frame)
+                    if message_type == MessageType.CONNECTED:
+                        self.id = values[0]
+                        self.connected.set()
+        except (ProtocolError, struct.error):
+            pass
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=config.SERVER_IP, help="Address to bind")
+    parser.add_argument(
+        "--port", type=int, default=config.UDP_PORT, help="Port to bind"
+    )
+    args = parser.parse_args()
+    print("Waiting for connections, Server Started")
+    try:
+        asyncio.run(UdpServer(GameServer()).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""Loopback test of the UDP transport with simulated packet loss and latency.
+
+Starts a UdpServer and a relay dropping and delaying datagrams in both directions on
+127.0.0.1. One client changes its speed input in regular intervals, while the viewer
+clients record the time until they receive a snapshot in which the entity of the
+player has the new speed (input to display latency):
+    python udp_loopback.py --loss 0.1 --latency 0.05 --jitter 0.01 --viewers 10
+"""
+import argparse
+import asyncio
+import random
+import threading
+import time
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import config
+from async_server import GameServer
+from load_test import compute_percentile
+from udp import UdpNetwork
+from udp import UdpServer
+
+HOST = "127.0.0.1"
+SERVER_PORT = 5661
+RELAY_PORT = 5662
+
+
+class LossyRelay(asyncio.DatagramProtocol):
+    """Forwards datagrams between the clients and the server, dropping them with the
+    loss probability and delaying them by the latency plus a random jitter (which may
+    reorder them). Every client gets its own upstream endpoint, so the server sees a
+    separate address per client.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, server_address: Any, loss: float, latency: float, jitter: float):
+        self.server_address = server_address
+        self.loss = loss
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(0)
+        self.upstreams: Dict[Any, asyncio.Future] = {}
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self.forwarded = 0
+        self.dropped = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr: Any):
+        if addr not in self.upstreams:
+            self.upstreams[addr] = asyncio.ensure_future(self._open_upstream(addr))
+        self.forward(self._send_upstream, self.upstreams[addr], data)
+
+    def forward(self, send, *args):
+        """Calls send with the arguments after the delay, unless the datagram is lost"""
+        if self.random.random() < self.loss:
+            self.dropped += 1
+            return
+        self.forwarded += 1
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        asyncio.get_running_loop().call_later(delay, send, *args)
+
+    async def _open_upstream(self, addr: Any) -> asyncio.DatagramTransport:
+        transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: _Upstream(self, addr), remote_addr=self.server_address
+        )
+        return transport
+
+    @staticmethod
+    def _send_upstream(upstream: asyncio.Future, data: bytes):
+        # datagrams sent before the upstream endpoint is open are lost
+        if upstream.done():
+            upstream.result().sendto(data)
+
+
+class _Upstream(asyncio.DatagramProtocol):
+    def __init__(self, relay: LossyRelay, client_address: Any):
+        self.relay = relay
+        self.client_address = client_address
+
+    def datagram_received(self, data: bytes, addr: Any):
+        self.relay.forward(self.relay.transport.sendto, data, self.client_address)
+
+
+async def run_network(server: UdpServer, relay: LossyRelay, ready: threading.Event):
+    """Runs the server and the relay until cancelled"""
+    loop = asyncio.get_running_loop()
+    await loop.create_datagram_endpoint(lambda: relay, local_addr=(HOST, RELAY_PORT))
+    await server.serve(HOST, SERVER_PORT, ready)
+
+
+def get_speed(client: UdpNetwork, entity_id: Optional[int]) -> Tuple[int, ...]:
+    """Returns the speed of the entity in the latest snapshot received by the client"""
+    snapshot = client.snapshot
+    if snapshot is None or entity_id not in snapshot.entities:
+        return ()
+    return snapshot.entities[entity_id][2:]
+
+
+def measure_latencies(  # pylint: disable=too-many-locals
+    player: UdpNetwork, viewers: List[UdpNetwork], duration: float, interval: float
+) -> Tuple[List[float], int]:
+    """Changes the speed of the player in regular intervals. Returns the sorted
+    latencies (ms) until a viewer receives the new speed and the amount of changes a
+    viewer did not receive before the next change.
+    """
+    rng = random.Random(1)
+    speed = (0, 0)
+    changed_at = time.perf_counter()
+    observed = [True] * len(viewers)
+    latencies: List[float] = []
+    missed = 0
+    end = time.perf_counter() + duration
+    next_input = next_change = time.perf_counter()
+    while time.perf_counter() < end:
+        now = time.perf_counter()
+        if now >= next_change:
+            missed += observed.count(False)
+            speed = (rng.randint(-5, 5), rng.randint(-5, 5))
+            while speed == get_speed(viewers[0], player.id):
+                speed = (rng.randint(-5, 5), rng.randint(-5, 5))
+            changed_at = now
+            observed = [False] * len(viewers)
+            next_change = now + interval
+        if now >= next_input:
+            player.set_speed(speed)  # sent every frame, as inputs are unreliable
+            next_input += 1 / 60
+        for i, viewer in enumerate(viewers):
+            if not observed[i] and get_speed(viewer, player.id) == speed:
+                observed[i] = True
+                latencies.append((now - changed_at) * 1000)
+        time.sleep(0.0005)
+    latencies.sort()
+    return latencies, missed
+
+
+def run(args):
+    """Runs the clients for the duration and prints the latencies"""
+    server = UdpServer(GameServer())
+    relay = LossyRelay((HOST, SERVER_PORT), args.loss, args.latency, args.jitter)
+    ready = threading.Event()
+    threading.Thread(
+        target=asyncio.run, args=(run_network(server, relay, ready),), daemon=True
+    ).start()
+    ready.wait()
+
+    player = UdpNetwork(HOST, RELAY_PORT)
+    viewers = [UdpNetwork(HOST, RELAY_PORT) for _ in range(args.viewers)]
+    latencies, missed = measure_latencies(
+        player, viewers, args.duration, args.change_interval
+    )
+    for client in [player] + viewers:
+        client.close()
+    connections = [connection for connection, _ in server.connections.values()]
+    full_bytes = sum(connection.full_bytes for connection in connections)
+    delta_bytes = sum(connection.delta_bytes for connection in connections)
+    print(
+        f"loss {args.loss:.0%}, latency {args.latency * 1000:.0f} ms "
+        f"+ jitter {args.jitter * 1000:.0f} ms, tick rate {config.TICK_RATE}"
+    )
+    print(
+        f"{len(latencies)} speed changes observed, {missed} missed; latency ms: "
+        f"p50 {compute_percentile(latencies, 50):.1f}, "
+        f"p95 {compute_percentile(latencies, 95):.1f}, "
+        f"p99 {compute_percentile(latencies, 99):.1f}, max {latencies[-1]:.1f}"
+    )
+    print(
+        f"datagrams forwarded {relay.forwarded}, dropped {relay.dropped}; "
+        f"snapshot bytes {delta_bytes} (without delta compression {full_bytes})"
+    )
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--loss", type=float, default=0.1, help="Loss probability")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Seconds")
+    parser.add_argument("--viewers", type=int, default=10, help="Viewer clients")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds")
+    parser.add_argument(
+        "--change-interval", type=float, default=0.5, help="Seconds between inputs"
+    )
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()